@@ -0,0 +1,26 @@
+"""
+Billing System - SMS Gateway Backend (ASGI)
+
+The api/app.py app served over ASGI: the send endpoints run on an event
+loop with an async, pooled gateway client (see backend/asgi.py).
+
+Usage:
+pip install aiohttp a2wsgi uvicorn
+uvicorn --app-dir api asgi:app --host 0.0.0.0 --port 5000 --workers 2
+"""
+
+import os
+import sys
+
+# Add parent directory to path to import the shared backend package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.asgi import create_asgi_app
+
+app = create_asgi_app(gateway='q')
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('PORT', 5000))
+    uvicorn.run(app, host='0.0.0.0', port=port, log_level='warning')
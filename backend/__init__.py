@@ -0,0 +1,6 @@
+"""
+Billing System - Shared Backend Package
+
+Code shared by the Flask entry points (python-flask-backend.py,
+api/app.py and api/index.py).
+"""
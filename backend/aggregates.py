@@ -0,0 +1,174 @@
+"""
+Billing System - Incremental Sales Aggregates
+
+Running totals (bill count, revenue, GST collected, items sold) per day,
+per month and per customer. The store applies each bill's contribution in
+the same transaction that writes the bill, subtracting the old version
+first on updates and deletes, so reports are read in O(1) instead of
+rescanning every bill.
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales_daily (
+    date_key TEXT PRIMARY KEY,
+    bills INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    gst REAL NOT NULL DEFAULT 0,
+    items REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sales_monthly (
+    month_key TEXT PRIMARY KEY,
+    bills INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    gst REAL NOT NULL DEFAULT 0,
+    items REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS customer_totals (
+    customer_key TEXT PRIMARY KEY,
+    name TEXT,
+    phone TEXT,
+    bills INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    gst REAL NOT NULL DEFAULT 0,
+    items REAL NOT NULL DEFAULT 0,
+    first_bill_at TEXT,
+    last_bill_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_customer_totals_revenue ON customer_totals (revenue);
+"""
+
+_TOTALS = ('bills', 'revenue', 'gst', 'items')
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def contribution(bill):
+    """What a single bill adds to every running total"""
+    gst = bill.get('gst') or {}
+    return {
+        'bills': 1,
+        'revenue': _number(bill.get('grandTotal')),
+        'gst': _number(gst.get('totalGST')) if gst.get('enabled') else 0.0,
+        'items': sum(_number(it.get('qty')) for it in bill.get('items') or [] if isinstance(it, dict))
+    }
+
+
+def apply_bill(conn, bill, date_key, month_key, customer_key, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) a bill's contribution.
+    Must run inside the transaction that writes or deletes the bill.
+    """
+    delta = contribution(bill)
+    values = tuple(delta[k] * sign for k in _TOTALS)
+
+    for table, key_col, key in (('sales_daily', 'date_key', date_key),
+                                ('sales_monthly', 'month_key', month_key)):
+        conn.execute(
+            f'INSERT INTO {table} ({key_col}, bills, revenue, gst, items) VALUES (?, ?, ?, ?, ?) '
+            f'ON CONFLICT({key_col}) DO UPDATE SET bills = bills + excluded.bills, '
+            'revenue = revenue + excluded.revenue, gst = gst + excluded.gst, '
+            'items = items + excluded.items',
+            (key,) + values
+        )
+
+    ts = bill.get('ts') if sign > 0 else None
+    conn.execute(
+        'INSERT INTO customer_totals (customer_key, name, phone, bills, revenue, gst, items, '
+        'first_bill_at, last_bill_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT(customer_key) DO UPDATE SET name = COALESCE(excluded.name, name), '
+        'bills = bills + excluded.bills, revenue = revenue + excluded.revenue, '
+        'gst = gst + excluded.gst, items = items + excluded.items, '
+        'first_bill_at = COALESCE(MIN(first_bill_at, excluded.first_bill_at), first_bill_at, excluded.first_bill_at), '
+        'last_bill_at = COALESCE(MAX(last_bill_at, excluded.last_bill_at), last_bill_at, excluded.last_bill_at)',
+        (customer_key, bill.get('custName') if sign > 0 else None,
+         bill.get('custMobile') or None) + values + (ts, ts)
+    )
+
+
+def rebuild(conn, bills):
+    """
+    Recompute every aggregate from scratch.
+    bills yields (bill, date_key, month_key, customer_key) tuples.
+    """
+    for table in ('sales_daily', 'sales_monthly', 'customer_totals'):
+        conn.execute(f'DELETE FROM {table}')
+    for bill, date_key, month_key, customer_key in bills:
+        apply_bill(conn, bill, date_key, month_key, customer_key)
+
+
+def _totals(row):
+    return {
+        'bills': row['bills'],
+        'revenue': round(row['revenue'], 2),
+        'gst': round(row['gst'], 2),
+        'items': round(row['items'], 3)
+    }
+
+
+def daily(conn, date_from=None, date_to=None, limit=31):
+    """Per-day totals, newest first"""
+    where, params = ['bills > 0'], []
+    if date_from:
+        where.append('date_key >= ?')
+        params.append(date_from)
+    if date_to:
+        where.append('date_key <= ?')
+        params.append(date_to)
+    sql = 'SELECT * FROM sales_daily WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY date_key DESC LIMIT ?'
+    rows = conn.execute(sql, params + [limit]).fetchall()
+    return [{'date': row['date_key'], **_totals(row)} for row in rows]
+
+
+def monthly(conn, limit=12):
+    """Per-month totals, newest first"""
+    rows = conn.execute(
+        'SELECT * FROM sales_monthly WHERE bills > 0 ORDER BY month_key DESC LIMIT ?', (limit,)
+    ).fetchall()
+    return [{'month': row['month_key'], **_totals(row)} for row in rows]
+
+
+def top_customers(conn, limit=50, offset=0):
+    """Customers ranked by lifetime value"""
+    rows = conn.execute(
+        'SELECT * FROM customer_totals WHERE bills > 0 ORDER BY revenue DESC LIMIT ? OFFSET ?',
+        (limit, offset)
+    ).fetchall()
+    return [_customer(row) for row in rows]
+
+
+def customer(conn, customer_key):
+    """Lifetime totals for one customer, or None"""
+    row = conn.execute(
+        'SELECT * FROM customer_totals WHERE customer_key = ?', (customer_key,)
+    ).fetchone()
+    return _customer(row) if row else None
+
+
+def _customer(row):
+    return {
+        'key': row['customer_key'],
+        'name': row['name'],
+        'mobile': row['phone'] or '',
+        'firstBillAt': row['first_bill_at'],
+        'lastBillAt': row['last_bill_at'],
+        **_totals(row)
+    }
+
+
+def period(conn, date_key, month_key):
+    """Totals for one day and one month (zeroes if nothing was sold)"""
+    empty = {'bills': 0, 'revenue': 0.0, 'gst': 0.0, 'items': 0.0}
+    day = conn.execute('SELECT * FROM sales_daily WHERE date_key = ?', (date_key,)).fetchone()
+    month = conn.execute('SELECT * FROM sales_monthly WHERE month_key = ?', (month_key,)).fetchone()
+    return {
+        'today': {'date': date_key, **(_totals(day) if day else empty)},
+        'month': {'month': month_key, **(_totals(month) if month else empty)}
+    }
@@ -0,0 +1,372 @@
+"""
+Billing System - ASGI Serving Mode
+
+Serves the same app as create_app() under an ASGI server (uvicorn) so
+that one process can keep hundreds of gateway calls in flight:
+
+- The send endpoints (ASYNC_ROUTES) run as coroutines on the event loop
+  and call the SMS gateway through the pooled aiohttp clients
+  (backend.async_gateway_client). A request waiting on the gateway holds
+  a socket, not a thread.
+- Every other route (bills, reports, streaming, job status...) is the
+  unchanged Flask view, run on a bounded thread pool (ASGI_WSGI_WORKERS).
+- SQLite work inside the async views (queueing, scheduling, SQLite
+  idempotency keys) runs in a worker thread (asyncio.to_thread), so a
+  busy database never stalls the event loop. Flask's request context
+  travels with it.
+
+The async handlers go through the Flask request pipeline (CORS, request
+logging, metrics, error handlers) and build their responses with
+backend.services, so routes and response schemas are identical in both
+modes.
+
+Requires aiohttp, a2wsgi and uvicorn (see requirements.txt, ASGI mode).
+
+Usage:
+uvicorn --app-dir api asgi:app --workers 2
+"""
+
+import asyncio
+import io
+import logging
+import os
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import request
+
+from backend import metrics
+from backend.async_batching import map_ordered_async, send_grouped_async, send_in_chunks_async
+from backend.async_gateway_client import close_async_gateway_client
+from backend.batching import gateway_chunk_size
+from backend.factory import create_app
+from backend.gateways import REFUSED, current_gateway
+from backend.idempotency import idempotent_async
+from backend.notifications import DEFAULT_TEMPLATE, TEMPLATES, plan_batch, render
+from backend.routes.common import reply
+from backend.routes.sms import queue_sms, schedule_one, schedule_sms
+from backend.phones import clean_numbers
+from backend.services import (
+    batch_item_result, chunked_batch_response, error_body, failure_response,
+    not_configured, notification_results, numbers_batch_response,
+    scheduled_notifications_response, scheduled_numbers_response,
+    scheduled_sms_list_response, sent_body, sms_list_response, validate_phone,
+    validate_send_at, validate_sms, validate_sms_item, validate_sms_list
+)
+from backend.sms_queue import divert_to_queue, wants_async
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Async send endpoints (same contracts as backend/routes/sms.py)
+# ============================================================================
+
+async def send_sms():
+    try:
+        data = request.get_json(silent=True)
+        phone, message, error = validate_sms(data)
+        if error:
+            return reply(error)
+        send_at, error = validate_send_at(data)
+        if error:
+            return reply(error)
+
+        gateway = current_gateway()
+        if not gateway.configured:
+            return reply(not_configured())
+
+        async def deliver():
+            if send_at is not None:
+                return await asyncio.to_thread(schedule_one, phone, message, send_at, 'SMS')
+            if wants_async(request):
+                return await asyncio.to_thread(queue_sms, phone, message, 'SMS')
+            logger.info('📤 Sending SMS to %s...', phone)
+            return await send_one(gateway, phone, message, 'SMS')
+
+        return await idempotent_async(request, 'send-sms', phone, message, deliver)
+
+    except Exception as e:
+        logger.error('❌ Error in /api/send-sms: %s', e)
+        return reply(error_body(str(e), 500))
+
+
+async def send_batch_sms():
+    try:
+        data = request.get_json(silent=True)
+
+        if not data or 'numbers' not in data or 'message' not in data:
+            return reply(error_body('Missing numbers or message', 400))
+
+        numbers = data.get('numbers', [])
+        message = data.get('message')
+
+        if not isinstance(numbers, list) or len(numbers) == 0:
+            return reply(error_body('Invalid numbers list', 400))
+
+        send_at, error = validate_send_at(data)
+        if error:
+            return reply(error)
+
+        gateway = current_gateway()
+        if not gateway.configured:
+            return reply(not_configured())
+
+        unique, entries = clean_numbers(numbers)
+
+        if send_at is not None:
+            plan = await asyncio.to_thread(
+                schedule_sms, [(number, message) for number in unique], send_at, 'Batch SMS'
+            )
+            return reply(scheduled_numbers_response(entries, unique, plan))
+        metrics.BATCH_SIZE.observe(len(numbers), 'send-batch-sms')
+        chunks, recipients = await send_in_chunks_async(unique, message, gateway.send_async,
+                                                        chunk_size=gateway_chunk_size(gateway))
+
+        return reply(numbers_batch_response(entries, unique, chunks, recipients))
+
+    except Exception as e:
+        logger.error('Error: %s', e)
+        return reply(error_body(str(e), 500))
+
+
+async def send_sms_batch():
+    try:
+        data = request.get_json(silent=True)
+        sms_list, error = validate_sms_list(data)
+        if error:
+            return reply(error)
+        send_at, error = validate_send_at(data)
+        if error:
+            return reply(error)
+
+        gateway = current_gateway()
+        if not gateway.configured:
+            return reply(not_configured())
+
+        items = [validate_sms_item(sms) for sms in sms_list]
+
+        if send_at is not None:
+            plan = await asyncio.to_thread(
+                schedule_sms, [(phone, message) for phone, message, error in items if not error],
+                send_at, 'Batch SMS'
+            )
+            return reply(scheduled_sms_list_response(items, plan))
+
+        logger.info('📤 Sending %d SMS messages...', len(sms_list))
+
+        async def send_item(item):
+            # Never raises, so one bad entry cannot abort the rest of the batch
+            phone, message, error = item
+            if error:
+                return batch_item_result(phone, {'success': False, 'error': error})
+            try:
+                result = await gateway.send_async(phone, message)
+            except Exception as e:
+                logger.error('❌ SMS to %s failed: %s', phone, e)
+                result = {'success': False, 'error': str(e)}
+            return batch_item_result(phone, result)
+
+        metrics.BATCH_SIZE.observe(len(sms_list), 'send-sms-batch')
+        return reply(sms_list_response(await map_ordered_async(send_item, items)))
+
+    except Exception as e:
+        logger.error('❌ Batch SMS Error: %s', e)
+        return reply(error_body(str(e), 500))
+
+
+async def billing_notification():
+    try:
+        data = request.get_json(silent=True)
+
+        if not data or not data.get('phone'):
+            return reply(error_body('Missing required fields', 400))
+
+        phone, error = validate_phone(data.get('phone'))
+        if error:
+            return reply(error)
+        send_at, error = validate_send_at(data)
+        if error:
+            return reply(error)
+        message = render(DEFAULT_TEMPLATE, {
+            'customer_name': data.get('customer_name', 'Customer'),
+            'amount': data.get('amount', '0'),
+            'invoice_id': data.get('invoice_id', 'N/A')
+        })
+
+        gateway = current_gateway()
+        if not gateway.configured:
+            return reply(not_configured())
+
+        async def deliver():
+            if send_at is not None:
+                return await asyncio.to_thread(schedule_one, phone, message, send_at, 'Billing notification')
+            if wants_async(request):
+                return await asyncio.to_thread(queue_sms, phone, message, 'Billing notification')
+            return await send_one(gateway, phone, message, 'Billing notification')
+
+        return await idempotent_async(request, 'billing-notification', phone, message, deliver)
+
+    except Exception as e:
+        logger.error('Error: %s', e)
+        return reply(error_body(str(e), 500))
+
+
+async def billing_notification_batch():
+    try:
+        data = request.get_json(silent=True)
+
+        if not data or 'records' not in data:
+            return reply(error_body('Missing records', 400))
+
+        records = data.get('records')
+        template_id = data.get('template', DEFAULT_TEMPLATE)
+
+        if not isinstance(records, list) or len(records) == 0:
+            return reply(error_body('Invalid records list', 400))
+
+        if template_id not in TEMPLATES:
+            return reply(error_body(f'Unknown template: {template_id}', 400, templates=sorted(TEMPLATES)))
+
+        send_at, error = validate_send_at(data)
+        if error:
+            return reply(error)
+
+        gateway = current_gateway()
+        if not gateway.configured:
+            return reply(not_configured())
+
+        metrics.BATCH_SIZE.observe(len(records), 'billing-notification-batch')
+        groups, entries = plan_batch(records, template_id)
+
+        if send_at is not None:
+            plan = await asyncio.to_thread(
+                schedule_sms, [(phone, message) for message, phones in groups for phone in phones],
+                send_at, 'Billing notifications'
+            )
+            return reply(scheduled_notifications_response(entries, groups, plan, template_id))
+
+        chunks, recipients = await send_grouped_async(groups, gateway.send_async,
+                                                      chunk_size=gateway_chunk_size(gateway))
+
+        invalid = sum(1 for e in entries if 'error' in e)
+        return reply(chunked_batch_response(len(records), chunks, recipients, 'Billing notifications', {
+            'template': template_id,
+            'unique': len(recipients),
+            'duplicates': len(records) - len(recipients) - invalid,
+            'invalid': invalid,
+            'messages': len(groups),
+            'gatewayCalls': len(chunks),
+            'results': notification_results(entries, recipients)
+        }))
+
+    except Exception as e:
+        logger.error('Error: %s', e)
+        return reply(error_body(str(e), 500))
+
+
+async def send_one(gateway, phone, message, label):
+    """Send one message now and build the response"""
+    result = await gateway.send_async(phone, message)
+    if result['success']:
+        logger.info('✅ %s sent successfully to %s', label, phone)
+        return reply(sent_body(result, phone, label))
+    if result['error_type'] == REFUSED:
+        logger.warning('⏸️  %s to %s refused: %s', label, phone, result['error'])
+        if divert_to_queue():
+            return await asyncio.to_thread(queue_sms, phone, message, label, diverted=True)
+    return reply(failure_response(result, label))
+
+
+# (method, path) -> coroutine view; everything else is served by Flask
+ASYNC_ROUTES = {
+    ('POST', '/api/send-sms'): send_sms,
+    ('POST', '/api/send-batch-sms'): send_batch_sms,
+    ('POST', '/api/send-sms-batch'): send_sms_batch,
+    ('POST', '/api/billing-notification'): billing_notification,
+    ('POST', '/api/billing-notification-batch'): billing_notification_batch
+}
+
+
+# ============================================================================
+# ASGI application
+# ============================================================================
+
+class AsgiApp:
+    """ASGI callable: async send endpoints in front of the Flask app"""
+
+    def __init__(self, flask_app, routes=None, workers=None):
+        if workers is None:
+            workers = int(os.getenv('ASGI_WSGI_WORKERS', 10))
+        self.flask_app = flask_app
+        self.routes = ASYNC_ROUTES if routes is None else routes
+        self.wsgi = WSGIMiddleware(flask_app, workers=workers)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        view = None
+        if scope['type'] == 'http':
+            view = self.routes.get((scope['method'], scope['path']))
+        if view is None:
+            await self.wsgi(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        if body is None:
+            # Client went away before sending the whole request
+            return
+        response = await self._dispatch(scope, body, view)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(k.lower().encode('latin1'), v.encode('latin1'))
+                        for k, v in response.headers.to_wsgi_list()]
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+    async def _dispatch(self, scope, body, view):
+        """Flask's full_dispatch_request() around an awaited view"""
+        app = self.flask_app
+        ctx = app.request_context(build_environ(scope, io.BytesIO(body)))
+        ctx.push()
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await view()
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            return app.finalize_request(rv)
+        except Exception as e:
+            return app.handle_exception(e)
+        finally:
+            ctx.pop()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await close_async_gateway_client()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def create_asgi_app(gateway=None, cors_origin=None):
+    """create_app() served over ASGI; arguments as for create_app()"""
+    return AsgiApp(create_app(gateway=gateway, cors_origin=cors_origin))
@@ -0,0 +1,55 @@
+"""
+Billing System - Async Batch Dispatch Helpers
+
+Event-loop versions of backend.batching for the ASGI send endpoints:
+the same chunking, retries and result shapes, with a semaphore in place
+of the thread pool.
+"""
+
+import asyncio
+
+from backend.batching import batch_concurrency, chunk_recipients, chunk_result, plan_chunks, retryable
+
+
+async def map_ordered_async(fn, items, max_workers=None):
+    """
+    Await fn(item) for every item with at most max_workers in flight.
+    Results come back in input order.
+    """
+    semaphore = asyncio.Semaphore(max_workers or batch_concurrency())
+
+    async def run(item):
+        async with semaphore:
+            return await fn(item)
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+async def send_in_chunks_async(numbers, message, send, chunk_size=None, retries=None, max_workers=None):
+    """send_in_chunks() with an async send(numbers_csv, message)"""
+    chunks, recipients = await send_grouped_async([(message, numbers)], send, chunk_size, retries, max_workers)
+    for entry in chunks + recipients:
+        del entry['group']
+    return chunks, recipients
+
+
+async def send_grouped_async(groups, send, chunk_size=None, retries=None, max_workers=None):
+    """send_grouped() with an async send(numbers_csv, message)"""
+    tasks, retries = plan_chunks(groups, chunk_size, retries)
+
+    async def send_chunk(task):
+        _, _, message, chunk = task
+        result = {}
+        attempts = 0
+        while attempts <= retries:
+            attempts += 1
+            try:
+                result = await send(','.join(chunk), message)
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            if result.get('success') or not retryable(result):
+                break
+        return chunk_result(task, result, attempts)
+
+    chunks = await map_ordered_async(send_chunk, tasks, max_workers)
+    return chunks, chunk_recipients(chunks, tasks)
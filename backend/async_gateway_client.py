@@ -0,0 +1,182 @@
+"""
+Billing System - Async SMS Gateway Client
+
+The ASGI counterpart of backend.gateway_client: one aiohttp session per
+provider and process whose connection pool is shared by every in-flight
+send, so a single event loop can keep hundreds of gateway calls open
+without a thread each. Each shares the URL, rate limiter and circuit
+breaker of the provider's sync client, so the WSGI-served routes and the
+queue dispatcher in the same process draw on the same quota and see the
+same gateway health.
+
+Requires aiohttp (see requirements.txt, ASGI mode).
+
+Usage:
+from backend.async_gateway_client import get_async_gateway_client
+response = await get_async_gateway_client().post(data=payload, headers=headers)
+"""
+
+import asyncio
+import json as jsonlib
+import os
+import time
+
+import aiohttp
+
+from backend import metrics
+from backend.gateway_client import RETRY_STATUSES, _recipients, get_gateway_client
+from backend.protection import GatewayUnavailable
+
+
+class GatewayResponse:
+    """The parts of a gateway reply the gateway backends read, as on requests.Response"""
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+
+class AsyncGatewayClient:
+    """Pooled aiohttp client for one provider's send endpoint; use from one event loop"""
+
+    def __init__(self, sync_client=None, url=None, pool_size=None, connect_timeout=None,
+                 read_timeout=None, retries=None, backoff=None, limiter=None, breaker=None):
+        if sync_client is None:
+            sync_client = get_gateway_client()
+        if url is None:
+            url = sync_client.url
+        if pool_size is None:
+            # Far above SMS_POOL_SIZE: an open connection costs a socket,
+            # not a thread
+            pool_size = int(os.getenv('SMS_ASYNC_POOL_SIZE', 200))
+        if connect_timeout is None:
+            connect_timeout = sync_client.timeout[0]
+        if read_timeout is None:
+            read_timeout = sync_client.timeout[1]
+        if retries is None:
+            retries = int(os.getenv('SMS_RETRY_ATTEMPTS', 2))
+        if backoff is None:
+            backoff = float(os.getenv('SMS_RETRY_BACKOFF', 0.5))
+
+        self.name = sync_client.name
+        self.url = url
+        self.pool_size = pool_size
+        # sock_connect rather than connect: waiting for a free pooled
+        # connection is queueing, not a gateway failure, and must not
+        # trip the circuit breaker
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = limiter or sync_client.limiter
+        self.breaker = breaker or sync_client.breaker
+        # Created on first post(): a session belongs to the running loop
+        self.session = None
+
+    async def post(self, json=None, data=None, headers=None):
+        """
+        POST a payload to the gateway over a pooled connection.
+        Raises GatewayUnavailable without calling out when the circuit is
+        open or the rate limit is exhausted.
+        """
+        try:
+            self.breaker.before_call()
+        except GatewayUnavailable:
+            metrics.GATEWAY_ERRORS.inc(self.name, metrics.REFUSED)
+            raise
+        try:
+            wait = self.limiter.reserve(_recipients(json or data))
+        except Exception as e:
+            self.breaker.release()
+            if isinstance(e, GatewayUnavailable):
+                metrics.GATEWAY_ERRORS.inc(self.name, metrics.REFUSED)
+            raise
+
+        started = time.perf_counter()
+        try:
+            if wait:
+                await asyncio.sleep(wait)
+                started = time.perf_counter()
+            response = await self._post_with_retries(json, data, headers)
+        except asyncio.TimeoutError as e:
+            metrics.GATEWAY_LATENCY.observe(time.perf_counter() - started, self.name, metrics.TIMEOUT)
+            metrics.GATEWAY_ERRORS.inc(self.name, metrics.TIMEOUT)
+            self.breaker.record_failure(e)
+            raise
+        except aiohttp.ClientError as e:
+            metrics.GATEWAY_LATENCY.observe(time.perf_counter() - started, self.name, metrics.CONNECTION)
+            metrics.GATEWAY_ERRORS.inc(self.name, metrics.CONNECTION)
+            self.breaker.record_failure(e)
+            raise
+        except BaseException:
+            # Includes cancellation when the client disconnects
+            self.breaker.release()
+            raise
+        metrics.GATEWAY_LATENCY.observe(time.perf_counter() - started, self.name, str(response.status_code))
+        self.breaker.record_success()
+        return response
+
+    async def _post_with_retries(self, json, data, headers):
+        # Sending an SMS is not idempotent: retry only when the request
+        # never reached the gateway (connect errors) or was refused
+        # outright with 429/503. Read timeouts are never retried.
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=self.timeout
+            )
+        attempt = 0
+        while True:
+            try:
+                async with self.session.post(self.url, json=json, data=data, headers=headers) as reply:
+                    response = GatewayResponse(reply.status, await reply.read())
+            except aiohttp.ClientConnectorError:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+            attempt += 1
+            await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+
+    def metrics(self):
+        """Rate limiter and circuit breaker counters for /api/status"""
+        return {
+            'rateLimit': self.limiter.metrics(),
+            'circuitBreaker': self.breaker.metrics()
+        }
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+_clients = {}
+
+
+def get_async_gateway_client(sync_client=None):
+    """
+    Return the process-wide async client for the provider of `sync_client`
+    (default: Fast2SMS), creating it on first use. A client belongs to the
+    event loop that first used it; no lock is needed because everything
+    on that loop runs on one thread.
+    """
+    if sync_client is None:
+        sync_client = get_gateway_client()
+    client = _clients.get(sync_client.name)
+    if client is None:
+        client = _clients[sync_client.name] = AsyncGatewayClient(sync_client)
+    return client
+
+
+async def close_async_gateway_client():
+    """Close every provider's pooled connections (ASGI lifespan shutdown)"""
+    while _clients:
+        _, client = _clients.popitem()
+        await client.close()
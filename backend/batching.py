@@ -0,0 +1,175 @@
+"""
+Billing System - Batch Dispatch Helpers
+
+Bounded-concurrency fan-out for batch endpoints, and splitting large
+recipient lists into gateway-sized multi-number requests.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.gateways import CONNECTION
+
+# Gateway replies that reject a request without sending it
+RETRY_STATUSES = (429, 503)
+
+
+def batch_concurrency():
+    """Max gateway calls in flight for a single batch request"""
+    return max(1, int(os.getenv('SMS_BATCH_CONCURRENCY', 10)))
+
+
+def gateway_chunk_size(gateway):
+    """Chunk size for a gateway: the default, or 1 if it takes one number per call"""
+    return None if gateway.multi_recipient else 1
+
+
+def retryable(result):
+    """
+    True when a failed send is known not to have been sent: no connection
+    could be made (after the client's own connect retries), or the
+    gateway answered 429 / 503. Timeouts, connections lost mid-request,
+    exceptions and other errors may have been delivered, and sends
+    refused by the local rate limit or breaker would be refused again.
+    """
+    return result.get('error_type') == CONNECTION or result.get('status_code') in RETRY_STATUSES
+
+
+def chunked(items, size):
+    """Yield successive lists of at most `size` items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def map_ordered(fn, items, max_workers=None):
+    """
+    Apply fn to every item on a bounded thread pool.
+    Results come back in input order.
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = min(max_workers or batch_concurrency(), len(items))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fn, items))
+
+
+def imap_bounded(fn, items, max_workers=None):
+    """
+    Lazily apply fn to an iterable of any length on a bounded thread pool,
+    yielding results in input order. At most 2 x max_workers items are
+    pulled ahead of the consumer, so memory stays constant however long
+    the input is.
+    """
+    workers = max_workers or batch_concurrency()
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def send_in_chunks(numbers, message, send, chunk_size=None, retries=None, max_workers=None):
+    """
+    Send one message to many numbers as parallel multi-number requests.
+
+    send(numbers_csv, message) performs one gateway call and returns a
+    dict with 'success' and optionally 'request_id', 'error',
+    'error_type' and 'status_code'. A chunk that failed before reaching
+    the provider (see retryable) is retried on its own, up to `retries`
+    extra attempts.
+
+    Returns (chunks, recipients):
+    chunks     - [{'chunk', 'size', 'success', 'attempts', 'requestId', 'gateway',
+                   'error', 'statusCode'}]
+    recipients - [{'phone', 'success', 'chunk'}] in input order
+    """
+    chunks, recipients = send_grouped([(message, numbers)], send, chunk_size, retries, max_workers)
+    for entry in chunks + recipients:
+        del entry['group']
+    return chunks, recipients
+
+
+def send_grouped(groups, send, chunk_size=None, retries=None, max_workers=None):
+    """
+    Send several distinct messages, each to its own list of numbers.
+
+    groups is a list of (message, numbers). Every group is split into
+    multi-number chunks and all chunks, across all groups, share one
+    bounded pool, so single-recipient messages go out concurrently with
+    the large ones. Chunks are retried like send_in_chunks.
+
+    Returns (chunks, recipients) as send_in_chunks does, with a 'group'
+    index added to every entry.
+    """
+    tasks, retries = plan_chunks(groups, chunk_size, retries)
+
+    def send_chunk(task):
+        index, group, message, chunk = task
+        result = {}
+        attempts = 0
+        while attempts <= retries:
+            attempts += 1
+            try:
+                result = send(','.join(chunk), message)
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            if result.get('success') or not retryable(result):
+                break
+        return chunk_result(task, result, attempts)
+
+    chunks = map_ordered(send_chunk, tasks, max_workers)
+    return chunks, chunk_recipients(chunks, tasks)
+
+
+def plan_chunks(groups, chunk_size=None, retries=None):
+    """
+    Split (message, numbers) groups into (index, group, message, numbers)
+    chunk tasks; returns (tasks, retries) with the env defaults applied.
+    """
+    if chunk_size is None:
+        chunk_size = int(os.getenv('SMS_BATCH_CHUNK_SIZE', 100))
+    if retries is None:
+        retries = int(os.getenv('SMS_CHUNK_RETRIES', 1))
+    chunk_size = max(1, chunk_size)
+
+    tasks = []
+    for group, (message, numbers) in enumerate(groups):
+        numbers = [str(n) for n in numbers]
+        for batch in chunked(numbers, chunk_size):
+            tasks.append((len(tasks), group, message, batch))
+    return tasks, retries
+
+
+def chunk_result(task, result, attempts):
+    """Outcome entry for one chunk task after its last attempt"""
+    index, group, _, chunk = task
+    return {
+        'chunk': index,
+        'group': group,
+        'size': len(chunk),
+        'success': bool(result.get('success')),
+        'attempts': attempts,
+        'requestId': result.get('request_id'),
+        'gateway': result.get('gateway'),
+        'error': None if result.get('success') else result.get('error', 'Failed to send chunk'),
+        'statusCode': result.get('status_code')
+    }
+
+
+def chunk_recipients(chunks, tasks):
+    """Per-recipient outcomes, in input order, from the chunk outcomes"""
+    recipients = []
+    for chunk, task in zip(chunks, tasks):
+        for phone in task[3]:
+            recipients.append({
+                'phone': phone,
+                'success': chunk['success'],
+                'chunk': chunk['chunk'],
+                'group': chunk['group']
+            })
+    return recipients
@@ -0,0 +1,48 @@
+"""
+Billing System - SQLite Helpers
+
+Thread-local SQLite connections in WAL mode, so request threads, background
+workers and separate gunicorn processes can share one database file.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class Database:
+    """One SQLite file with a connection per thread"""
+
+    def __init__(self, path, schema=None):
+        self.path = path
+        self._local = threading.local()
+        if schema:
+            self.connection().executescript(schema)
+
+    def connection(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; writes use transaction() explicitly
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block of statements as one write transaction.
+        BEGIN IMMEDIATE takes the write lock up front, so read-then-update
+        sequences cannot race with other threads or processes.
+        """
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
@@ -0,0 +1,394 @@
+"""
+Billing System - SMS Delivery Reports
+
+Keeps the gateway request_id of every sent SMS and what became of it, so
+delivery can be checked without the vendor dashboard:
+
+- Successful sends are recorded as 'sent' (request_id, phone) rows. The
+  send path only appends to an in-memory buffer; a writer thread flushes
+  it every DLR_FLUSH_INTERVAL seconds (or DLR_FLUSH_SIZE rows) as one
+  multi-row transaction, so tracking adds no SQLite write per send.
+- Delivery reports (DLRs) pushed to /api/delivery-reports are stored in
+  bulk, one transaction per webhook call.
+- With FAST2SMS_DLR_URL set, a poller asks Fast2SMS for reports on sends
+  still without a final status, for gateways that cannot call back.
+
+Statuses are normalized to sent / delivered / failed / unknown; a late
+'sent' never overwrites a final 'delivered' or 'failed'. Rows live in
+SQLite (DELIVERY_DB), keyed by (request_id, phone) and indexed by phone
+and by status.
+
+Usage:
+from backend.delivery import get_delivery_store
+store = get_delivery_store()
+store.ingest([{'request_id': 'abc123', 'phone': '919876543210', 'status': 'Delivered'}])
+page = store.query(phone='919876543210')
+"""
+
+import atexit
+import hmac
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from backend import metrics
+from backend.db import Database
+from backend.phones import normalize
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sms_deliveries (
+    request_id TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    status TEXT NOT NULL,
+    provider_status TEXT,
+    error TEXT,
+    gateway TEXT,
+    sent_at REAL,
+    reported_at REAL,
+    polled_at REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (request_id, phone)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sms_deliveries_phone ON sms_deliveries (phone, updated_at);
+CREATE INDEX IF NOT EXISTS idx_sms_deliveries_status ON sms_deliveries (status, sent_at);
+"""
+
+# Delivery states
+SENT = 'sent'
+DELIVERED = 'delivered'
+FAILED = 'failed'
+UNKNOWN = 'unknown'
+STATES = (SENT, DELIVERED, FAILED, UNKNOWN)
+
+# Provider status words -> delivery state (Fast2SMS, Twilio, common SMPP)
+STATUSES = {
+    'delivered': DELIVERED, 'delivrd': DELIVERED, 'read': DELIVERED, 'success': DELIVERED,
+    'failed': FAILED, 'undelivered': FAILED, 'undeliv': FAILED, 'rejected': FAILED,
+    'expired': FAILED, 'dnd': FAILED, 'blocked': FAILED, 'canceled': FAILED,
+    'sent': SENT, 'queued': SENT, 'accepted': SENT, 'sending': SENT,
+    'submitted': SENT, 'pending': SENT, 'scheduled': SENT, 'enroute': SENT
+}
+
+# Field names used by the gateways' callbacks and report APIs
+REQUEST_ID_FIELDS = ('request_id', 'requestId', 'MessageSid', 'SmsSid')
+PHONE_FIELDS = ('phone', 'number', 'mobile', 'To')
+STATUS_FIELDS = ('status', 'MessageStatus', 'SmsStatus', 'delivery_status')
+ERROR_FIELDS = ('error', 'error_code', 'ErrorCode', 'description')
+
+# Most reports accepted by one webhook call
+MAX_REPORTS = 5000
+
+TRACK_SQL = (
+    'INSERT INTO sms_deliveries (request_id, phone, status, gateway, sent_at, updated_at) '
+    'VALUES (?, ?, ?, ?, ?, ?) '
+    # A report can beat the writer thread to the row
+    'ON CONFLICT (request_id, phone) DO UPDATE SET gateway = excluded.gateway, sent_at = excluded.sent_at'
+)
+
+REPORT_SQL = (
+    'INSERT INTO sms_deliveries (request_id, phone, status, provider_status, error, reported_at, updated_at) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT (request_id, phone) DO UPDATE SET status = excluded.status, '
+    'provider_status = excluded.provider_status, error = excluded.error, '
+    'reported_at = excluded.reported_at, updated_at = excluded.updated_at '
+    # Reports arrive out of order: never step back from a final state
+    "WHERE sms_deliveries.status NOT IN ('delivered', 'failed') OR excluded.status IN ('delivered', 'failed')"
+)
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+
+def _field(report, names):
+    for name in names:
+        value = report.get(name)
+        if value not in (None, ''):
+            return str(value).strip()
+    return None
+
+
+def delivery_state(provider_status):
+    """sent / delivered / failed / unknown for a provider's status word"""
+    return STATUSES.get((provider_status or '').strip().lower(), UNKNOWN)
+
+
+def extract_reports(payload):
+    """Report dicts in a webhook or poll body: a list, one report, or {"reports"|"data": [...]}"""
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        for key in ('reports', 'data'):
+            if isinstance(payload.get(key), list):
+                return payload[key]
+        return [payload]
+    return []
+
+
+def parse_report(report, request_id=None):
+    """(row values for REPORT_SQL, None) or (None, reason) for one report"""
+    if not isinstance(report, dict):
+        return None, 'Report must be an object'
+    request_id = _field(report, REQUEST_ID_FIELDS) or request_id
+    raw_phone = _field(report, PHONE_FIELDS)
+    provider_status = _field(report, STATUS_FIELDS)
+    if not request_id or not raw_phone or not provider_status:
+        return None, 'request_id, phone and status are required'
+    phone, error = normalize(raw_phone)
+    if error:
+        # Match what was recorded at send time where possible, but keep
+        # reports for numbers this backend would not have normalized
+        phone = ''.join(filter(str.isdigit, raw_phone)) or raw_phone
+    now = time.time()
+    return (request_id, phone, delivery_state(provider_status), provider_status,
+            _field(report, ERROR_FIELDS), now, now), None
+
+
+class DeliveryStore:
+    """SQLite-backed delivery status store with a buffered writer for sends"""
+
+    def __init__(self, path, flush_interval=None, flush_size=None, poll_url=None):
+        self.db = Database(path, SCHEMA)
+        self.flush_interval = flush_interval if flush_interval is not None else float(
+            os.getenv('DLR_FLUSH_INTERVAL', 1))
+        self.flush_size = flush_size if flush_size is not None else int(os.getenv('DLR_FLUSH_SIZE', 500))
+        self.poll_url = poll_url if poll_url is not None else os.getenv('FAST2SMS_DLR_URL')
+
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._thread_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    # ------------------------------------------------------------------
+    # Sends
+    # ------------------------------------------------------------------
+
+    def track(self, request_id, numbers, gateway=None):
+        """Buffer 'sent' rows for every recipient of one gateway call"""
+        now = time.time()
+        rows = [(request_id, phone.strip(), SENT, gateway, now, now)
+                for phone in str(numbers).split(',') if phone.strip()]
+        with self._buffer_lock:
+            self._buffer.extend(rows)
+            full = len(self._buffer) >= self.flush_size
+        self.start()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write buffered send rows in one transaction; returns the row count"""
+        with self._buffer_lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        try:
+            with self.db.transaction() as conn:
+                conn.executemany(TRACK_SQL, rows)
+        except Exception as e:
+            logger.error('❌ Delivery tracking write failed for %d rows: %s', len(rows), e)
+            with self._buffer_lock:
+                # Keep them for the next flush, unless writes keep failing
+                if len(self._buffer) < self.flush_size * 100:
+                    self._buffer[:0] = rows
+            return 0
+        return len(rows)
+
+    # ------------------------------------------------------------------
+    # Reports
+    # ------------------------------------------------------------------
+
+    def ingest(self, reports, request_id=None):
+        """
+        Store a list of delivery reports in one transaction. request_id
+        fills in reports that do not carry their own (poll replies).
+        Returns {'received', 'stored', 'rejected': [{'index', 'error'}]}.
+        """
+        rows = []
+        rejected = []
+        for index, report in enumerate(reports):
+            row, error = parse_report(report, request_id)
+            if error:
+                rejected.append({'index': index, 'error': error})
+            else:
+                rows.append(row)
+
+        if rows:
+            with self.db.transaction() as conn:
+                conn.executemany(REPORT_SQL, rows)
+            for row in rows:
+                metrics.DELIVERY_REPORTS.inc(row[2])
+        return {'received': len(reports), 'stored': len(rows), 'rejected': rejected}
+
+    def query(self, request_id=None, phone=None, status=None, limit=50, offset=0):
+        """Delivery rows, most recently updated first, as a page dict"""
+        where, params = [], []
+        if request_id:
+            where.append('request_id = ?')
+            params.append(request_id)
+        if phone:
+            number, _ = normalize(phone)
+            where.append('phone = ?')
+            params.append(number or phone)
+        if status:
+            where.append('status = ?')
+            params.append(status)
+        sql = 'SELECT * FROM sms_deliveries'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY updated_at DESC LIMIT ? OFFSET ?'
+
+        self.flush()
+        rows = self.db.connection().execute(sql, params + [limit + 1, offset]).fetchall()
+        return {
+            'items': [self._report(row) for row in rows[:limit]],
+            'limit': limit,
+            'offset': offset,
+            'hasMore': len(rows) > limit
+        }
+
+    def counts(self, request_id):
+        """{status: recipients} for one gateway request"""
+        self.flush()
+        rows = self.db.connection().execute(
+            'SELECT status, COUNT(*) AS n FROM sms_deliveries WHERE request_id = ? GROUP BY status',
+            (request_id,)
+        ).fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    @staticmethod
+    def _report(row):
+        return {
+            'requestId': row['request_id'],
+            'phone': row['phone'],
+            'status': row['status'],
+            'providerStatus': row['provider_status'],
+            'error': row['error'],
+            'gateway': row['gateway'],
+            'sentAt': _iso(row['sent_at']),
+            'reportedAt': _iso(row['reported_at']),
+            'updatedAt': _iso(row['updated_at'])
+        }
+
+    # ------------------------------------------------------------------
+    # Polling fallback
+    # ------------------------------------------------------------------
+
+    def poll(self, batch=None, min_age=None, max_age=None):
+        """
+        Fetch reports for Fast2SMS sends still 'sent' after min_age
+        seconds (and at most max_age old); returns the reports stored
+        """
+        import requests
+        from backend.gateways import GATEWAYS
+
+        batch = batch if batch is not None else int(os.getenv('DLR_POLL_BATCH', 50))
+        min_age = min_age if min_age is not None else float(os.getenv('DLR_POLL_MIN_AGE', 60))
+        max_age = max_age if max_age is not None else float(os.getenv('DLR_POLL_MAX_AGE', 86400))
+        routes = [route for route, gateway in GATEWAYS.items() if gateway.provider == 'fast2sms']
+
+        now = time.time()
+        request_ids = [row[0] for row in self.db.connection().execute(
+            'SELECT request_id FROM sms_deliveries '
+            f'WHERE status = ? AND sent_at BETWEEN ? AND ? AND gateway IN ({", ".join("?" * len(routes))}) '
+            'AND (polled_at IS NULL OR polled_at <= ?) '
+            'GROUP BY request_id ORDER BY MIN(sent_at) LIMIT ?',
+            [SENT, now - max_age, now - min_age, *routes, now - min_age, batch]
+        ).fetchall()]
+
+        stored = 0
+        for request_id in request_ids:
+            try:
+                response = requests.get(
+                    self.poll_url,
+                    params={'request_id': request_id},
+                    headers={'authorization': os.getenv('FAST2SMS_API_KEY', '')},
+                    timeout=(3.05, 10)
+                )
+                response.raise_for_status()
+                stored += self.ingest(extract_reports(response.json()), request_id=request_id)['stored']
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.warning('⚠️  Delivery report poll failed for %s: %s', request_id, e)
+            with self.db.transaction() as conn:
+                conn.execute('UPDATE sms_deliveries SET polled_at = ? WHERE request_id = ?',
+                             (time.time(), request_id))
+        return stored
+
+    # ------------------------------------------------------------------
+    # Background threads
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the writer (and poller, if configured) threads once"""
+        if self._threads:
+            return
+        with self._thread_lock:
+            if self._threads:
+                return
+            targets = [('delivery-writer', self._run_writer)]
+            if self.poll_url:
+                targets.append(('delivery-poller', self._run_poller))
+            for name, target in targets:
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.flush()
+
+    def _run_writer(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _run_poller(self):
+        interval = float(os.getenv('DLR_POLL_INTERVAL', 60))
+        while not self._stop.wait(interval):
+            try:
+                stored = self.poll()
+                if stored:
+                    logger.info('📬 Polled %d delivery reports', stored)
+            except Exception as e:
+                logger.error('❌ Delivery report polling failed: %s', e)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_delivery_store():
+    """Return the process-wide delivery store, opening it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DeliveryStore(os.getenv('DELIVERY_DB', 'delivery_reports.db'))
+    return _store
+
+
+def record_sent(result, numbers):
+    """Remember a successful gateway call so its delivery reports can be matched"""
+    if not result.get('request_id') or os.getenv('DELIVERY_TRACKING', 'true').lower() != 'true':
+        return
+    try:
+        get_delivery_store().track(result['request_id'], numbers, result.get('gateway'))
+    except Exception as e:
+        # Tracking must never fail a send that went out
+        logger.error('❌ Delivery tracking failed: %s', e)
+
+
+def webhook_authorized(token):
+    """True when no DLR_WEBHOOK_TOKEN is set or `token` matches it"""
+    expected = os.getenv('DLR_WEBHOOK_TOKEN')
+    return not expected or hmac.compare_digest(str(token or '').encode('utf-8'), expected.encode('utf-8'))
@@ -0,0 +1,123 @@
+"""
+Billing System - Streaming Exports
+
+Bills and customers written out as CSV or NDJSON, optionally gzipped,
+a chunk at a time. Records come from the store's keyset-paged iterators
+(Store.iter_bills / iter_customers), so an export holds one page of
+records and one output chunk in memory however long the history is.
+
+Usage:
+from backend.exports import BILL_COLUMNS, bill_row, encode
+chunks = encode(store.iter_bills(), 'csv', BILL_COLUMNS, bill_row, compress=True)
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+FORMATS = ('csv', 'ndjson')
+MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson'
+}
+GZIP_MIMETYPE = 'application/gzip'
+
+# Bytes buffered before a chunk is handed to the server
+CHUNK_SIZE = 64 * 1024
+
+BILL_COLUMNS = (
+    'id', 'ts', 'date', 'month', 'customerName', 'customerMobile', 'type', 'lines',
+    'quantity', 'subtotal', 'totalDiscount', 'gst', 'grandTotal', 'paymentMethod',
+    'received', 'balance', 'version'
+)
+CUSTOMER_COLUMNS = ('key', 'name', 'mobile', 'lastBillAt', 'bills', 'totalSpent', 'version')
+
+
+def bill_row(bill):
+    """One CSV row (BILL_COLUMNS) for a stored bill"""
+    items = [it for it in bill.get('items') or [] if isinstance(it, dict)]
+    gst = bill.get('gst') or {}
+    payment = bill.get('payment') or {}
+    return (
+        bill.get('id'), bill.get('ts'), bill.get('date'), bill.get('month'),
+        bill.get('custName'), bill.get('custMobile'), bill.get('type', 'sale'), len(items),
+        sum(_number(it.get('qty')) for it in items), bill.get('subtotal'),
+        bill.get('totalDiscount'), gst.get('totalGST') if gst.get('enabled') else 0,
+        bill.get('grandTotal'), payment.get('method'), payment.get('received'),
+        payment.get('balance'), bill.get('version')
+    )
+
+
+def customer_row(customer):
+    """One CSV row (CUSTOMER_COLUMNS) for a stored customer"""
+    return tuple(customer.get(column) for column in CUSTOMER_COLUMNS)
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_date(value, name):
+    """None or a YYYY-MM-DD string, validated"""
+    if not value:
+        return None
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'"{name}" must be a date (YYYY-MM-DD)')
+    return value
+
+
+def filename(kind, fmt, compress, date_from=None, date_to=None):
+    """Download name, e.g. bills_2026-01-01_2026-01-31.csv.gz"""
+    span = '_'.join(d for d in (date_from, date_to) if d) or datetime.now().strftime('%Y%m%d-%H%M%S')
+    return f'{kind}_{span}.{fmt}' + ('.gz' if compress else '')
+
+
+def _lines(records, fmt, columns, row):
+    """Encoded output text, one record at a time"""
+    if fmt == 'ndjson':
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    for record in records:
+        writer.writerow(row(record))
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    yield out.getvalue()
+
+
+def encode(records, fmt, columns, row, compress=False):
+    """
+    Yield the export as byte chunks of about CHUNK_SIZE.
+    fmt: 'csv' (header + row(record) per record) or 'ndjson' (record as is)
+    compress: gzip the stream (a single .gz member)
+    """
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    size = 0
+    for text in _lines(records, fmt, columns, row):
+        data = text.encode('utf-8')
+        if gzip is not None:
+            data = gzip.compress(data)
+        if not data:
+            continue
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if gzip is not None:
+        buffer.append(gzip.flush())
+    if buffer:
+        yield b''.join(buffer)
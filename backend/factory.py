@@ -0,0 +1,110 @@
+"""
+Billing System - App Factory
+
+One Flask application for every deployment: api/app.py, api/index.py
+(Vercel) and python-flask-backend.py all call create_app() and differ
+only in the gateway route, default CORS origin and the health / status
+defaults they pass.
+
+Nothing heavy is built here. The Fast2SMS HTTP client, the SQLite store,
+the SMS queue and the scheduler are each created on first use, so a
+serverless cold start only pays for Flask and the routes it registers.
+
+Usage:
+from backend.factory import create_app
+app = create_app(gateway='q')
+"""
+
+import logging
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+from flask import Flask, jsonify, request
+from flask_cors import CORS
+
+from backend import metrics
+from backend.gateways import make_gateway
+from backend.logs import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(gateway=None, cors_origin=None, blueprints=None, environment='development', health_status='ok'):
+    """
+    Build the app.
+
+    gateway        gateway route name ('q', 'dlt' or 'twilio'; SMS_GATEWAY_ROUTE
+                   and SMS_GATEWAYS win)
+    cors_origin    default allowed origin when CORS_ORIGIN is not set
+    blueprints     blueprints to register (default: backend.routes.BLUEPRINTS)
+    environment    /api/status "environment" when FLASK_ENV is not set
+    health_status  /api/health "status", kept per entry point for existing
+                   health checks
+    """
+    # Load environment variables
+    load_dotenv()
+
+    # Configure logging (LOG_FORMAT / LOG_ASYNC / LOG_LEVEL, see backend.logs)
+    configure_logging()
+
+    app = Flask(__name__)
+    app.config['DEFAULT_ENVIRONMENT'] = environment
+    app.config['HEALTH_STATUS'] = health_status
+
+    # Configure CORS
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": os.getenv('CORS_ORIGIN', cors_origin or 'http://localhost'),
+            "methods": ["POST", "GET", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Idempotency-Key"],
+            "expose_headers": ["Idempotent-Replayed"]
+        }
+    })
+
+    app.extensions['sms_gateway'] = make_gateway(gateway)
+
+    # Per-route request counts and latency for /api/metrics
+    metrics.instrument_app(app)
+
+    # Before request logging
+    @app.before_request
+    def log_request():
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('[%s] %s %s', datetime.now().isoformat(), request.method, request.path)
+
+    # Scheduled and queued sends persisted by an earlier process go out
+    # without waiting for a new one to be scheduled or enqueued
+    resumed = []
+
+    @app.before_request
+    def resume_scheduled_sends():
+        if not resumed:
+            from backend.scheduler import resume_scheduler
+            from backend.sms_queue import resume_sms_queue
+            resume_scheduler(app.extensions['sms_gateway'])
+            resume_sms_queue(app.extensions['sms_gateway'])
+            resumed.append(True)
+
+    if blueprints is None:
+        from backend.routes import BLUEPRINTS as blueprints
+    for blueprint in blueprints:
+        app.register_blueprint(blueprint)
+
+    # Error handlers
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({
+            'success': False,
+            'error': 'Endpoint not found'
+        }), 404
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        logger.error('❌ Internal Server Error: %s', error)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+    return app
@@ -0,0 +1,189 @@
+"""
+Billing System - SMS Gateway Client
+
+One keep-alive HTTP session per SMS provider, shared by every send path,
+so messages reuse pooled TCP/TLS connections to the gateway instead of
+paying a new handshake per request. Every call first passes the
+provider's own rate limiter and circuit breaker from backend.protection,
+so one provider failing never refuses calls to another.
+
+Usage:
+from backend.gateway_client import get_gateway_client
+response = get_gateway_client().post(data=payload, headers=headers)
+response = get_gateway_client('twilio', url=url).post(data=payload, headers=headers)
+"""
+
+import os
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from backend import metrics
+from backend.protection import CircuitBreaker, GatewayUnavailable, TokenBucket
+
+# Configuration
+FAST2SMS = 'fast2sms'
+FAST2SMS_URL = 'https://www.fast2sms.com/dev/bulkV2'
+
+# Responses that mean the gateway rejected the call without processing it
+RETRY_STATUSES = (429, 503)
+
+
+class GatewayClient:
+    """Pooled, thread-safe HTTP client for one provider's send endpoint"""
+
+    def __init__(self, name=FAST2SMS, url=None, pool_size=None, connect_timeout=None,
+                 read_timeout=None, retries=None, backoff=None, limiter=None, breaker=None):
+        # Settings are read here rather than at import time so that
+        # entry points can call load_dotenv() after importing this module
+        if url is None:
+            # Point at a local stub (see benchmarks/) for offline runs
+            url = os.getenv('FAST2SMS_URL', FAST2SMS_URL)
+        if pool_size is None:
+            # Keep one pooled connection per batch worker by default
+            pool_size = int(os.getenv('SMS_POOL_SIZE', os.getenv('SMS_BATCH_CONCURRENCY', 10)))
+        if connect_timeout is None:
+            connect_timeout = float(os.getenv('SMS_CONNECT_TIMEOUT', 3.05))
+        if read_timeout is None:
+            read_timeout = float(os.getenv('SMS_READ_TIMEOUT', 10))
+        if retries is None:
+            retries = int(os.getenv('SMS_RETRY_ATTEMPTS', 2))
+        if backoff is None:
+            backoff = float(os.getenv('SMS_RETRY_BACKOFF', 0.5))
+
+        if limiter is None:
+            # Messages per second allowed by the DLT quota (0 = unlimited)
+            rate = float(os.getenv('SMS_RATE_LIMIT', 0))
+            limiter = TokenBucket(
+                rate,
+                capacity=float(os.getenv('SMS_RATE_BURST', rate)),
+                max_wait=float(os.getenv('SMS_RATE_MAX_WAIT', 2))
+            )
+        if breaker is None:
+            breaker = CircuitBreaker(
+                threshold=int(os.getenv('SMS_BREAKER_THRESHOLD', 5)),
+                reset_timeout=float(os.getenv('SMS_BREAKER_RESET', 30))
+            )
+
+        self.name = name
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.limiter = limiter
+        self.breaker = breaker
+
+        # Sending an SMS is not idempotent: retry only when the request
+        # never reached the gateway (connect errors) or was refused
+        # outright. Read timeouts are never retried.
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            other=0,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'POST']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=retry
+        )
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # The cookie jar is the only shared mutable state on a Session;
+        # the gateway needs no cookies, so never store any
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def post(self, json=None, data=None, headers=None):
+        """
+        POST a payload to the gateway over a pooled connection.
+        Raises GatewayUnavailable without calling out when the circuit is
+        open or the rate limit is exhausted.
+        """
+        try:
+            self.breaker.before_call()
+        except GatewayUnavailable:
+            metrics.GATEWAY_ERRORS.inc(self.name, metrics.REFUSED)
+            raise
+        try:
+            self.limiter.acquire(_recipients(json or data))
+        except Exception as e:
+            self.breaker.release()
+            if isinstance(e, GatewayUnavailable):
+                metrics.GATEWAY_ERRORS.inc(self.name, metrics.REFUSED)
+            raise
+
+        started = time.perf_counter()
+        try:
+            response = self.session.post(
+                self.url,
+                json=json,
+                data=data,
+                headers=headers,
+                timeout=self.timeout
+            )
+        except requests.exceptions.Timeout as e:
+            metrics.GATEWAY_LATENCY.observe(time.perf_counter() - started, self.name, metrics.TIMEOUT)
+            metrics.GATEWAY_ERRORS.inc(self.name, metrics.TIMEOUT)
+            self.breaker.record_failure(e)
+            raise
+        except requests.exceptions.ConnectionError as e:
+            metrics.GATEWAY_LATENCY.observe(time.perf_counter() - started, self.name, metrics.CONNECTION)
+            metrics.GATEWAY_ERRORS.inc(self.name, metrics.CONNECTION)
+            self.breaker.record_failure(e)
+            raise
+        except Exception:
+            self.breaker.release()
+            raise
+        metrics.GATEWAY_LATENCY.observe(time.perf_counter() - started, self.name, str(response.status_code))
+        self.breaker.record_success()
+        return response
+
+    def metrics(self):
+        """Rate limiter and circuit breaker counters for /api/status"""
+        return {
+            'rateLimit': self.limiter.metrics(),
+            'circuitBreaker': self.breaker.metrics()
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def _recipients(payload):
+    """Number of SMS a payload sends; the DLT quota counts each recipient"""
+    numbers = (payload or {}).get('numbers') or (payload or {}).get('phone') or ''
+    return max(1, str(numbers).count(',') + 1)
+
+
+_clients = {}
+_client_lock = threading.Lock()
+
+
+def get_gateway_client(name=FAST2SMS, **options):
+    """
+    Return the process-wide client for a provider, creating it on first
+    use; `options` (GatewayClient arguments) only apply to that first call
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _client_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = GatewayClient(name=name, **options)
+    return client
+
+
+metrics.register_gauge(
+    'sms_gateway_circuit_open', 'Whether a provider\'s circuit breaker is refusing calls (1) or not (0)',
+    lambda: {(name,): int(client.breaker.state != 'closed') for name, client in list(_clients.items())},
+    labels=('provider',)
+)
@@ -0,0 +1,213 @@
+"""
+Billing System - Multi-Gateway Router
+
+Sends through several SMS providers (SMS_GATEWAYS=dlt,twilio) behind the
+single-gateway interface of backend.gateways, so the views, batch
+helpers and queue dispatcher use it unchanged:
+
+- Every provider keeps a rolling window of recent call outcomes
+  (SMS_ROUTER_WINDOW calls, at most SMS_ROUTER_MAX_AGE seconds old).
+- A provider is healthy while its circuit breaker admits calls and its
+  success rate over the window is at least SMS_ROUTER_MIN_SUCCESS (once
+  it has SMS_ROUTER_MIN_SAMPLES outcomes).
+- Each send goes to the healthy provider with the lowest mean latency;
+  a provider with no recent samples ranks first so that its numbers are
+  refreshed, which also brings a recovered provider back into rotation.
+  One whose recent calls all failed ranks after every provider with a
+  measured latency, in configured order.
+- When a call fails without reaching the provider (connection error,
+  circuit open, rate limited) or the provider answers 401/403/429/5xx,
+  the same message is sent through the next provider in line. Timeouts
+  only fail over with SMS_FAILOVER_ON_TIMEOUT=true: a timed-out message
+  may still have been delivered, and failing over would send it twice.
+
+Multi-number sends only go to providers that take several recipients
+per call (Fast2SMS); single-recipient providers (Twilio) get the rest.
+
+Usage:
+SMS_GATEWAYS=dlt,twilio  (see backend.gateways.make_gateway)
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from backend.gateways import API, CONNECTION, REFUSED, TIMEOUT, _failure
+
+logger = logging.getLogger(__name__)
+
+# Gateway replies that say "this provider cannot take it", not "this message is bad"
+FAILOVER_STATUSES = (401, 403, 429)
+
+
+class ProviderStats:
+    """Rolling window of (time, ok, latency) outcomes for one provider"""
+
+    def __init__(self, window=50, max_age=120.0):
+        self.samples = deque(maxlen=max(1, window))
+        self.max_age = max_age
+        self.calls = 0
+        self.failures = 0
+        self.failovers = 0
+        self._lock = threading.Lock()
+
+    def record(self, ok, latency):
+        with self._lock:
+            self.samples.append((time.monotonic(), ok, latency))
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+
+    def failed_over(self):
+        with self._lock:
+            self.failovers += 1
+
+    def summary(self):
+        """Sample count, success rate and mean latency (seconds) of successful calls"""
+        with self._lock:
+            cutoff = time.monotonic() - self.max_age
+            while self.samples and self.samples[0][0] < cutoff:
+                self.samples.popleft()
+            latencies = [latency for _, ok, latency in self.samples if ok]
+            samples = len(self.samples)
+        return {
+            'samples': samples,
+            'successRate': len(latencies) / samples if samples else None,
+            'latency': sum(latencies) / len(latencies) if latencies else None
+        }
+
+
+class GatewayRouter:
+    """Latency-ranked, failing-over router over several gateway backends"""
+
+    name = 'Router'
+
+    def __init__(self, gateways, window=None, max_age=None, min_success=None,
+                 min_samples=None, failover_on_timeout=None):
+        if window is None:
+            window = int(os.getenv('SMS_ROUTER_WINDOW', 50))
+        if max_age is None:
+            max_age = float(os.getenv('SMS_ROUTER_MAX_AGE', 120))
+        if min_success is None:
+            min_success = float(os.getenv('SMS_ROUTER_MIN_SUCCESS', 0.8))
+        if min_samples is None:
+            min_samples = int(os.getenv('SMS_ROUTER_MIN_SAMPLES', 5))
+        if failover_on_timeout is None:
+            failover_on_timeout = os.getenv('SMS_FAILOVER_ON_TIMEOUT', 'false').lower() in ('1', 'true', 'yes')
+
+        self.gateways = list(gateways)
+        self.route = ','.join(gateway.route for gateway in self.gateways)
+        self.min_success = min_success
+        self.min_samples = min_samples
+        self.failover_on_timeout = failover_on_timeout
+        self.stats = {gateway.route: ProviderStats(window, max_age) for gateway in self.gateways}
+
+    @property
+    def configured(self):
+        return any(gateway.configured for gateway in self.gateways)
+
+    @property
+    def multi_recipient(self):
+        """Multi-number chunks only when some configured provider takes them"""
+        return any(gateway.configured and gateway.multi_recipient for gateway in self.gateways)
+
+    def ranked(self, numbers):
+        """Configured providers able to take `numbers`, best first"""
+        multi = ',' in str(numbers)
+        scored = []
+        for index, gateway in enumerate(self.gateways):
+            if not gateway.configured or (multi and not gateway.multi_recipient):
+                continue
+            summary = self.stats[gateway.route].summary()
+            healthy = self._healthy(gateway, summary)
+            latency = summary['latency']
+            if summary['samples'] == 0:
+                # No recent calls at all: rank as fastest so it gets measured
+                latency = 0.0
+            elif latency is None:
+                # Called but never succeeded: behind every measured provider
+                latency = float('inf')
+            scored.append((not healthy, latency, index, gateway))
+        scored.sort(key=lambda item: item[:3])
+        return [item[3] for item in scored]
+
+    def _healthy(self, gateway, summary):
+        if not gateway.available():
+            return False
+        return summary['samples'] < self.min_samples or summary['successRate'] >= self.min_success
+
+    def send(self, numbers, message):
+        result = None
+        for gateway in self.ranked(numbers):
+            if result is not None:
+                self._failed_over(result)
+            started = time.perf_counter()
+            result = gateway.send(numbers, message)
+            if not self._settle(gateway, result, time.perf_counter() - started):
+                return result
+        return result or _no_gateway()
+
+    async def send_async(self, numbers, message):
+        """send() for the event loop; requires aiohttp"""
+        result = None
+        for gateway in self.ranked(numbers):
+            if result is not None:
+                self._failed_over(result)
+            started = time.perf_counter()
+            result = await gateway.send_async(numbers, message)
+            if not self._settle(gateway, result, time.perf_counter() - started):
+                return result
+        return result or _no_gateway()
+
+    def _settle(self, gateway, result, elapsed):
+        """Record the outcome; True when the message should go to the next provider"""
+        error_type = result['error_type']
+        if error_type == REFUSED:
+            # Refused locally: says nothing about the provider's latency
+            return True
+        failed = error_type in (TIMEOUT, CONNECTION) or (error_type == API and _provider_error(result))
+        self.stats[gateway.route].record(not failed, elapsed)
+        return failed and (error_type != TIMEOUT or self.failover_on_timeout)
+
+    def _failed_over(self, result):
+        self.stats[result['gateway']].failed_over()
+        logger.warning('↪️  %s failed (%s: %s), trying next gateway',
+                       result['gateway'], result['error_type'], result['error'])
+
+    def metrics(self):
+        """Per-provider health, rolling stats and protection counters for /api/status"""
+        providers = []
+        for gateway in self.gateways:
+            stats = self.stats[gateway.route]
+            summary = stats.summary()
+            entry = {
+                'gateway': gateway.route,
+                'name': gateway.name,
+                'configured': gateway.configured,
+                'samples': summary['samples'],
+                'successRate': round(summary['successRate'], 3) if summary['successRate'] is not None else None,
+                'latencyMs': round(summary['latency'] * 1000, 1) if summary['latency'] is not None else None,
+                'calls': stats.calls,
+                'failures': stats.failures,
+                'failovers': stats.failovers
+            }
+            if gateway.configured:
+                entry['healthy'] = self._healthy(gateway, summary)
+                entry.update(gateway.metrics())
+            providers.append(entry)
+        return {
+            'strategy': 'fastest-healthy',
+            'failoverOnTimeout': self.failover_on_timeout,
+            'providers': providers
+        }
+
+
+def _provider_error(result):
+    status = result.get('status_code') or 0
+    return status >= 500 or status in FAILOVER_STATUSES
+
+
+def _no_gateway():
+    return _failure(REFUSED, 'No configured SMS gateway can send this message', retry_after=1.0)
@@ -0,0 +1,376 @@
+"""
+Billing System - SMS Gateway Backends
+
+Every SMS provider the backend can send through, behind one interface:
+
+- 'q'      Fast2SMS quick route, form-encoded, success = HTTP 200 (api/app.py, api/index.py)
+- 'dlt'    Fast2SMS DLT route, JSON, success = "return": true (python-flask-backend.py)
+- 'twilio' Twilio Messages API, one recipient per call, success = HTTP 2xx
+
+send(numbers, message) never raises; every outcome comes back as
+{
+    'success': bool,
+    'status_code': int or None,
+    'request_id': str or None,
+    'data': dict or None,
+    'error': str or None,
+    'error_type': None | 'api' | 'timeout' | 'connection' | 'refused',
+    'retry_after': float or None,  # only for 'refused'
+    'gateway': str                 # route of the backend that answered
+}
+
+'connection' means the request never reached the provider (connect
+failed or timed out), so it is safe to send again. 'timeout' means it may
+have: no reply in time, or the connection dropped once the request was
+on its way. Such a message must not be re-sent automatically.
+
+Each provider has its own pooled client, rate limiter and circuit
+breaker (backend.gateway_client). With SMS_GATEWAYS set to more than one
+route, make_gateway() returns a backend.gateway_router.GatewayRouter that
+sends through the fastest healthy provider and fails over between them.
+
+The HTTP client (and with it `requests`) is imported on the first send,
+so a cold start that never sends an SMS does not pay for it. In ASGI mode
+(backend/asgi.py) `await send_async(numbers, message)` returns the same
+dicts over the pooled aiohttp client.
+
+Usage:
+from backend.gateways import current_gateway
+result = current_gateway().send('919876543210', 'Your bill message')
+"""
+
+import base64
+import logging
+import os
+
+from flask import current_app
+
+from backend import metrics
+from backend.phones import to_e164
+
+logger = logging.getLogger(__name__)
+# Full gateway replies; sampled with LOG_RESPONSE_SAMPLE_RATE (see backend.logs)
+response_logger = logging.getLogger('backend.gateways.responses')
+
+# Error types
+API = metrics.API
+TIMEOUT = metrics.TIMEOUT
+CONNECTION = metrics.CONNECTION
+REFUSED = metrics.REFUSED
+
+LOST = 'Connection lost - SMS gateway may have received the message'
+
+
+class SMSGateway:
+    """Shared send path; subclasses pick the client, build the payload and read the reply"""
+
+    route = None
+    name = None
+    # Provider name: labels metrics and keys the pooled client
+    provider = None
+    # Whether one call can carry comma-separated numbers
+    multi_recipient = True
+
+    @property
+    def configured(self):
+        raise NotImplementedError
+
+    def client(self):
+        """The provider's pooled sync client (imports requests)"""
+        raise NotImplementedError
+
+    def async_client(self):
+        """The provider's pooled async client (imports aiohttp)"""
+        from backend.async_gateway_client import get_async_gateway_client
+        return get_async_gateway_client(self.client())
+
+    def available(self):
+        """False while the provider's circuit breaker is refusing calls"""
+        return self.client().breaker.allows_call()
+
+    def send(self, numbers, message):
+        # Imported here rather than at module level: requests is the
+        # slowest import on a serverless cold start
+        import requests
+        from backend.protection import GatewayUnavailable
+
+        try:
+            response = self.post(self.client(), numbers, message)
+        except GatewayUnavailable as e:
+            return self._tag(_failure(REFUSED, str(e), retry_after=e.retry_after))
+        except requests.exceptions.ConnectTimeout:
+            logger.error('❌ Connection error - Cannot reach %s', self.name)
+            return self._tag(_failure(CONNECTION, 'Connection error - Cannot reach SMS gateway'))
+        except requests.exceptions.Timeout:
+            logger.error('❌ Request timeout - %s not responding', self.name)
+            return self._tag(_failure(TIMEOUT, 'Request timeout - SMS gateway not responding'))
+        except requests.exceptions.ConnectionError as e:
+            if _never_connected(e):
+                logger.error('❌ Connection error - Cannot reach %s', self.name)
+                return self._tag(_failure(CONNECTION, 'Connection error - Cannot reach SMS gateway'))
+            # Reset or closed after the request went out
+            logger.error('❌ Connection to %s lost mid-request: %s', self.name, e)
+            return self._tag(_failure(TIMEOUT, LOST))
+        except requests.exceptions.RequestException as e:
+            logger.error('❌ %s Error: %s', self.name, e)
+            return self._tag(_failure(TIMEOUT, str(e)))
+        except ValueError as e:
+            # Request the gateway cannot express, e.g. several numbers for Twilio
+            return self._tag(_failure(API, str(e)))
+
+        return self._result(response, numbers)
+
+    async def send_async(self, numbers, message):
+        """send() for the event loop; requires aiohttp"""
+        import asyncio
+
+        import aiohttp
+        from backend.protection import GatewayUnavailable
+
+        try:
+            response = await self.post(self.async_client(), numbers, message)
+        except GatewayUnavailable as e:
+            return self._tag(_failure(REFUSED, str(e), retry_after=e.retry_after))
+        except (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError) as e:
+            logger.error('❌ Connection error - Cannot reach %s (%s: %s)', self.name, type(e).__name__, e)
+            return self._tag(_failure(CONNECTION, 'Connection error - Cannot reach SMS gateway'))
+        except asyncio.TimeoutError:
+            logger.error('❌ Request timeout - %s not responding', self.name)
+            return self._tag(_failure(TIMEOUT, 'Request timeout - SMS gateway not responding'))
+        except aiohttp.ClientError as e:
+            # Reset or closed after the request went out
+            logger.error('❌ Connection to %s lost mid-request (%s: %s)', self.name, type(e).__name__, e)
+            return self._tag(_failure(TIMEOUT, LOST))
+        except ValueError as e:
+            return self._tag(_failure(API, str(e)))
+
+        return self._result(response, numbers)
+
+    def _result(self, response, numbers):
+        result = self._tag(self.parse(response))
+        if result['success']:
+            from backend.delivery import record_sent
+            record_sent(result, numbers)
+        else:
+            metrics.GATEWAY_ERRORS.inc(self.provider, API)
+        return result
+
+    def _tag(self, result):
+        result['gateway'] = self.route
+        return result
+
+    def post(self, client, numbers, message):
+        """
+        Issue the gateway call through `client` (sync or async: the
+        async client returns an awaitable)
+        """
+        raise NotImplementedError
+
+    def parse(self, response):
+        raise NotImplementedError
+
+    def metrics(self):
+        """Rate limiter / circuit breaker counters (creates the client)"""
+        return self.client().metrics()
+
+
+class Fast2SMSGateway(SMSGateway):
+    """Fast2SMS bulk endpoint; both routes share one pooled client"""
+
+    name = 'Fast2SMS'
+    provider = 'fast2sms'
+
+    @property
+    def api_key(self):
+        return os.getenv('FAST2SMS_API_KEY')
+
+    @property
+    def configured(self):
+        return bool(self.api_key)
+
+    def client(self):
+        from backend.gateway_client import get_gateway_client
+        return get_gateway_client(self.provider)
+
+
+class QuickRouteGateway(Fast2SMSGateway):
+    """Fast2SMS quick ('q') route: form-encoded, comma-separated numbers"""
+
+    route = 'q'
+
+    def post(self, client, numbers, message):
+        payload = {
+            'route': 'q',
+            'message': message,
+            'numbers': numbers
+        }
+        return client.post(data=payload, headers={'authorization': self.api_key})
+
+    def parse(self, response):
+        data = _json(response)
+        if response.status_code != 200:
+            return _failure(API, response.text, status_code=response.status_code, data=data)
+        return {
+            'success': True,
+            'status_code': 200,
+            'request_id': data.get('request_id') if data else None,
+            'data': data,
+            'error': None,
+            'error_type': None,
+            'retry_after': None
+        }
+
+
+class DLTRouteGateway(Fast2SMSGateway):
+    """Fast2SMS DLT route: JSON body, success reported in "return\""""
+
+    route = 'dlt'
+
+    def post(self, client, numbers, message):
+        payload = {
+            'phone': numbers,
+            'message': message,
+            'route': 'dlt',
+            'flash': 0
+        }
+        headers = {
+            'authorization': self.api_key,
+            'Content-Type': 'application/json'
+        }
+        return client.post(json=payload, headers=headers)
+
+    def parse(self, response):
+        data = _json(response)
+        response_logger.info('📨 Fast2SMS Response %s: %s', response.status_code, data, extra={
+            'status_code': response.status_code, 'request_id': data.get('request_id') if data else None
+        })
+        if data and data.get('return'):
+            return {
+                'success': True,
+                'status_code': response.status_code,
+                'request_id': data.get('request_id'),
+                'data': data,
+                'error': None,
+                'error_type': None,
+                'retry_after': None
+            }
+        error = data.get('message', 'API returned error') if data else response.text or 'API returned error'
+        if isinstance(error, list):
+            error = ' '.join(str(part) for part in error)
+        return _failure(API, error, status_code=response.status_code, data=data)
+
+
+class TwilioGateway(SMSGateway):
+    """Twilio Messages API: form-encoded, one recipient per call, Basic auth"""
+
+    route = 'twilio'
+    name = 'Twilio'
+    provider = 'twilio'
+    multi_recipient = False
+
+    URL = 'https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json'
+
+    @property
+    def account_sid(self):
+        return os.getenv('TWILIO_ACCOUNT_SID')
+
+    @property
+    def configured(self):
+        return bool(self.account_sid and os.getenv('TWILIO_AUTH_TOKEN') and os.getenv('TWILIO_FROM_NUMBER'))
+
+    def client(self):
+        from backend.gateway_client import get_gateway_client
+        # TWILIO_URL points at a local stub (see benchmarks/) for offline runs
+        url = os.getenv('TWILIO_URL') or self.URL.format(sid=self.account_sid)
+        return get_gateway_client(self.provider, url=url)
+
+    def post(self, client, numbers, message):
+        credentials = f'{self.account_sid}:{os.getenv("TWILIO_AUTH_TOKEN")}'.encode('utf-8')
+        payload = {
+            'To': to_e164(numbers),
+            'From': os.getenv('TWILIO_FROM_NUMBER'),
+            'Body': message
+        }
+        if os.getenv('TWILIO_STATUS_CALLBACK'):
+            # Twilio posts delivery updates here (/api/delivery-reports)
+            payload['StatusCallback'] = os.getenv('TWILIO_STATUS_CALLBACK')
+        headers = {'Authorization': 'Basic ' + base64.b64encode(credentials).decode('ascii')}
+        return client.post(data=payload, headers=headers)
+
+    def parse(self, response):
+        data = _json(response)
+        if 200 <= response.status_code < 300:
+            return {
+                'success': True,
+                'status_code': response.status_code,
+                'request_id': data.get('sid') if data else None,
+                'data': data,
+                'error': None,
+                'error_type': None,
+                'retry_after': None
+            }
+        error = data.get('message') if data else None
+        return _failure(API, error or response.text or 'API returned error',
+                        status_code=response.status_code, data=data)
+
+
+GATEWAYS = {
+    QuickRouteGateway.route: QuickRouteGateway,
+    DLTRouteGateway.route: DLTRouteGateway,
+    TwilioGateway.route: TwilioGateway
+}
+
+
+def _json(response):
+    try:
+        data = response.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _never_connected(error):
+    """True when a requests ConnectionError was raised before any byte of the request was sent"""
+    from urllib3.exceptions import ConnectTimeoutError, MaxRetryError
+
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    # NewConnectionError (refused, unreachable, DNS) subclasses ConnectTimeoutError
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def _failure(error_type, error, status_code=None, data=None, retry_after=None):
+    return {
+        'success': False,
+        'status_code': status_code,
+        'request_id': None,
+        'data': data,
+        'error': error,
+        'error_type': error_type,
+        'retry_after': retry_after
+    }
+
+
+def make_gateway(route=None):
+    """
+    Gateway backend for a route name; SMS_GATEWAY_ROUTE overrides the
+    default, and SMS_GATEWAYS (comma-separated routes, in order of
+    preference) overrides both and routes between several providers
+    """
+    routes = list(dict.fromkeys(r.strip() for r in os.getenv('SMS_GATEWAYS', '').split(',') if r.strip()))
+    if not routes:
+        routes = [os.getenv('SMS_GATEWAY_ROUTE') or route or QuickRouteGateway.route]
+    for name in routes:
+        if name not in GATEWAYS:
+            raise ValueError(f'Unknown SMS gateway route: {name} (expected one of: {", ".join(GATEWAYS)})')
+    if len(routes) == 1:
+        return GATEWAYS[routes[0]]()
+
+    from backend.gateway_router import GatewayRouter
+    return GatewayRouter([GATEWAYS[name]() for name in routes])
+
+
+def current_gateway():
+    """The gateway backend of the app handling this request"""
+    return current_app.extensions['sms_gateway']
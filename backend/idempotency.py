@@ -0,0 +1,267 @@
+"""
+Billing System - Idempotent SMS Sends
+
+Suppresses duplicate sends caused by double clicks and client retries.
+A send is identified by its Idempotency-Key header when the client sends
+one, otherwise by a hash of (phone, message) for SMS_DEDUPE_WINDOW
+seconds. The first request runs; duplicates get the stored response
+back (with an Idempotent-Replayed header) without calling the gateway.
+A duplicate that arrives while the first is still running waits for it.
+
+Keys live in a bounded in-memory TTL/LRU cache, or in SQLite when
+IDEMPOTENCY_DB is set, so every gunicorn worker sees the same keys.
+
+Usage:
+from backend.idempotency import idempotent
+return idempotent(request, 'send-sms', phone, message, deliver)
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, jsonify, make_response
+
+from backend.db import Database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    state TEXT NOT NULL,
+    status INTEGER,
+    body TEXT,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at);
+"""
+
+# Claim outcomes
+NEW = 'new'
+PENDING = 'pending'
+DONE = 'done'
+MISMATCH = 'mismatch'
+
+# How long an in-flight claim blocks duplicates if its worker dies
+PENDING_SECONDS = 60
+# Poll interval while waiting for an in-flight duplicate
+WAIT_POLL_SECONDS = 0.05
+
+
+class MemoryIdempotencyStore:
+    """Per-process TTL/LRU store"""
+
+    def __init__(self, size):
+        self.size = max(1, size)
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, key, fingerprint):
+        """Reserve key for this request; returns (state, record)"""
+        now = time.time()
+        with self._lock:
+            record = self._items.get(key)
+            if record is not None and record['expires_at'] > now:
+                self._items.move_to_end(key)
+                if record['fingerprint'] != fingerprint:
+                    return MISMATCH, record
+                return record['state'], record
+            self._items[key] = {
+                'fingerprint': fingerprint,
+                'state': PENDING,
+                'status': None,
+                'body': None,
+                'expires_at': now + PENDING_SECONDS
+            }
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+            return NEW, None
+
+    def complete(self, key, status, body, ttl):
+        with self._lock:
+            record = self._items.get(key)
+            if record is not None:
+                record.update(state=DONE, status=status, body=body, expires_at=time.time() + ttl)
+
+    def release(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+class SQLiteIdempotencyStore:
+    """Store shared by every process using the same SQLite file"""
+
+    def __init__(self, path):
+        self.db = Database(path, SCHEMA)
+
+    def claim(self, key, fingerprint):
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute('DELETE FROM idempotency_keys WHERE expires_at <= ?', (now,))
+            row = conn.execute(
+                'SELECT * FROM idempotency_keys WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                record = dict(row)
+                if record['fingerprint'] != fingerprint:
+                    return MISMATCH, record
+                return record['state'], record
+            conn.execute(
+                'INSERT INTO idempotency_keys (key, fingerprint, state, expires_at) VALUES (?, ?, ?, ?)',
+                (key, fingerprint, PENDING, now + PENDING_SECONDS)
+            )
+        return NEW, None
+
+    def complete(self, key, status, body, ttl):
+        with self.db.transaction() as conn:
+            conn.execute(
+                'UPDATE idempotency_keys SET state = ?, status = ?, body = ?, expires_at = ? WHERE key = ?',
+                (DONE, status, body, time.time() + ttl, key)
+            )
+
+    def release(self, key):
+        with self.db.transaction() as conn:
+            conn.execute('DELETE FROM idempotency_keys WHERE key = ?', (key,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store():
+    """Return the process-wide key store, creating it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = os.getenv('IDEMPOTENCY_DB')
+                if path:
+                    _store = SQLiteIdempotencyStore(path)
+                else:
+                    _store = MemoryIdempotencyStore(int(os.getenv('IDEMPOTENCY_CACHE_SIZE', 10000)))
+    return _store
+
+
+def fingerprint(phone, message):
+    return hashlib.sha256(f'{phone}\n{message}'.encode('utf-8')).hexdigest()
+
+
+def request_key(request, scope, phone, message):
+    """
+    (key, fingerprint, ttl) identifying this send, or None when neither an
+    Idempotency-Key header nor content deduplication applies.
+    """
+    digest = fingerprint(phone, message)
+    header = request.headers.get('Idempotency-Key', '').strip()
+    if header:
+        return f'{scope}:key:{header}', digest, float(os.getenv('IDEMPOTENCY_TTL', 86400))
+    window = float(os.getenv('SMS_DEDUPE_WINDOW', 60))
+    if window <= 0:
+        return None
+    return f'{scope}:hash:{digest}', digest, window
+
+
+def idempotent(request, scope, phone, message, handler):
+    """
+    Run handler() at most once per idempotency key and return its
+    response; duplicates get the first response replayed.
+
+    Only 2xx responses are kept, so a send that failed can be retried
+    straight away. Exceptions from handler() release the key and
+    propagate.
+    """
+    identity = request_key(request, scope, phone, message)
+    if identity is None:
+        return handler()
+    key, digest, ttl = identity
+
+    store = get_idempotency_store()
+    deadline = time.monotonic() + float(os.getenv('IDEMPOTENCY_WAIT', 10))
+    while True:
+        claimed, response = _claim(store, key, digest, deadline)
+        if claimed:
+            break
+        if response is not None:
+            return response
+        time.sleep(WAIT_POLL_SECONDS)
+
+    try:
+        response = make_response(handler())
+    except BaseException:
+        store.release(key)
+        raise
+    return _finish(store, key, ttl, response)
+
+
+async def idempotent_async(request, scope, phone, message, handler):
+    """
+    idempotent() for an async handler; waits without blocking the event
+    loop, and runs SQLite store calls in a worker thread
+    """
+    import asyncio
+
+    identity = request_key(request, scope, phone, message)
+    if identity is None:
+        return await handler()
+    key, digest, ttl = identity
+
+    store = get_idempotency_store()
+
+    async def call(fn, *args):
+        if isinstance(store, MemoryIdempotencyStore):
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    deadline = time.monotonic() + float(os.getenv('IDEMPOTENCY_WAIT', 10))
+    while True:
+        claimed, response = await call(_claim, store, key, digest, deadline)
+        if claimed:
+            break
+        if response is not None:
+            return response
+        await asyncio.sleep(WAIT_POLL_SECONDS)
+
+    try:
+        response = make_response(await handler())
+    except BaseException:
+        await call(store.release, key)
+        raise
+    return await call(_finish, store, key, ttl, response)
+
+
+def _claim(store, key, digest, deadline):
+    """
+    One claim attempt: (True, None) when this request should run,
+    (False, response) when it is answered without running, and
+    (False, None) when an identical request is in flight and the caller
+    should poll again.
+    """
+    state, record = store.claim(key, digest)
+    if state == NEW:
+        return True, None
+    if state == MISMATCH:
+        return False, (jsonify({
+            'error': 'Idempotency-Key was already used for a different phone or message'
+        }), 422)
+    if state == DONE:
+        return False, Response(
+            record['body'],
+            status=record['status'],
+            mimetype='application/json',
+            headers={'Idempotent-Replayed': 'true'}
+        )
+    if time.monotonic() >= deadline:
+        return False, (jsonify({'error': 'An identical request is still being processed'}), 409)
+    return False, None
+
+
+def _finish(store, key, ttl, response):
+    """Keep a 2xx JSON response for replay; release the key otherwise"""
+    if 200 <= response.status_code < 300 and response.is_json:
+        store.complete(key, response.status_code, response.get_data(as_text=True), ttl)
+    else:
+        store.release(key)
+    return response
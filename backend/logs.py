@@ -0,0 +1,138 @@
+"""
+Billing System - Logging Setup
+
+Plain text lines on stderr by default, as before. Under heavy batch load
+three switches cut the cost of logging on request threads:
+
+- LOG_FORMAT=json writes one JSON object per line (time, level, logger,
+  message and any `extra` fields), for log shippers.
+- LOG_ASYNC=true hands records to a bounded queue (LOG_QUEUE_SIZE) that
+  a listener thread formats and writes, so request threads never wait
+  on stderr or a log file. When the queue is full, records are dropped
+  and counted (log_records_dropped_total) rather than blocking sends.
+- LOG_RESPONSE_SAMPLE_RATE=0.01 keeps 1 in 100 of the verbose gateway
+  response lines (logger backend.gateways.responses).
+
+LOG_LEVEL (default INFO) applies in every mode; WARNING drops the
+per-request lines entirely.
+
+Usage:
+from backend.logs import configure_logging
+configure_logging()
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from backend import metrics
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Verbose gateway replies are logged here so they can be sampled on their own
+RESPONSE_LOGGER = 'backend.gateways.responses'
+
+# LogRecord attributes; anything else on a record came from `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+LOG_DROPPED = metrics.REGISTRY.register(metrics.Counter(
+    'log_records_dropped_total', 'Log records dropped because the log queue was full'
+))
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the listener thread
+    and drops records instead of blocking when the queue is full
+    """
+
+    def prepare(self, record):
+        # The stock prepare() formats the message here, on the request
+        # thread. Only the traceback is rendered now, while its frames
+        # are still alive.
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+class SampleFilter(logging.Filter):
+    """Lets through a `rate` fraction of records (warnings and errors always pass)"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def configure_logging():
+    """
+    Set up the root logger from the LOG_* settings. Like
+    logging.basicConfig(), it leaves a root logger that already has
+    handlers alone, so it is safe to call for every app created.
+    """
+    global _listener
+    with _configure_lock:
+        root = logging.getLogger()
+        if root.handlers:
+            return
+
+        level = os.getenv('LOG_LEVEL', 'INFO').upper()
+        handler = logging.StreamHandler()
+        if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+            handler.setFormatter(JSONFormatter())
+        else:
+            handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        if os.getenv('LOG_ASYNC', 'false').lower() == 'true':
+            records = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+            _listener = QueueListener(records, handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+            handler = NonBlockingQueueHandler(records)
+
+        root.addHandler(handler)
+        root.setLevel(level)
+
+        rate = float(os.getenv('LOG_RESPONSE_SAMPLE_RATE', 1))
+        if rate < 1:
+            logging.getLogger(RESPONSE_LOGGER).addFilter(SampleFilter(rate))
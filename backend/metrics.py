@@ -0,0 +1,198 @@
+"""
+Billing System - Metrics
+
+Counters, histograms and gauges rendered in the Prometheus text
+exposition format for /api/metrics, without any extra dependency.
+
+Metrics are kept per process; under gunicorn each worker reports its own
+numbers, so scrape the workers individually or sum them in Prometheus.
+
+Usage:
+from backend.metrics import instrument_app, render_metrics
+instrument_app(app)
+"""
+
+import threading
+import time
+
+from flask import g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.label_names, labels)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    le = _labels(self.label_names, labels, [('le', _number(bound))])
+                    lines.append(f'{self.name}_bucket{le} {cumulative}')
+                plain = _labels(self.label_names, labels)
+                lines.append(f'{self.name}_sum{plain} {_number(series["sum"])}')
+                lines.append(f'{self.name}_count{plain} {series["count"]}')
+        return lines
+
+
+class Gauge:
+    """
+    Value read from a callback at scrape time. With label names, read()
+    returns {label values tuple: value} instead of a single value.
+    """
+
+    def __init__(self, name, help, read, labels=()):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.label_names = tuple(labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        try:
+            if self.label_names:
+                for labels, value in sorted(self.read().items()):
+                    lines.append(f'{self.name}{_labels(self.label_names, labels)} {_number(value)}')
+            else:
+                lines.append(f'{self.name} {_number(self.read())}')
+        except Exception:
+            # A broken gauge must not take the whole scrape down
+            pass
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total', 'HTTP requests handled', ('method', 'route', 'status')
+))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Time to produce a response', ('method', 'route')
+))
+GATEWAY_LATENCY = REGISTRY.register(Histogram(
+    'sms_gateway_request_duration_seconds', 'Gateway call latency by provider and HTTP status or failure',
+    ('provider', 'status')
+))
+GATEWAY_ERRORS = REGISTRY.register(Counter(
+    'sms_gateway_errors_total', 'Failed gateway calls by provider and type', ('provider', 'type')
+))
+DELIVERY_REPORTS = REGISTRY.register(Counter(
+    'sms_delivery_reports_total', 'Delivery reports stored by delivery state', ('status',)
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    'sms_batch_size', 'Recipients per batch request', ('endpoint',), SIZE_BUCKETS
+))
+
+# Gateway error types
+TIMEOUT = 'timeout'
+CONNECTION = 'connection'
+API = 'api'
+REFUSED = 'refused'
+
+
+def register_gauge(name, help, read, labels=()):
+    return REGISTRY.register(Gauge(name, help, read, labels))
+
+
+def render_metrics():
+    return REGISTRY.render()
+
+
+def instrument_app(app):
+    """Count and time every request, labelled by route template"""
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # The rule template keeps ids out of the label set
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_REQUESTS.inc(request.method, route, str(response.status_code))
+            HTTP_LATENCY.observe(time.perf_counter() - started, request.method, route)
+        return response
+
+    return app
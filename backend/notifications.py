@@ -0,0 +1,89 @@
+"""
+Billing System - Notification Templates
+
+Message templates for customer notifications, compiled once at import
+time, and the planning step for batch sends: render every record, normalize
+phone numbers, drop duplicate recipients and group identical texts so each distinct message
+goes out as multi-number gateway calls.
+
+Usage:
+from backend.notifications import plan_batch
+groups, entries = plan_batch(records, 'due_reminder')
+"""
+
+from string import Template
+
+from backend.phones import normalize
+
+DEFAULT_TEMPLATE = 'billing'
+
+TEMPLATES = {
+    'billing': Template(
+        'Hi $customer_name, Your billing amount is Rs. $amount. Invoice ID: $invoice_id. Thank you!'
+    ),
+    'due_reminder': Template(
+        'Hi $customer_name, a payment of Rs. $amount for Invoice ID: $invoice_id is due. '
+        'Please pay at the earliest. Thank you!'
+    ),
+    'payment_received': Template(
+        'Hi $customer_name, we have received your payment of Rs. $amount for Invoice ID: $invoice_id. Thank you!'
+    )
+}
+
+
+def render(template_id, record):
+    """Render one notification; raises KeyError for unknown templates"""
+    return TEMPLATES[template_id].substitute(
+        customer_name=record.get('customer_name') or 'Customer',
+        amount=record.get('amount', '0'),
+        invoice_id=record.get('invoice_id') or 'N/A'
+    )
+
+
+def plan_batch(records, template_id):
+    """
+    Render a batch of {phone, customer_name, amount, invoice_id} records.
+
+    Returns (groups, entries):
+    groups  - [(message, [phones])] with each (phone, message) pair once,
+              in first-seen order
+    entries - one dict per record in input order: {'index', 'phone',
+              'invoiceId', 'group', 'duplicate'}, or {'index', 'phone',
+              'error'} when the record cannot be sent
+    """
+    group_index = {}
+    groups = []
+    seen = set()
+    entries = []
+
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            entries.append({'index': index, 'phone': None, 'error': 'Record must be an object'})
+            continue
+        if not record.get('phone'):
+            entries.append({'index': index, 'phone': None, 'error': 'Missing phone'})
+            continue
+        phone, error = normalize(record['phone'])
+        if error:
+            entries.append({'index': index, 'phone': record['phone'], 'error': error})
+            continue
+
+        message = render(template_id, record)
+        if message not in group_index:
+            group_index[message] = len(groups)
+            groups.append((message, []))
+        group = group_index[message]
+
+        duplicate = (phone, message) in seen
+        if not duplicate:
+            seen.add((phone, message))
+            groups[group][1].append(phone)
+        entries.append({
+            'index': index,
+            'phone': phone,
+            'invoiceId': record.get('invoice_id'),
+            'group': group,
+            'duplicate': duplicate
+        })
+
+    return groups, entries
@@ -0,0 +1,150 @@
+"""
+Billing System - Phone Number Normalization
+
+One normalizer for every send path, so that "98765 43210",
+"+91-98765-43210" and "098765 43210" are the same recipient:
+
+- spaces, dashes, dots and parentheses are dropped
+- numbers without a country code get PHONE_COUNTRY_CODE (91); a
+  national trunk '0' and an international '00' prefix are understood
+- national numbers must have PHONE_NATIONAL_LENGTH (10) digits, and
+  Indian ones must be mobiles (starting 6-9); other international
+  numbers only need an E.164 length (8-15 digits)
+
+Numbers come back as country code + number, digits only
+('919876543210'): the form Fast2SMS takes, and Twilio's with a '+'.
+Results are memoized in a bounded LRU cache (PHONE_CACHE_SIZE), since
+campaign lists repeat the same customers send after send.
+
+Usage:
+from backend.phones import clean_numbers, normalize
+number, error = normalize('+91 98765-43210')
+numbers, entries = clean_numbers(['9876543210', '919876543210', 'abc'])
+"""
+
+import os
+import re
+import threading
+from functools import lru_cache
+
+INDIA = '91'
+
+# Separators people type inside numbers
+SEPARATORS = re.compile(r'[\s\-.()]')
+
+# E.164 limits on country code + number
+MIN_DIGITS = 8
+MAX_DIGITS = 15
+
+
+class PhoneNormalizer:
+    """Normalizes numbers for one default country; normalize() is cached and thread-safe"""
+
+    def __init__(self, country_code=None, national_length=None, cache_size=None):
+        if country_code is None:
+            country_code = os.getenv('PHONE_COUNTRY_CODE', INDIA)
+        if national_length is None:
+            national_length = int(os.getenv('PHONE_NATIONAL_LENGTH', 10))
+        if cache_size is None:
+            cache_size = int(os.getenv('PHONE_CACHE_SIZE', 100000))
+
+        self.country_code = str(country_code).lstrip('+')
+        self.national_length = national_length
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _normalize(self, raw):
+        """(number, None) or (None, reason) for one stripped string"""
+        text = SEPARATORS.sub('', raw)
+        if not text:
+            return None, 'Phone number is required'
+
+        international = text.startswith('+') or text.startswith('00')
+        digits = text[1:] if text.startswith('+') else text[2:] if international else text
+        if not (digits.isascii() and digits.isdigit()):
+            return None, 'Phone number must contain only digits'
+
+        if international:
+            if digits.startswith(INDIA):
+                return self._indian(digits[len(INDIA):])
+            if not MIN_DIGITS <= len(digits) <= MAX_DIGITS:
+                return None, f'International numbers must have {MIN_DIGITS}-{MAX_DIGITS} digits'
+            return digits, None
+
+        national = self.national_length
+        if len(digits) == national + 1 and digits[0] == '0':
+            # Trunk prefix, as in 098765 43210
+            digits = digits[1:]
+        if len(digits) == national + len(self.country_code) and digits.startswith(self.country_code):
+            digits = digits[len(self.country_code):]
+        if len(digits) != national:
+            return None, (f'Phone number must have {national} digits '
+                          f'(optionally prefixed with {self.country_code})')
+        if self.country_code == INDIA:
+            return self._indian(digits)
+        return self.country_code + digits, None
+
+    def _indian(self, national):
+        if len(national) != 10 or national[0] not in '6789':
+            return None, 'Not a valid Indian mobile number'
+        return INDIA + national, None
+
+    def metrics(self):
+        info = self.normalize.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxSize': info.maxsize}
+
+
+_normalizer = None
+_normalizer_lock = threading.Lock()
+
+
+def get_normalizer():
+    """Return the process-wide normalizer, creating it on first use"""
+    global _normalizer
+    if _normalizer is None:
+        with _normalizer_lock:
+            if _normalizer is None:
+                _normalizer = PhoneNormalizer()
+    return _normalizer
+
+
+def normalize(phone):
+    """(number, None) for a valid phone number, otherwise (None, reason)"""
+    if phone is None:
+        return None, 'Phone number is required'
+    if isinstance(phone, (bool, dict, list)):
+        return None, 'Phone number must be a string'
+    return get_normalizer().normalize(str(phone).strip())
+
+
+def clean_numbers(phones):
+    """
+    Normalize, validate and dedupe a list of numbers in one pass, before
+    any gateway call.
+
+    Returns (numbers, entries):
+    numbers - the unique valid numbers, normalized, in first-seen order
+    entries - one dict per input in order: {'index', 'phone', 'number',
+              'duplicate'}, or {'index', 'phone', 'error'} when invalid
+    """
+    numbers = []
+    seen = set()
+    entries = []
+    for index, phone in enumerate(phones):
+        number, error = normalize(phone)
+        if error:
+            entries.append({'index': index, 'phone': phone, 'error': error})
+            continue
+        duplicate = number in seen
+        if not duplicate:
+            seen.add(number)
+            numbers.append(number)
+        entries.append({'index': index, 'phone': phone, 'number': number, 'duplicate': duplicate})
+    return numbers, entries
+
+
+def to_e164(phone):
+    """+<country code><number>, for gateways that want E.164 (one number only)"""
+    if ',' in str(phone):
+        raise ValueError('E.164 conversion takes a single phone number')
+    number, _ = normalize(phone)
+    return '+' + (number or ''.join(filter(str.isdigit, str(phone))))
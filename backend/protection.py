@@ -0,0 +1,193 @@
+"""
+Billing System - Gateway Protection
+
+Keeps a slow or failing SMS gateway from tying up every worker:
+
+- TokenBucket: caps messages per second at the DLT quota, waiting briefly
+  for a token and refusing once the wait would be too long
+- CircuitBreaker: after consecutive timeouts or connection errors the
+  circuit opens and calls fail immediately; after a cool-down one probe
+  call is let through (half-open) and its outcome closes or re-opens it
+
+Both refuse a call by raising a GatewayUnavailable, which subclasses
+requests' ConnectionError so existing network-error handling applies.
+"""
+
+import threading
+import time
+
+import requests
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class GatewayUnavailable(requests.exceptions.ConnectionError):
+    """The call was refused locally and never reached the gateway"""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        # Seconds until a retry has a chance of going through
+        self.retry_after = max(0.0, retry_after)
+
+
+class CircuitOpenError(GatewayUnavailable):
+    pass
+
+
+class RateLimitExceeded(GatewayUnavailable):
+    pass
+
+
+class TokenBucket:
+    """Thread-safe token bucket; rate <= 0 disables limiting"""
+
+    def __init__(self, rate, capacity=None, max_wait=0.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity if capacity is not None else rate)
+        self.max_wait = max_wait
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.delayed = 0
+        self.rejected = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cost=1):
+        """
+        Take `cost` tokens, sleeping up to max_wait seconds for them.
+        Raises RateLimitExceeded when they would not arrive in time.
+        """
+        wait = self.reserve(cost)
+        if wait:
+            time.sleep(wait)
+
+    def reserve(self, cost=1):
+        """
+        Take `cost` tokens without blocking and return the seconds the
+        caller must wait before using them (for callers that sleep on an
+        event loop). Raises RateLimitExceeded like acquire().
+
+        A cost above the capacity (a bulk send to more recipients than the
+        burst) goes ahead once the bucket is full and is charged in full:
+        the bucket goes into debt and later callers wait off cost / rate.
+        """
+        if self.rate <= 0:
+            return 0.0
+        cost = max(1, cost)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            needed = min(cost, self.capacity)
+            wait = (needed - self._tokens) / self.rate if self._tokens < needed else 0.0
+            if wait > self.max_wait:
+                self.rejected += 1
+                raise RateLimitExceeded(
+                    f'SMS rate limit of {self.rate:g}/s reached', retry_after=wait
+                )
+            # Reserve the tokens now (possibly going negative) so that
+            # concurrent callers queue up behind this one
+            self._tokens -= cost
+            self.acquired += 1
+            if wait:
+                self.delayed += 1
+        return wait
+
+    def metrics(self):
+        with self._lock:
+            if self.rate > 0:
+                self._refill(time.monotonic())
+            return {
+                'enabled': self.rate > 0,
+                'rate': self.rate,
+                'capacity': self.capacity,
+                'available': round(max(0.0, self._tokens), 2) if self.rate > 0 else None,
+                'acquired': self.acquired,
+                'delayed': self.delayed,
+                'rejected': self.rejected
+            }
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with single-probe half-open state"""
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = max(1, threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.rejected = 0
+        self.last_error = None
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError; returns True for a probe"""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            raise CircuitOpenError(
+                f'SMS gateway circuit is {self.state}: {self.last_error}',
+                retry_after=remaining if remaining > 0 else 1.0
+            )
+
+    def allows_call(self):
+        """Whether before_call() would admit a call right now, without claiming the probe"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return time.monotonic() >= self._opened_at + self.reset_timeout
+            return not self._probing
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """End a call whose outcome says nothing about gateway health"""
+        with self._lock:
+            self._probing = False
+
+    def metrics(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self._opened_at + self.reset_timeout - time.monotonic()), 2)
+            return {
+                'state': self.state,
+                'consecutiveFailures': self.failures,
+                'threshold': self.threshold,
+                'resetTimeout': self.reset_timeout,
+                'retryIn': retry_in,
+                'opens': self.opens,
+                'rejected': self.rejected,
+                'lastError': self.last_error
+            }
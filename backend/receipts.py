@@ -0,0 +1,343 @@
+"""
+Billing System - Receipt Rendering
+
+Server-side versions of the receipts index.html builds on the client
+(generateThermalText_GST / _NON_GST and generatePrintableHTML):
+
+- thermal text for 80 mm (47 columns) and 58 mm (32 columns) printers
+- printable HTML
+- ESC/POS bytes ready to send to a thermal printer
+
+Templates are compiled once at import time, and rendered output is cached
+by bill id and version (plus format and width), so reprints and resends of an
+unchanged bill never render twice.
+
+Usage:
+from backend.receipts import render_receipt
+body, mimetype = render_receipt(bill, 'thermal', 58)
+"""
+
+import html
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from string import Template
+
+FORMATS = ('thermal', 'html', 'escpos')
+WIDTHS = (80, 58)
+
+# Column layouts per paper width
+LAYOUTS = {
+    80: {
+        'columns': 47,
+        'item_header': 'S.N Item          Qty  Rate      Disc   Amt',
+        'item': '{sno:<3} {name:<14.14} {qty:<5} {rate:>7} {disc:>6} {amt:>8}'
+    },
+    58: {
+        'columns': 32,
+        'item_header': 'Item         Qty   Rate     Amt',
+        'item': '{name:<12.12} {qty:<4.4} {rate:>6} {amt:>7}'
+    }
+}
+
+THERMAL_HEADER = Template(
+    '$shop\n'
+    '$rule\n'
+    '${address}'
+    '${gstin}'
+    'Ph: $phone\n'
+    '$rule\n'
+    '$title\n'
+    '$rule\n'
+    'Bill No : $bill_id\n'
+    'Date    : $date\n'
+    'Customer: $customer\n'
+    '$rule\n'
+    '$item_header\n'
+    '$rule\n'
+)
+
+THERMAL_FOOTER = Template(
+    '$rule\n'
+    'Payment : $payment\n'
+    '$rule\n'
+    ' Thank You! Visit Again 🙂\n'
+)
+
+HTML_PAGE = Template("""<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <title>Bill $bill_id</title>
+  <style>
+    body { font-family: monospace; max-width: 600px; margin: 20px auto; padding: 20px; }
+    .bill { border: 1px solid #333; padding: 20px; }
+    .center { text-align: center; font-weight: bold; margin-bottom: 10px; }
+    .line { display: flex; justify-content: space-between; padding: 4px 0; }
+    table { width: 100%; border-collapse: collapse; margin: 10px 0; }
+    th, td { padding: 6px; text-align: left; border-bottom: 1px solid #ddd; }
+    th { background: #f0f0f0; font-weight: bold; }
+    .total-line { font-weight: bold; margin-top: 10px; padding-top: 10px; border-top: 2px solid #333; }
+    .footer { text-align: center; margin-top: 20px; font-size: 12px; }
+    hr { border: none; border-top: 1px solid #ddd; margin: 10px 0; }
+  </style>
+</head>
+<body>
+  <div class="bill">
+    <div class="center">$shop</div>
+    <div class="center" style="font-size: 12px; font-weight: normal;">$title</div>
+    <hr>
+    <div class="line"><span>Bill ID:</span><span>$bill_id</span></div>
+    <div class="line"><span>Date:</span><span>$date</span></div>
+    <div class="line"><span>Customer:</span><span>$customer</span></div>
+    <div class="line"><span>Mobile:</span><span>$mobile</span></div>
+    <hr>
+    <table>
+      <thead>
+        <tr><th>Item</th><th>Qty</th><th>Rate</th><th>Disc%</th><th style="text-align: right;">Amount</th></tr>
+      </thead>
+      <tbody>
+$rows
+      </tbody>
+    </table>
+    <hr>
+$totals
+    <hr>
+    <div class="line"><span>Payment Method:</span><span>$payment</span></div>
+    <div class="line"><span>Amount Received:</span><span>&#8377;$received</span></div>
+    <div class="line"><span>Balance/Change:</span><span>&#8377;$balance</span></div>
+    <hr>
+    <div class="footer">Thank you for shopping with us!<br>Visit again soon 🙂</div>
+  </div>
+</body>
+</html>
+""")
+
+HTML_ROW = Template(
+    '        <tr><td>$name</td><td>$qty</td><td>&#8377;$rate</td><td>$disc</td>'
+    '<td style="text-align: right;">&#8377;$amount</td></tr>'
+)
+HTML_TOTAL = Template('    <div class="line$extra"><span>$label:</span><span>$value</span></div>')
+
+# ESC/POS control sequences
+ESC_INIT = b'\x1b@'
+ESC_FEED = b'\x1bd\x04'
+GS_CUT = b'\x1dV\x01'
+
+
+def _shop():
+    """Receipt header details (defaults match index.html)"""
+    return {
+        'name': os.getenv('SHOP_NAME', 'NOW100 SUPERMART'),
+        'address': os.getenv('SHOP_ADDRESS', 'LG-05, Nirala Aspire Plaza|Greater Noida (W)').split('|'),
+        'phone': os.getenv('SHOP_PHONE', '8920903244'),
+        'gstin': os.getenv('SHOP_GSTIN', '09ABCDE1234F1Z5')
+    }
+
+
+def _num(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _money(value):
+    return f'{_num(value):.2f}'
+
+
+def _qty(value):
+    qty = _num(value)
+    return str(int(qty)) if qty.is_integer() else f'{qty:g}'
+
+
+def _date(ts):
+    try:
+        dt = datetime.fromisoformat(str(ts).replace('Z', '+00:00'))
+    except ValueError:
+        return str(ts or '')
+    if dt.tzinfo is not None:
+        dt = dt.astimezone()
+    return dt.strftime('%d/%m/%Y, %I:%M:%S %p')
+
+
+def _line_amount(item):
+    rate = _num(item.get('rate'))
+    return rate * (1 - _num(item.get('disc')) / 100) * _num(item.get('qty'))
+
+
+def _items(bill):
+    """Line items of a bill, skipping entries that are not objects"""
+    return [item for item in bill.get('items') or [] if isinstance(item, dict)]
+
+
+def _payment_method(bill):
+    return ((bill.get('payment') or {}).get('method') or 'cash').upper()
+
+
+def render_thermal(bill, width=80):
+    """Plain-text receipt for an 80 mm or 58 mm thermal printer"""
+    layout = LAYOUTS[width]
+    columns = layout['columns']
+    rule = '-' * columns
+    shop = _shop()
+    gst = bill.get('gst') or {}
+    gst_enabled = bool(gst.get('enabled'))
+
+    customer = bill.get('custName') or 'Customer'
+    if bill.get('custMobile'):
+        customer += f' | Mobile: {bill["custMobile"]}'
+
+    text = THERMAL_HEADER.substitute(
+        shop=shop['name'].center(columns).rstrip(),
+        rule=rule,
+        address=''.join(f'{line}\n' for line in shop['address']),
+        gstin=f'GSTIN: {gst.get("gstin") or shop["gstin"]}\n' if gst_enabled else '',
+        phone=shop['phone'],
+        title=('TAX INVOICE (GST)' if gst_enabled else 'TAX INVOICE').center(columns).rstrip(),
+        bill_id=bill.get('id', ''),
+        date=_date(bill.get('ts')),
+        customer=customer,
+        item_header=layout['item_header']
+    )
+
+    item_line = layout['item']
+    lines = []
+    for i, item in enumerate(_items(bill), start=1):
+        lines.append(item_line.format(
+            sno=i,
+            name=str(item.get('name') or ''),
+            qty=f'{_qty(item.get("qty"))}{item.get("unit") or ""}',
+            rate=_money(item.get('rate')),
+            disc=f'{_qty(item.get("disc"))}%',
+            amt=_money(_line_amount(item))
+        ).rstrip())
+    text += ''.join(f'{line}\n' for line in lines)
+
+    totals = [('Subtotal', bill.get('subtotal')), ('Discount', bill.get('totalDiscount'))]
+    if gst_enabled:
+        half = _num(gst.get('rate') or 18) / 2
+        totals += [
+            ('Taxable Amount', gst.get('taxable')),
+            (f'CGST @{half:.1f}%', gst.get('cgst')),
+            (f'SGST @{half:.1f}%', gst.get('sgst'))
+        ]
+    text += rule + '\n'
+    text += ''.join(f'{label:<18}{_money(value)}\n' for label, value in totals)
+    text += rule + '\n'
+    text += f'{"TOTAL":<18}{_money(bill.get("grandTotal"))}\n'
+
+    payment = _payment_method(bill)
+    if not gst_enabled:
+        payment += f'  |  AMOUNT : {_money(bill.get("grandTotal"))}'
+    return text + THERMAL_FOOTER.substitute(rule=rule, payment=payment)
+
+
+def render_html(bill):
+    """Printable/downloadable HTML receipt"""
+    esc = html.escape
+    shop = _shop()
+    gst = bill.get('gst') or {}
+    payment = bill.get('payment') or {}
+
+    rows = '\n'.join(HTML_ROW.substitute(
+        name=esc(str(item.get('name') or '')),
+        qty=esc(_qty(item.get('qty'))),
+        rate=_money(item.get('rate')),
+        disc=_money(item.get('disc')),
+        amount=_money(_line_amount(item))
+    ) for item in _items(bill))
+
+    totals = [
+        ('Subtotal', f'&#8377;{_money(bill.get("subtotal"))}', ''),
+        ('Total Discount', f'- &#8377;{_money(bill.get("totalDiscount"))}', '')
+    ]
+    if gst.get('enabled'):
+        half = _num(gst.get('rate') or 18) / 2
+        totals += [
+            ('Taxable Amount', f'&#8377;{_money(gst.get("taxable"))}', ''),
+            (f'CGST @{half:.1f}%', f'&#8377;{_money(gst.get("cgst"))}', ''),
+            (f'SGST @{half:.1f}%', f'&#8377;{_money(gst.get("sgst"))}', '')
+        ]
+    totals.append(('Grand Total', f'&#8377;{_money(bill.get("grandTotal"))}', ' total-line'))
+
+    return HTML_PAGE.substitute(
+        shop=esc(shop['name']),
+        title='TAX INVOICE (GST)' if gst.get('enabled') else 'TAX INVOICE',
+        bill_id=esc(str(bill.get('id', ''))),
+        date=esc(_date(bill.get('ts'))),
+        customer=esc(str(bill.get('custName') or 'Customer')),
+        mobile=esc(str(bill.get('custMobile') or '')),
+        rows=rows,
+        totals='\n'.join(HTML_TOTAL.substitute(label=label, value=value, extra=extra)
+                         for label, value, extra in totals),
+        payment=esc(_payment_method(bill)),
+        received=_money(payment.get('received')),
+        balance=_money(payment.get('balance'))
+    )
+
+
+def render_escpos(bill, width=80):
+    """Thermal receipt as ESC/POS bytes: init, text, feed and partial cut"""
+    text = render_thermal(bill, width)
+    return ESC_INIT + text.encode('cp437', errors='replace') + ESC_FEED + GS_CUT
+
+
+class ReceiptCache:
+    """Bounded LRU of rendered receipts"""
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+        value = render()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return value
+
+
+_cache = ReceiptCache(int(os.getenv('RECEIPT_CACHE_SIZE', 512)))
+
+MIMETYPES = {
+    'thermal': 'text/plain; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+    'escpos': 'application/octet-stream'
+}
+
+
+def render_receipt(bill, fmt='thermal', width=80):
+    """
+    Render a stored bill, reusing the cached output for this bill version.
+    Returns (body, mimetype); raises ValueError for unknown formats.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'format must be one of: {", ".join(FORMATS)}')
+    if width not in WIDTHS:
+        raise ValueError('width must be 80 or 58')
+    if fmt == 'html':
+        width = None
+
+    # updatedAt guards against a deleted bill re-created at version 1
+    key = (bill.get('id'), bill.get('version'), bill.get('updatedAt'), fmt, width)
+    if fmt == 'thermal':
+        body = _cache.get_or_render(key, lambda: render_thermal(bill, width))
+    elif fmt == 'escpos':
+        body = _cache.get_or_render(key, lambda: render_escpos(bill, width))
+    else:
+        body = _cache.get_or_render(key, lambda: render_html(bill))
+    return body, MIMETYPES[fmt]
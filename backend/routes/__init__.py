@@ -0,0 +1,15 @@
+"""
+Billing System - Route Blueprints
+
+Every endpoint, grouped by area. create_app() registers all of them
+unless it is given its own list.
+"""
+
+from backend.routes.delivery import bp as delivery
+from backend.routes.exports import bp as exports
+from backend.routes.meta import bp as meta
+from backend.routes.reports import bp as reports
+from backend.routes.sms import bp as sms
+from backend.routes.store import bp as store
+
+BLUEPRINTS = (meta, sms, delivery, store, reports, exports)
@@ -0,0 +1,15 @@
+"""
+Billing System - Shared View Helpers
+"""
+
+from flask import jsonify
+
+
+def reply(response):
+    """JSON response from a services (body, status[, headers]) tuple"""
+    body, status, *rest = response
+    out = jsonify(body)
+    out.status_code = status
+    if rest:
+        out.headers.update(rest[0])
+    return out
@@ -0,0 +1,100 @@
+"""
+Billing System - Delivery Report Endpoints
+
+Webhook for gateway delivery reports (DLRs) and queries over the
+delivery store (backend.delivery).
+"""
+
+import logging
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+
+from backend.delivery import MAX_REPORTS, STATES, extract_reports, get_delivery_store, webhook_authorized
+from backend.store import page_args
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('delivery', __name__)
+
+
+@bp.route('/api/delivery-reports', methods=['POST'])
+def receive_delivery_reports():
+    """
+    Delivery report webhook (point the gateway's DLR callback here)
+    Request body: one report, a list of reports, or {"reports": [...]}
+    {
+        "request_id": "abc123",
+        "phone": "919876543210",
+        "status": "Delivered"
+    }
+    Twilio status callbacks (form-encoded MessageSid / To / MessageStatus)
+    are accepted as they are. With DLR_WEBHOOK_TOKEN set, the token must be
+    sent as ?token=... or an X-Webhook-Token header.
+    """
+    token = request.headers.get('X-Webhook-Token') or request.args.get('token')
+    if not webhook_authorized(token):
+        return jsonify({'error': 'Invalid webhook token'}), 401
+
+    payload = request.get_json(silent=True)
+    if payload is None and request.form:
+        payload = request.form.to_dict()
+    reports = extract_reports(payload)
+    if not reports:
+        return jsonify({'error': 'No delivery reports in request'}), 400
+    if len(reports) > MAX_REPORTS:
+        return jsonify({'error': f'Maximum {MAX_REPORTS} reports per request'}), 400
+
+    try:
+        result = get_delivery_store().ingest(reports)
+    except Exception as e:
+        logger.error('❌ Delivery report ingest failed: %s', e)
+        return jsonify({'error': str(e)}), 500
+    if result['rejected']:
+        logger.warning('⚠️  %d/%d delivery reports rejected', len(result['rejected']), len(reports))
+    return jsonify({'success': True, **result, 'timestamp': datetime.now().isoformat()}), 200
+
+
+@bp.route('/api/delivery-reports', methods=['GET'])
+def list_delivery_reports():
+    """
+    Delivery status of sent SMS, most recently updated first
+    Query: ?request_id=<id>&phone=<phone>&status=sent|delivered|failed|unknown
+           &limit=50&offset=0
+    """
+    try:
+        limit, offset = page_args(request.args)
+        status = request.args.get('status')
+        if status and status not in STATES:
+            raise ValueError(f'status must be one of: {", ".join(STATES)}')
+        page = get_delivery_store().query(
+            request_id=request.args.get('request_id'),
+            phone=request.args.get('phone'),
+            status=status,
+            limit=limit,
+            offset=offset
+        )
+        return jsonify({'success': True, **page}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/delivery-reports/<request_id>', methods=['GET'])
+def get_delivery_report(request_id):
+    """Per-recipient status and totals of one gateway request"""
+    try:
+        limit, offset = page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    store = get_delivery_store()
+    counts = store.counts(request_id)
+    if not counts:
+        return jsonify({'error': 'Request not found'}), 404
+    page = store.query(request_id=request_id, limit=limit, offset=offset)
+    return jsonify({
+        'success': True,
+        'requestId': request_id,
+        'recipients': sum(counts.values()),
+        'counts': counts,
+        **page
+    }), 200
@@ -0,0 +1,64 @@
+"""
+Billing System - Export Endpoints
+
+Streaming CSV / NDJSON (optionally gzipped) downloads of bills and
+customers (backend.exports), for histories too large to build in memory.
+"""
+
+import logging
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from backend import exports
+from backend.store import get_store
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('exports', __name__)
+
+
+def _export(kind, records, columns, row):
+    """Validate the query, then stream `records(date_from, date_to)`"""
+    fmt = request.args.get('format', 'csv').lower()
+    compress = request.args.get('compress', '').lower()
+    try:
+        if fmt not in exports.FORMATS:
+            raise ValueError(f'format must be one of: {", ".join(exports.FORMATS)}')
+        if compress not in ('', 'gzip'):
+            raise ValueError('compress must be gzip')
+        date_from = exports.parse_date(request.args.get('from'), 'from')
+        date_to = exports.parse_date(request.args.get('to'), 'to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    logger.info('Exporting %s as %s%s (%s to %s)', kind, fmt, '.gz' if compress else '',
+                date_from or 'start', date_to or 'now')
+    chunks = exports.encode(records(date_from, date_to), fmt, columns, row, compress=bool(compress))
+    response = Response(
+        stream_with_context(chunks),
+        mimetype=exports.GZIP_MIMETYPE if compress else exports.MIMETYPES[fmt]
+    )
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename={exports.filename(kind, fmt, compress, date_from, date_to)}'
+    )
+    return response
+
+
+@bp.route('/api/export/bills', methods=['GET'])
+def export_bills():
+    """
+    Download bills, oldest first
+    Query: ?format=csv|ndjson&compress=gzip&from=YYYY-MM-DD&to=YYYY-MM-DD
+    CSV has one summary row per bill; NDJSON has the full bill objects.
+    """
+    return _export('bills', get_store().iter_bills, exports.BILL_COLUMNS, exports.bill_row)
+
+
+@bp.route('/api/export/customers', methods=['GET'])
+def export_customers():
+    """
+    Download customers with their bill count and total spend
+    Query: ?format=csv|ndjson&compress=gzip&from=YYYY-MM-DD&to=YYYY-MM-DD
+    from / to select customers by the date of their last bill.
+    """
+    return _export('customers', get_store().iter_customers, exports.CUSTOMER_COLUMNS, exports.customer_row)
@@ -0,0 +1,67 @@
+"""
+Billing System - Health, Status and Metrics Endpoints
+"""
+
+import os
+import sys
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, jsonify
+
+from backend import metrics
+from backend.gateways import current_gateway
+from backend.phones import get_normalizer
+
+bp = Blueprint('meta', __name__)
+
+VERSION = '1.0.0'
+
+
+@bp.route('/api/health', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    return jsonify({
+        'status': current_app.config.get('HEALTH_STATUS', 'ok'),
+        'service': 'Billing System SMS Gateway',
+        'configured': current_gateway().configured,
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+@bp.route('/api/status', methods=['GET'])
+def get_status():
+    """Get API status and configuration info"""
+    gateway = current_gateway()
+    endpoints = sorted({rule.rule for rule in current_app.url_map.iter_rules()
+                        if rule.rule.startswith('/api/')})
+    return jsonify({
+        'status': 'active',
+        'service': 'Billing System SMS Gateway',
+        'version': VERSION,
+        'gateway': gateway.name,
+        'gatewayRoute': gateway.route,
+        'apiConfigured': gateway.configured,
+        'corsEnabled': bool(os.getenv('CORS_ORIGIN')),
+        'pythonVersion': sys.version.split()[0],
+        'environment': os.getenv('FLASK_ENV', current_app.config.get('DEFAULT_ENVIRONMENT', 'development')),
+        'endpoints': endpoints,
+        'protection': gateway.metrics(),
+        'phoneCache': get_normalizer().metrics(),
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+@bp.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of request, gateway, batch and queue metrics"""
+    return Response(metrics.render_metrics(), content_type=metrics.CONTENT_TYPE)
+
+
+@bp.route('/', methods=['GET'])
+def index():
+    """Root endpoint"""
+    return jsonify({
+        'message': 'Billing System SMS Gateway API',
+        'documentation': 'Visit /api/status for available endpoints',
+        'version': VERSION
+    }), 200
@@ -0,0 +1,65 @@
+"""
+Billing System - Report Endpoints
+
+Sales and customer totals read from the incrementally maintained
+aggregates (backend.aggregates).
+"""
+
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+
+from backend.store import get_store, page_args
+
+bp = Blueprint('reports', __name__)
+
+
+@bp.route('/api/reports/summary', methods=['GET'])
+def report_summary():
+    """Totals for today and this month (?date=YYYY-MM-DD to pick another day)"""
+    return jsonify({
+        'success': True,
+        **get_store().sales_summary(request.args.get('date')),
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+@bp.route('/api/reports/daily', methods=['GET'])
+def report_daily():
+    """Per-day totals, newest first (?from=YYYY-MM-DD&to=YYYY-MM-DD&limit=31)"""
+    try:
+        limit, _ = page_args({'limit': request.args.get('limit', 31)})
+        days = get_store().sales_daily(request.args.get('from'), request.args.get('to'), limit)
+        return jsonify({'success': True, 'items': days}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/reports/monthly', methods=['GET'])
+def report_monthly():
+    """Per-month totals, newest first (?limit=12)"""
+    try:
+        limit, _ = page_args({'limit': request.args.get('limit', 12)})
+        return jsonify({'success': True, 'items': get_store().sales_monthly(limit)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/reports/customers', methods=['GET'])
+def report_customers():
+    """Customers ranked by lifetime value (?limit=50&offset=0)"""
+    try:
+        limit, offset = page_args(request.args)
+        customers = get_store().top_customers(limit, offset)
+        return jsonify({'success': True, 'items': customers, 'limit': limit, 'offset': offset}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/reports/customers/<key>', methods=['GET'])
+def report_customer(key):
+    """Lifetime totals for one customer (by mobile number)"""
+    totals = get_store().customer_totals(key)
+    if totals is None:
+        return jsonify({'error': 'Customer not found'}), 404
+    return jsonify({'success': True, 'customer': totals}), 200
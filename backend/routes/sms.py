@@ -0,0 +1,458 @@
+"""
+Billing System - SMS Endpoints
+
+Single, batch, streamed, queued and scheduled sends through the app's
+gateway backend (see backend.gateways).
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from itertools import islice
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from backend import metrics
+from backend.batching import gateway_chunk_size, imap_bounded, map_ordered, send_grouped, send_in_chunks
+from backend.gateways import REFUSED, current_gateway
+from backend.idempotency import idempotent
+from backend.notifications import DEFAULT_TEMPLATE, TEMPLATES, plan_batch, render
+from backend.routes.common import reply
+from backend.phones import clean_numbers
+from backend.scheduler import get_scheduler
+from backend.services import (
+    batch_item_result, chunked_batch_response, error_body, failure_response,
+    not_configured, notification_results, numbers_batch_response, queued_body,
+    scheduled_body, scheduled_notifications_response, scheduled_numbers_response,
+    scheduled_sms_list_response, sent_body, sms_list_response, stream_row_result,
+    stream_summary, validate_phone, validate_send_at, validate_sms, validate_sms_item,
+    validate_sms_list
+)
+from backend.sms_queue import divert_to_queue, get_sms_queue, wants_async
+from backend.streaming import detect_format, iter_rows
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('sms', __name__)
+
+
+@bp.route('/api/send-sms', methods=['POST'])
+def send_sms():
+    """
+    Send SMS via Fast2SMS
+    Request body:
+    {
+        "phone": "919876543210",  # Phone number with country code
+        "message": "Your message here",
+        "async": false,           # optional: true = queue it and return a jobId (202)
+        "send_at": "2026-02-05T10:00:00"  # optional: schedule it (202 + scheduleId)
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        phone, message, error = validate_sms(data)
+        if error:
+            return reply(error)
+        send_at, error = validate_send_at(data)
+        if error:
+            return reply(error)
+
+        gateway = current_gateway()
+        if not gateway.configured:
+            return reply(not_configured())
+
+        def deliver():
+            if send_at is not None:
+                return schedule_one(phone, message, send_at, 'SMS')
+            # Enqueue-and-return mode: the background dispatcher sends it
+            if wants_async(request):
+                return queue_sms(phone, message, 'SMS')
+            logger.info('📤 Sending SMS to %s...', phone)
+            return send_one(gateway, phone, message, 'SMS')
+
+        # Double clicks and client retries get the first response back
+        # instead of a second paid gateway call
+        return idempotent(request, 'send-sms', phone, message, deliver)
+
+    except Exception as e:
+        logger.error('❌ Error in /api/send-sms: %s', e)
+        return reply(error_body(str(e), 500))
+
+
+@bp.route('/api/send-batch-sms', methods=['POST'])
+def send_batch_sms():
+    """
+    Send one message to many numbers
+    Request body:
+    {
+        "numbers": ["919876543210", "919987654321"],
+        "message": "Your message here",
+        "send_at": "2026-02-05T10:00:00"  # optional
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+
+        if not data or 'numbers' not in data or 'message' not in data:
+            return reply(error_body('Missing numbers or message', 400))
+
+        numbers = data.get('numbers', [])
+        message = data.get('message')
+
+        if not isinstance(numbers, list) or len(numbers) == 0:
+            return reply(error_body('Invalid numbers list', 400))
+
+        send_at, error = validate_send_at(data)
+        if error:
+            return reply(error)
+
+        gateway = current_gateway()
+        if not gateway.configured:
+            return reply(not_configured())
+
+        # Normalize, drop invalid numbers and dedupe before any paid call
+        unique, entries = clean_numbers(numbers)
+
+        if send_at is not None:
+            plan = schedule_sms([(number, message) for number in unique], send_at, 'Batch SMS')
+            return reply(scheduled_numbers_response(entries, unique, plan))
+
+        # Split into gateway-sized multi-number requests sent in parallel;
+        # a failed chunk is retried on its own
+        metrics.BATCH_SIZE.observe(len(numbers), 'send-batch-sms')
+        chunks, recipients = send_in_chunks(unique, message, gateway.send,
+                                            chunk_size=gateway_chunk_size(gateway))
+
+        return reply(numbers_batch_response(entries, unique, chunks, recipients))
+
+    except Exception as e:
+        logger.error('Error: %s', e)
+        return reply(error_body(str(e), 500))
+
+
+@bp.route('/api/send-sms-batch', methods=['POST'])
+def send_sms_batch():
+    """
+    Send up to 100 different messages in one request
+    Request body:
+    {
+        "smsList": [
+            {"phone": "919876543210", "message": "..."},
+            {"phone": "919876543211", "message": "..."}
+        ],
+        "send_at": "2026-02-05T10:00:00"  # optional
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        sms_list, error = validate_sms_list(data)
+        if error:
+            return reply(error)
+        send_at, error = validate_send_at(data)
+        if error:
+            return reply(error)
+
+        gateway = current_gateway()
+        if not gateway.configured:
+            return reply(not_configured())
+
+        # Validate every item before the first gateway call
+        items = [validate_sms_item(sms) for sms in sms_list]
+
+        if send_at is not None:
+            plan = schedule_sms([(phone, message) for phone, message, error in items if not error],
+                                send_at, 'Batch SMS')
+            return reply(scheduled_sms_list_response(items, plan))
+
+        logger.info('📤 Sending %d SMS messages...', len(sms_list))
+
+        def send_item(item):
+            # Never raises, so one bad entry cannot abort the rest of the batch
+            phone, message, error = item
+            if error:
+                return batch_item_result(phone, {'success': False, 'error': error})
+            try:
+                result = gateway.send(phone, message)
+            except Exception as e:
+                logger.error('❌ SMS to %s failed: %s', phone, e)
+                result = {'success': False, 'error': str(e)}
+            return batch_item_result(phone, result)
+
+        # Fan out over a bounded pool (SMS_BATCH_CONCURRENCY), in input order
+        metrics.BATCH_SIZE.observe(len(sms_list), 'send-sms-batch')
+        return reply(sms_list_response(map_ordered(send_item, items)))
+
+    except Exception as e:
+        logger.error('❌ Batch SMS Error: %s', e)
+        return reply(error_body(str(e), 500))
+
+
+@bp.route('/api/send-sms-stream', methods=['POST'])
+def send_sms_stream():
+    """
+    Stream a large SMS campaign
+    Request body (Content-Type: application/x-ndjson), one row per line:
+        {"phone": "919876543210", "message": "Your message here"}
+    or (Content-Type: text/csv), header row optional:
+        phone,message
+        919876543210,Your message here
+
+    Rows are sent as they are read, and one NDJSON result line per row is
+    streamed back in input order, followed by a summary line, even when a
+    send raises or the upload cannot be read. With SMS_STREAM_MAX_ROWS set,
+    rows past it are not sent and the summary says "truncated".
+    """
+    gateway = current_gateway()
+    if not gateway.configured:
+        return reply(not_configured())
+
+    rows = iter_rows(request.stream, detect_format(request.content_type))
+    max_rows = int(os.getenv('SMS_STREAM_MAX_ROWS', 0))
+
+    def send_row(row):
+        # Never raises, so one bad row cannot cut the stream short
+        if row[3]:
+            return stream_row_result(row, None)
+        try:
+            result = gateway.send(row[1], row[2])
+        except Exception as e:
+            logger.error('❌ SMS to %s failed: %s', row[1], e)
+            result = {'success': False, 'error': str(e)}
+        return stream_row_result(row, result)
+
+    def generate():
+        total = sent = 0
+        error = None
+        try:
+            for result in imap_bounded(send_row, islice(rows, max_rows or None)):
+                total += 1
+                sent += result['success']
+                yield json.dumps(result) + '\n'
+        except Exception as e:
+            # The upload itself failed (e.g. not UTF-8): report what was sent
+            logger.error('❌ Streamed campaign stopped after %d rows: %s', total, e)
+            error = str(e)
+        truncated = bool(max_rows) and error is None and next(rows, None) is not None
+        metrics.BATCH_SIZE.observe(total, 'send-sms-stream')
+        yield json.dumps(stream_summary(total, sent, truncated, error)) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@bp.route('/api/billing-notification', methods=['POST'])
+def billing_notification():
+    """
+    Send billing notification SMS
+    Request body:
+    {
+        "phone": "919876543210",
+        "customer_name": "John Doe",
+        "amount": "500",
+        "invoice_id": "INV-001",
+        "send_at": "2026-02-05T10:00:00"  # optional: schedule it (202 + scheduleId)
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+
+        if not data or not data.get('phone'):
+            return reply(error_body('Missing required fields', 400))
+
+        phone, error = validate_phone(data.get('phone'))
+        if error:
+            return reply(error)
+        send_at, error = validate_send_at(data)
+        if error:
+            return reply(error)
+        message = render(DEFAULT_TEMPLATE, {
+            'customer_name': data.get('customer_name', 'Customer'),
+            'amount': data.get('amount', '0'),
+            'invoice_id': data.get('invoice_id', 'N/A')
+        })
+
+        gateway = current_gateway()
+        if not gateway.configured:
+            return reply(not_configured())
+
+        def deliver():
+            if send_at is not None:
+                return schedule_one(phone, message, send_at, 'Billing notification')
+            if wants_async(request):
+                return queue_sms(phone, message, 'Billing notification')
+            return send_one(gateway, phone, message, 'Billing notification')
+
+        return idempotent(request, 'billing-notification', phone, message, deliver)
+
+    except Exception as e:
+        logger.error('Error: %s', e)
+        return reply(error_body(str(e), 500))
+
+
+@bp.route('/api/billing-notification-batch', methods=['POST'])
+def billing_notification_batch():
+    """
+    Send billing notifications to many customers in one request
+    Request body:
+    {
+        "template": "due_reminder",
+        "records": [
+            {"phone": "919876543210", "customer_name": "John Doe", "amount": "500", "invoice_id": "INV-001"},
+            {"phone": "919987654321", "customer_name": "Jane Doe", "amount": "750", "invoice_id": "INV-002"}
+        ],
+        "send_at": "2026-02-05T10:00:00"  # optional: e.g. on the due date
+    }
+
+    Identical (phone, message) pairs are sent once, and recipients who get
+    the same text share multi-number gateway calls.
+    """
+    try:
+        data = request.get_json(silent=True)
+
+        if not data or 'records' not in data:
+            return reply(error_body('Missing records', 400))
+
+        records = data.get('records')
+        template_id = data.get('template', DEFAULT_TEMPLATE)
+
+        if not isinstance(records, list) or len(records) == 0:
+            return reply(error_body('Invalid records list', 400))
+
+        if template_id not in TEMPLATES:
+            return reply(error_body(f'Unknown template: {template_id}', 400, templates=sorted(TEMPLATES)))
+
+        send_at, error = validate_send_at(data)
+        if error:
+            return reply(error)
+
+        gateway = current_gateway()
+        if not gateway.configured:
+            return reply(not_configured())
+
+        metrics.BATCH_SIZE.observe(len(records), 'billing-notification-batch')
+        groups, entries = plan_batch(records, template_id)
+
+        if send_at is not None:
+            plan = schedule_sms([(phone, message) for message, phones in groups for phone in phones],
+                                send_at, 'Billing notifications')
+            return reply(scheduled_notifications_response(entries, groups, plan, template_id))
+
+        chunks, recipients = send_grouped(groups, gateway.send, chunk_size=gateway_chunk_size(gateway))
+
+        invalid = sum(1 for e in entries if 'error' in e)
+        return reply(chunked_batch_response(len(records), chunks, recipients, 'Billing notifications', {
+            'template': template_id,
+            'unique': len(recipients),
+            'duplicates': len(records) - len(recipients) - invalid,
+            'invalid': invalid,
+            'messages': len(groups),
+            'gatewayCalls': len(chunks),
+            'results': notification_results(entries, recipients)
+        }))
+
+    except Exception as e:
+        logger.error('Error: %s', e)
+        return reply(error_body(str(e), 500))
+
+
+@bp.route('/api/sms-jobs/<job_id>', methods=['GET'])
+def sms_job_status(job_id):
+    """Report the delivery progress of a queued SMS job"""
+    job = get_sms_queue(current_gateway().send).get(job_id)
+    if job is None:
+        return reply(error_body('Job not found', 404))
+
+    return jsonify({
+        'success': True,
+        'job': job,
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+@bp.route('/api/scheduled-sms/<schedule_id>', methods=['GET'])
+def scheduled_sms_status(schedule_id):
+    """Report the state of a scheduled SMS"""
+    job = get_scheduler(current_gateway()).get(schedule_id)
+    if job is None:
+        return reply(error_body('Scheduled SMS not found', 404))
+
+    return jsonify({
+        'success': True,
+        'job': job,
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+@bp.route('/api/scheduled-sms/<schedule_id>', methods=['DELETE'])
+def cancel_scheduled_sms(schedule_id):
+    """Cancel a scheduled SMS that has not been sent yet"""
+    scheduler = get_scheduler(current_gateway())
+    if not scheduler.cancel(schedule_id):
+        job = scheduler.get(schedule_id)
+        if job is None:
+            return reply(error_body('Scheduled SMS not found', 404))
+        return reply(error_body(f'Scheduled SMS already {job["status"]}', 409, job=job))
+
+    return jsonify({
+        'success': True,
+        'job': scheduler.get(schedule_id),
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+@bp.route('/api/test-sms', methods=['GET'])
+def test_sms():
+    """Send a test SMS to ?phone= (development only)"""
+    if os.getenv('FLASK_ENV') == 'production':
+        return reply(error_body('Test endpoint disabled in production', 403))
+
+    phone = request.args.get('phone')
+    if not phone:
+        return reply(error_body('phone query parameter required', 400))
+    phone, error = validate_phone(phone)
+    if error:
+        return reply(error)
+
+    gateway = current_gateway()
+    if not gateway.configured:
+        return reply(not_configured())
+
+    test_message = f'TEST SMS from Billing System - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+    return send_one(gateway, phone, test_message, 'Test SMS')
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def send_one(gateway, phone, message, label):
+    """Send one message now and build the response"""
+    result = gateway.send(phone, message)
+    if result['success']:
+        logger.info('✅ %s sent successfully to %s', label, phone)
+        return reply(sent_body(result, phone, label))
+    if result['error_type'] == REFUSED:
+        logger.warning('⏸️  %s to %s refused: %s', label, phone, result['error'])
+        if divert_to_queue():
+            return queue_sms(phone, message, label, diverted=True)
+    return reply(failure_response(result, label))
+
+
+def schedule_sms(items, send_at, label):
+    """Hand (phone, message) items to the scheduler; returns its plan"""
+    plan = get_scheduler(current_gateway()).schedule(items, send_at)
+    logger.info('🗓️  %d %s scheduled for %s', len(items), label, datetime.fromtimestamp(plan['dueAt']).isoformat())
+    return plan
+
+
+def schedule_one(phone, message, send_at, label):
+    """Schedule one message and answer 202 with its scheduleId"""
+    plan = schedule_sms([(phone, message)], send_at, label)
+    return reply(scheduled_body(plan, label, {'scheduleId': plan['ids'][0], 'phone': phone}))
+
+
+def queue_sms(phone, message, label, diverted=False):
+    """Enqueue a message for the background dispatcher and answer 202"""
+    job = get_sms_queue(current_gateway().send).enqueue(phone, message)
+    logger.info('📥 %s to %s queued as job %s', label, phone, job['id'])
+    return reply(queued_body(job, label, diverted))
@@ -0,0 +1,343 @@
+"""
+Billing System - Bill, Customer and Stock Endpoints
+
+CRUD over the indexed server-side store (backend.store) and the delta
+sync protocol for offline counters.
+"""
+
+import logging
+from datetime import datetime
+
+from flask import Blueprint, Response, jsonify, request
+
+from backend.receipts import render_receipt
+from backend.stock_index import get_stock_index, stock_status
+from backend.store import SALE, StockConflict, get_store, page_args
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('store', __name__)
+
+
+@bp.route('/api/bills', methods=['POST'])
+def save_bill():
+    """
+    Save (insert or replace) a bill
+    Request body: the bill object built by index.html
+    {
+        "id": "B1738335934747",
+        "ts": "2026-01-31T15:05:34.747Z",
+        "custName": "John Doe",
+        "custMobile": "919876543210",
+        "items": [...],
+        "grandTotal": 500,
+        ...
+    }
+    """
+    try:
+        bill = get_store().save_bill(request.get_json(silent=True))
+        return jsonify({
+            'success': True,
+            'bill': bill,
+            'timestamp': datetime.now().isoformat()
+        }), 201 if bill['version'] == 1 else 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error('Error: %s', e)
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/bills', methods=['GET'])
+def list_bills():
+    """
+    List bills, newest first
+    Query: ?customer=<phone>&date=YYYY-MM-DD&month=YYYY-MM
+           &from=YYYY-MM-DD&to=YYYY-MM-DD&limit=50&offset=0
+    """
+    try:
+        limit, offset = page_args(request.args)
+        page = get_store().list_bills(
+            customer=request.args.get('customer'),
+            date=request.args.get('date'),
+            month=request.args.get('month'),
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            limit=limit,
+            offset=offset
+        )
+        return jsonify({'success': True, **page}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/bills/<bill_id>', methods=['GET'])
+def get_bill(bill_id):
+    """Get one bill by id"""
+    bill = get_store().get_bill(bill_id)
+    if bill is None:
+        return jsonify({'error': 'Bill not found'}), 404
+    return jsonify({'success': True, 'bill': bill}), 200
+
+
+@bp.route('/api/bills/<bill_id>/render', methods=['GET'])
+def render_bill(bill_id):
+    """
+    Render a stored bill as a receipt
+    Query: ?format=thermal|html|escpos&width=80|58
+
+    Output is cached per bill version; the ETag lets clients skip
+    re-downloading an unchanged receipt.
+    """
+    bill = get_store().get_bill(bill_id)
+    if bill is None:
+        return jsonify({'error': 'Bill not found'}), 404
+
+    fmt = request.args.get('format', 'thermal')
+    try:
+        width = int(request.args.get('width', 80))
+        body, mimetype = render_receipt(bill, fmt, width)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = Response(body, mimetype=mimetype)
+    # updatedAt tells a deleted and re-created bill (back at version 1) apart
+    response.set_etag(f'{bill_id}-{bill["version"]}-{bill["updatedAt"]}-{fmt}-{width}')
+    if fmt == 'escpos':
+        response.headers['Content-Disposition'] = f'attachment; filename={bill_id}.bin'
+    return response.make_conditional(request)
+
+
+@bp.route('/api/bills/<bill_id>', methods=['DELETE'])
+def delete_bill(bill_id):
+    """Delete one bill by id"""
+    if not get_store().delete_bill(bill_id):
+        return jsonify({'error': 'Bill not found'}), 404
+    return jsonify({'success': True, 'message': 'Bill deleted'}), 200
+
+
+@bp.route('/api/customers', methods=['GET'])
+def list_customers():
+    """List customers, most recently billed first (?limit=50&offset=0)"""
+    try:
+        limit, offset = page_args(request.args)
+        return jsonify({'success': True, **get_store().list_customers(limit, offset)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/customers', methods=['POST'])
+def save_customer():
+    """
+    Save a customer
+    Request body:
+    {
+        "name": "John Doe",
+        "mobile": "919876543210"
+    }
+    """
+    try:
+        customer = get_store().save_customer(request.get_json(silent=True))
+        return jsonify({'success': True, 'customer': customer}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/customers/<key>', methods=['GET'])
+def get_customer(key):
+    """Get one customer by mobile number"""
+    customer = get_store().get_customer(key)
+    if customer is None:
+        return jsonify({'error': 'Customer not found'}), 404
+    return jsonify({'success': True, 'customer': customer}), 200
+
+
+@bp.route('/api/search', methods=['GET'])
+def search():
+    """
+    Type-ahead search over customers and bills, best matches first
+    Query: ?q=<name, phone digits, bill id or item>&type=customers|bills
+           &limit=50&offset=0
+    """
+    try:
+        limit, offset = page_args(request.args)
+        page = get_store().search(
+            request.args.get('q', ''),
+            kind=request.args.get('type') or None,
+            limit=limit,
+            offset=offset
+        )
+        return jsonify({'success': True, 'q': request.args.get('q', ''), **page}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/stock', methods=['GET'])
+def list_stock():
+    """List stock items by code (?limit=50&offset=0)"""
+    try:
+        limit, offset = page_args(request.args)
+        return jsonify({'success': True, **get_store().list_stock(limit, offset)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/stock', methods=['POST'])
+def save_stock_item():
+    """
+    Save (insert or replace) a stock item
+    Request body:
+    {
+        "code": "8901234567890",
+        "name": "Rice 1kg",
+        "unit": "pcs",
+        "rate": 60,
+        "discount": 0,
+        "qty": 25,
+        "minAlert": 5
+    }
+    """
+    try:
+        item = get_store().save_stock_item(request.get_json(silent=True))
+        return jsonify({'success': True, 'item': item}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/stock/movements', methods=['POST'])
+def apply_stock_movements():
+    """
+    Apply a bill's (or purchase's) stock movements in one transaction
+    Request body:
+    {
+        "type": "sale",               # or "purchase"
+        "reference": "B1738335934747",
+        "counterId": "counter-1",
+        "movements": [
+            {"code": "8901234567890", "qty": 2, "version": 4},
+            {"code": "8901234567891", "qty": 1}
+        ]
+    }
+
+    "version" is the item version the counter last saw: if another
+    counter changed the item since, nothing is applied and the response
+    is 409 with the current items. Without it, quantities are applied as
+    deltas to the current stock. Resending the same reference is a no-op.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON body required'}), 400
+    kind = data.get('type', SALE)
+    try:
+        result = get_store().apply_stock_movements(
+            kind, data.get('movements'), data.get('reference'), data.get('counterId')
+        )
+    except StockConflict as e:
+        return jsonify({'error': str(e), 'conflicts': e.conflicts}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Low-stock alerts for the items this bill touched
+    alerts = []
+    for item in result['items']:
+        status = stock_status(item)
+        if status != 'ok':
+            alerts.append({'code': item['code'], 'name': item.get('name'), 'qty': item['qty'], 'stock': status})
+    return jsonify({
+        'success': True,
+        'type': kind,
+        'reference': data.get('reference'),
+        **result,
+        'alerts': alerts,
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
+
+@bp.route('/api/stock/low', methods=['GET'])
+def list_low_stock():
+    """List items at or below their minAlert level, out of stock included (?limit=50&offset=0)"""
+    try:
+        limit, offset = page_args(request.args)
+        return jsonify({'success': True, **get_store().list_low_stock(limit, offset)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/api/stock/lookup/<code>', methods=['GET'])
+def lookup_stock_item(code):
+    """
+    Resolve a scanned barcode to its stock item, for scan-to-bill-line
+    Response: {"success": true, "item": {...}, "stock": "ok"|"low"|"out"}
+    "stock" applies the same out-of-stock / low-stock rules as the scan
+    screen, so no second lookup is needed for the alert.
+    """
+    item = get_stock_index().lookup(code)
+    if item is None:
+        return jsonify({'error': 'Stock item not found', 'code': code.strip()}), 404
+    return jsonify({'success': True, 'item': item, 'stock': stock_status(item)}), 200
+
+
+@bp.route('/api/stock/<code>', methods=['GET'])
+def get_stock_item(code):
+    """Get one stock item by code"""
+    item = get_store().get_stock_item(code)
+    if item is None:
+        return jsonify({'error': 'Stock item not found'}), 404
+    return jsonify({'success': True, 'item': item}), 200
+
+
+@bp.route('/api/stock/<code>', methods=['DELETE'])
+def delete_stock_item(code):
+    """Delete one stock item by code"""
+    if not get_store().delete_stock_item(code):
+        return jsonify({'error': 'Stock item not found'}), 404
+    return jsonify({'success': True, 'message': 'Stock item deleted'}), 200
+
+
+@bp.route('/api/sync', methods=['POST'])
+def sync():
+    """
+    Two-way delta sync for offline counters
+    Request body:
+    {
+        "counterId": "counter-1",
+        "cursor": 1200,               # value returned by the previous sync (0 first time)
+        "bills": [...],               # bills created/edited since the last sync
+        "customers": [...],
+        "stock": [...],
+        "deleted": {"bills": ["B1"], "customers": ["919876543210"], "stock": ["8901234567890"]},
+        "limit": 500
+    }
+
+    Local changes are applied in one transaction; stock items must carry
+    the "version" last pulled (none for new items), and stale ones come
+    back in "conflicts" unapplied. The response carries the other
+    counters' changes since "cursor" and the cursor to send next time.
+    Keep calling while "hasMore" is true.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'JSON body required'}), 400
+
+        limit, _ = page_args({'limit': data.get('limit', 500)})
+        try:
+            cursor = int(data.get('cursor') or 0)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'cursor must be an integer'}), 400
+
+        result = get_store().sync(data, cursor, data.get('counterId'), limit)
+        applied = result['applied']
+        logger.info('Sync from %s: %d changes applied, %d stock conflicts, cursor %s -> %s',
+                    data.get('counterId') or 'unknown counter', sum(applied.values()),
+                    len(result['conflicts']), cursor, result['cursor'])
+        return jsonify({
+            'success': True,
+            **result,
+            'timestamp': datetime.now().isoformat()
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error('Error: %s', e)
+        return jsonify({'error': str(e)}), 500
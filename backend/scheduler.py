@@ -0,0 +1,465 @@
+"""
+Billing System - Scheduled SMS
+
+Send endpoints accept a "send_at" time; the message is persisted and a
+background timer sends it when it falls due:
+
+- Jobs live in SQLite (SMS_SCHEDULE_DB), indexed by (status, due_at).
+  Scheduling a job is one index insert, O(log n) however many reminders
+  are pending.
+- The timer keeps the due times within the next SCHEDULER_HORIZON
+  seconds in an in-memory heap, refilled by one index range read per
+  horizon instead of a polling scan of the table; schedule() pushes one
+  entry per call, however many messages it holds. When the earliest
+  time comes, everything due is claimed by one index range read.
+- Wake-ups are rounded up to SCHEDULER_TICK seconds, so every job due
+  within the same tick fires together: recipients of identical texts
+  share multi-number gateway calls (SMS_BATCH_CHUNK_SIZE per call).
+- Times inside SMS_QUIET_HOURS (e.g. 21:00-09:00, server local time) are
+  moved to the end of the quiet period, both when scheduling and when a
+  job comes due late (after a restart).
+- Sends that never reached the gateway (see backend.batching.retryable)
+  are retried with exponential backoff, like queued jobs; sends refused
+  by the rate limiter or circuit breaker are retried after their
+  Retry-After without using up an attempt. Any other failure may have
+  been delivered and fails the job, so nobody gets a reminder twice.
+
+Several gunicorn workers can share one schedule file: a job is leased to
+the worker that claims it, any worker's claim takes every job due, and
+each horizon refill also picks up jobs whose worker died mid-send.
+
+Usage:
+from backend.scheduler import get_scheduler
+plan = get_scheduler(current_gateway()).schedule([('919876543210', 'Your bill is due')], send_at)
+"""
+
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from backend import metrics
+from backend.batching import gateway_chunk_size, map_ordered, plan_chunks, retryable
+from backend.db import Database
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sms_schedules (
+    id TEXT PRIMARY KEY,
+    phone TEXT NOT NULL,
+    message TEXT NOT NULL,
+    status TEXT NOT NULL,
+    send_at REAL NOT NULL,
+    due_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    locked_until REAL,
+    request_id TEXT,
+    gateway TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sms_schedules_due ON sms_schedules (status, due_at);
+"""
+
+# Job states
+SCHEDULED = 'scheduled'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Seconds a worker may hold claimed jobs before another one can reclaim them
+LEASE_SECONDS = 300
+
+UPDATE_SQL = (
+    'UPDATE sms_schedules SET status = ?, due_at = ?, attempts = attempts + ?, locked_until = NULL, '
+    'request_id = ?, gateway = ?, last_error = ?, updated_at = ? WHERE id = ?'
+)
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+
+def parse_send_at(value, max_ahead=None):
+    """
+    (timestamp, None) for an ISO 8601 time or Unix timestamp, or
+    (None, reason). ISO times without an offset are server local time;
+    times in the past mean "as soon as possible".
+    """
+    if max_ahead is None:
+        max_ahead = float(os.getenv('SCHEDULE_MAX_DAYS', 366)) * 86400
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None, 'send_at must be an ISO 8601 time or a Unix timestamp'
+    try:
+        ts = float(value)
+    except ValueError:
+        try:
+            ts = datetime.fromisoformat(value.strip().replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None, 'send_at must be an ISO 8601 time or a Unix timestamp'
+    if not math.isfinite(ts):
+        return None, 'send_at must be an ISO 8601 time or a Unix timestamp'
+    if ts > time.time() + max_ahead:
+        return None, f'send_at must be within {max_ahead / 86400:g} days'
+    return ts, None
+
+
+class QuietHours:
+    """A daily HH:MM-HH:MM window (local time) in which nothing is sent"""
+
+    def __init__(self, spec=None):
+        if spec is None:
+            spec = os.getenv('SMS_QUIET_HOURS', '')
+        self.spec = spec.strip()
+        self.window = None
+        if self.spec:
+            try:
+                start, end = (self._minutes(part) for part in self.spec.split('-'))
+            except ValueError:
+                raise ValueError(f'SMS_QUIET_HOURS must look like 21:00-09:00, got {self.spec!r}')
+            if start != end:
+                self.window = (start, end)
+
+    @staticmethod
+    def _minutes(text):
+        hours, minutes = text.strip().split(':')
+        hours, minutes = int(hours), int(minutes)
+        if not (0 <= hours < 24 and 0 <= minutes < 60):
+            raise ValueError(text)
+        return hours * 60 + minutes
+
+    def defer(self, ts):
+        """ts, or the end of the quiet period ts falls in"""
+        if self.window is None:
+            return ts
+        start, end = self.window
+        moment = datetime.fromtimestamp(ts)
+        minutes = moment.hour * 60 + moment.minute
+        if start < end:
+            quiet = start <= minutes < end
+        else:
+            # Wraps past midnight
+            quiet = minutes >= start or minutes < end
+        if not quiet:
+            return ts
+        resume = moment.replace(hour=end // 60, minute=end % 60, second=0, microsecond=0)
+        if resume <= moment:
+            resume += timedelta(days=1)
+        return resume.timestamp()
+
+
+class Scheduler:
+    """SQLite-backed SMS schedule with an in-memory heap of the jobs due soon"""
+
+    def __init__(self, path, sender, chunk_size=None, horizon=None, tick=None,
+                 fire_batch=None, max_attempts=None, retry_delay=None, quiet_hours=None):
+        """
+        sender(numbers_csv, message) performs one gateway call and
+        returns a gateway result dict (see backend.gateways).
+        """
+        self.db = Database(path, SCHEMA)
+        self.sender = sender
+        self.chunk_size = chunk_size
+        self.horizon = horizon if horizon is not None else float(os.getenv('SCHEDULER_HORIZON', 300))
+        self.tick = tick if tick is not None else float(os.getenv('SCHEDULER_TICK', 1))
+        # Most jobs claimed and sent per wake-up
+        self.fire_batch = fire_batch if fire_batch is not None else int(os.getenv('SCHEDULER_FIRE_BATCH', 5000))
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv('RETRY_ATTEMPTS', 3))
+        self.retry_delay = retry_delay if retry_delay is not None else int(os.getenv('RETRY_DELAY', 5000)) / 1000
+        self.quiet_hours = quiet_hours if quiet_hours is not None else QuietHours()
+
+        # Due times of scheduled jobs before _loaded_until. They only
+        # decide when to wake up: the claim reads what is due from the
+        # table, so stale and duplicate entries are harmless.
+        self._heap = []
+        self._loaded_until = 0.0
+        # A claim hit fire_batch: more is due right now
+        self._backlog = False
+        self._heap_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def schedule(self, items, send_at):
+        """
+        Persist (phone, message) items to be sent at send_at (moved out of
+        quiet hours) in one transaction.
+        Returns {'ids', 'sendAt', 'dueAt', 'deferred'} with ids in item
+        order; deferred is True when quiet hours moved the send time.
+        """
+        now = time.time()
+        start = max(send_at, now)
+        due_at = self.quiet_hours.defer(start)
+        ids = [uuid.uuid4().hex for _ in items]
+        with self.db.transaction() as conn:
+            conn.executemany(
+                'INSERT INTO sms_schedules (id, phone, message, status, send_at, due_at, max_attempts, '
+                'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(job_id, str(phone), message, SCHEDULED, send_at, due_at, self.max_attempts, now, now)
+                 for job_id, (phone, message) in zip(ids, items)]
+            )
+        self._push([due_at])
+        self.start()
+        return {'ids': ids, 'sendAt': send_at, 'dueAt': due_at, 'deferred': due_at > start}
+
+    def get(self, job_id):
+        """Return a job as a JSON-ready dict, or None if it does not exist"""
+        row = self.db.connection().execute(
+            'SELECT * FROM sms_schedules WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'phone': row['phone'],
+            'status': row['status'],
+            'sendAt': _iso(row['due_at']),
+            'requestedSendAt': _iso(row['send_at']),
+            'attempts': row['attempts'],
+            'maxAttempts': row['max_attempts'],
+            'requestId': row['request_id'],
+            'gateway': row['gateway'],
+            'error': row['last_error'],
+            'createdAt': _iso(row['created_at']),
+            'updatedAt': _iso(row['updated_at'])
+        }
+
+    def cancel(self, job_id):
+        """Cancel a job that has not been sent yet; returns True if it was"""
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE sms_schedules SET status = ?, updated_at = ? WHERE id = ? AND status = ?',
+                (CANCELLED, time.time(), job_id, SCHEDULED)
+            )
+        # Its heap entry wakes the timer for nothing
+        return cursor.rowcount == 1
+
+    def pending(self):
+        """Number of jobs waiting for their send time"""
+        return self.db.connection().execute(
+            'SELECT COUNT(*) FROM sms_schedules WHERE status = ?', (SCHEDULED,)
+        ).fetchone()[0]
+
+    def _push(self, due_times):
+        """Add the due times that fall inside the loaded horizon"""
+        with self._heap_lock:
+            first = self._heap[0] if self._heap else math.inf
+            for due_at in due_times:
+                if due_at < self._loaded_until:
+                    heapq.heappush(self._heap, due_at)
+            earlier = bool(self._heap) and self._heap[0] < first
+        if earlier:
+            self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Timer
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the timer thread if it is not running yet"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='sms-scheduler', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                delay = self._tick()
+            except Exception as e:
+                logger.error('❌ SMS scheduler failed: %s', e)
+                delay = self.tick
+            if delay > 0:
+                self._wake.wait(delay)
+            self._wake.clear()
+
+    def _tick(self):
+        """Fire what is due; returns the seconds until the next wake-up"""
+        now = time.time()
+        if now >= self._loaded_until:
+            self._load(now)
+
+        with self._heap_lock:
+            due = False
+            while self._heap and self._heap[0] <= now:
+                heapq.heappop(self._heap)
+                due = True
+            next_due = self._heap[0] if self._heap else math.inf
+        if due or self._backlog:
+            self._backlog = self._fire(now)
+            return 0
+
+        wake = self._loaded_until
+        if next_due < wake:
+            # Round up to the tick so that jobs due close together fire as one batch
+            wake = math.ceil(next_due / self.tick) * self.tick if self.tick > 0 else next_due
+        return max(0.0, wake - time.time())
+
+    def _load(self, now):
+        """Replace the heap with the scheduled jobs due within the next horizon"""
+        until = now + self.horizon
+        with self.db.transaction() as conn:
+            # Jobs whose worker died mid-send go back on the schedule
+            conn.execute(
+                'UPDATE sms_schedules SET status = ?, locked_until = NULL WHERE status = ? AND locked_until < ?',
+                (SCHEDULED, SENDING, now)
+            )
+        # Read under the lock: a job committed after the read is pushed by
+        # schedule() once the lock is released, against the new horizon
+        with self._heap_lock:
+            rows = self.db.connection().execute(
+                'SELECT DISTINCT due_at FROM sms_schedules WHERE status = ? AND due_at < ? ORDER BY due_at',
+                (SCHEDULED, until)
+            ).fetchall()
+            # Sorted rows already form a valid heap
+            self._heap = [row[0] for row in rows]
+            self._loaded_until = until
+
+    def _fire(self, now):
+        """
+        Claim due jobs, send them as coalesced multi-number calls and
+        record the outcomes; True when more jobs are due than one claim takes
+        """
+        resume = self.quiet_hours.defer(now)
+        if resume > now:
+            self._defer_due(now, resume)
+            return False
+
+        jobs = self._claim(now)
+        if not jobs:
+            return False
+
+        # message -> phone -> job ids; the same (phone, message) pair due
+        # at the same time is sent once
+        by_message = defaultdict(lambda: defaultdict(list))
+        for job in jobs:
+            by_message[job['message']][job['phone']].append(job)
+        groups = [(message, list(phones)) for message, phones in by_message.items()]
+        tasks, _ = plan_chunks(groups, self.chunk_size, 0)
+
+        def send_chunk(task):
+            try:
+                return self.sender(','.join(task[3]), task[2])
+            except Exception as e:
+                return {'success': False, 'error': str(e)}
+
+        results = map_ordered(send_chunk, tasks)
+        metrics.BATCH_SIZE.observe(len(jobs), 'scheduler')
+
+        updates = []
+        finished = time.time()
+        for task, result in zip(tasks, results):
+            for phone in task[3]:
+                for job in by_message[task[2]][phone]:
+                    updates.append(self._outcome(job, result, finished))
+        with self.db.transaction() as conn:
+            conn.executemany(UPDATE_SQL, updates)
+        self._push({row[1] for row in updates if row[0] == SCHEDULED})
+
+        sent = sum(1 for row in updates if row[0] == SENT)
+        logger.info('🗓️  Scheduled SMS: %d/%d sent in %d gateway calls', sent, len(jobs), len(tasks))
+        return len(jobs) >= self.fire_batch
+
+    def _claim(self, now):
+        """Lease up to fire_batch due jobs, earliest first, to this worker"""
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                'SELECT id, phone, message, due_at, attempts, max_attempts FROM sms_schedules '
+                'WHERE status = ? AND due_at <= ? ORDER BY due_at LIMIT ?',
+                (SCHEDULED, now, self.fire_batch)
+            ).fetchall()
+            conn.executemany(
+                'UPDATE sms_schedules SET status = ?, attempts = attempts + 1, locked_until = ?, '
+                'updated_at = ? WHERE id = ?',
+                [(SENDING, now + LEASE_SECONDS, now, row['id']) for row in rows]
+            )
+        return [dict(row, attempts=row['attempts'] + 1) for row in rows]
+
+    def _defer_due(self, now, due_at):
+        """Move every job due by now to due_at (the end of quiet hours)"""
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE sms_schedules SET due_at = ?, updated_at = ? WHERE status = ? AND due_at <= ?',
+                (due_at, time.time(), SCHEDULED, now)
+            )
+        self._push([due_at])
+        if cursor.rowcount:
+            logger.info('🌙 %d scheduled SMS deferred to %s (quiet hours)', cursor.rowcount, _iso(due_at))
+
+    def _outcome(self, job, result, now):
+        """UPDATE_SQL parameters for one job after its gateway call"""
+        if result.get('success'):
+            return (SENT, job['due_at'], 0, result.get('request_id'), result.get('gateway'), None, now, job['id'])
+
+        error = result.get('error') or 'Failed to send SMS'
+        if result.get('retry_after') is not None:
+            # Refused locally: the gateway never saw it
+            return (SCHEDULED, now + result['retry_after'], -1, None, result.get('gateway'), error, now, job['id'])
+        if not retryable(result):
+            # May have been delivered: re-sending could text the customer twice
+            error = f"{result.get('error_type') or 'error'}: {error}"
+            logger.error('❌ Scheduled SMS %s failed, not retrying: %s', job['id'], error)
+            return (FAILED, job['due_at'], 0, None, result.get('gateway'), error, now, job['id'])
+        if job['attempts'] >= job['max_attempts']:
+            logger.error('❌ Scheduled SMS %s failed after %d attempts: %s', job['id'], job['attempts'], error)
+            return (FAILED, job['due_at'], 0, None, result.get('gateway'), error, now, job['id'])
+        retry_at = self.quiet_hours.defer(now + self.retry_delay * (2 ** (job['attempts'] - 1)))
+        return (SCHEDULED, retry_at, 0, None, result.get('gateway'), error, now, job['id'])
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _schedule_path():
+    return os.getenv('SMS_SCHEDULE_DB', 'sms_schedule.db')
+
+
+def get_scheduler(gateway):
+    """Return the process-wide scheduler sending through `gateway`, creating it on first use"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler(
+                    _schedule_path(),
+                    gateway.send,
+                    chunk_size=gateway_chunk_size(gateway)
+                )
+    return _scheduler
+
+
+def resume_scheduler(gateway):
+    """Start the timer for jobs left by an earlier process, if a schedule file exists"""
+    if _scheduler is not None or os.path.exists(_schedule_path()):
+        get_scheduler(gateway).start()
+
+
+# Reported once this process has opened the schedule
+metrics.register_gauge(
+    'sms_scheduled_pending', 'Scheduled SMS jobs waiting for their send time',
+    lambda: _scheduler.pending() if _scheduler is not None else 0
+)
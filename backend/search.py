@@ -0,0 +1,162 @@
+"""
+Billing System - Customer and Bill Search Index
+
+One search document per customer (name; phone) and per bill (bill id;
+customer name, phone, item names and codes), written by the store in the
+same transaction as the record itself. Documents feed an SQLite FTS5
+trigram index, kept in step by triggers, so any substring of three or
+more characters (a name fragment, the last digits of a phone) is an index
+lookup instead of a scan of every customer. Shorter type-ahead queries
+match the start of the name or bill id through an ordinary index.
+
+Ranking: exact name / key (phone, bill id) first, then names starting
+with the query, names with a word starting with it, names containing it,
+and matches on phone, customer or items last; most recent activity first
+within each group. Only the SEARCH_CANDIDATES (1000) most recently
+indexed matches are ranked, so a term found in every bill (an item name)
+costs the same as a rare one; narrow the query to reach older records.
+"""
+
+import os
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_docs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    title TEXT NOT NULL COLLATE NOCASE,
+    body TEXT NOT NULL,
+    ts TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_search_docs_record ON search_docs (kind, key);
+CREATE INDEX IF NOT EXISTS idx_search_docs_title ON search_docs (title);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+    title, body, content='search_docs', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS search_docs_insert AFTER INSERT ON search_docs BEGIN
+    INSERT INTO search_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS search_docs_delete AFTER DELETE ON search_docs BEGIN
+    INSERT INTO search_fts (search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS search_docs_update AFTER UPDATE OF title, body ON search_docs BEGIN
+    INSERT INTO search_fts (search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    INSERT INTO search_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+"""
+
+# Trigram matching needs at least this many characters
+MIN_TRIGRAM = 3
+MAX_QUERY_LENGTH = 100
+
+_UPSERT = (
+    'ON CONFLICT(kind, key) DO UPDATE SET title = excluded.title, body = excluded.body, ts = excluded.ts '
+    'WHERE search_docs.title IS NOT excluded.title OR search_docs.body IS NOT excluded.body '
+    'OR search_docs.ts IS NOT excluded.ts'
+)
+
+# Documents are built from the stored rows, so incremental updates and the
+# backfill of older databases index exactly the same text
+_CUSTOMER_DOCS = (
+    "INSERT INTO search_docs (kind, key, title, body, ts) "
+    "SELECT 'customers', key, COALESCE(name, ''), COALESCE(phone, ''), last_bill_at FROM customers "
+)
+_BILL_DOCS = (
+    "INSERT INTO search_docs (kind, key, title, body, ts) "
+    "SELECT 'bills', id, id, COALESCE(customer_name, '') || ' ' || COALESCE(customer_phone, '') || ' ' || "
+    "COALESCE((SELECT group_concat(COALESCE(json_extract(value, '$.name'), '') || ' ' || "
+    "COALESCE(json_extract(value, '$.code'), ''), ' ') FROM json_each(bills.data, '$.items') "
+    "WHERE type = 'object'), ''), "
+    "ts FROM bills "
+)
+
+
+def index_customer(conn, key):
+    """(Re)index one customer; must run inside the transaction that wrote it"""
+    conn.execute(_CUSTOMER_DOCS + 'WHERE key = ? ' + _UPSERT, (key,))
+
+
+def index_bill(conn, bill_id):
+    """(Re)index one bill; must run inside the transaction that wrote it"""
+    conn.execute(_BILL_DOCS + 'WHERE id = ? ' + _UPSERT, (bill_id,))
+
+
+def remove(conn, kind, key):
+    conn.execute('DELETE FROM search_docs WHERE kind = ? AND key = ?', (kind, key))
+
+
+def backfill(conn):
+    """Index records saved before the search index existed"""
+    if conn.execute('SELECT 1 FROM search_docs LIMIT 1').fetchone():
+        return
+    conn.execute(_CUSTOMER_DOCS + 'WHERE true ' + _UPSERT)
+    conn.execute(_BILL_DOCS + 'WHERE true ' + _UPSERT)
+
+
+def _like_prefix(text):
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+
+def query(conn, q, kind=None, limit=50, offset=0, candidates=None):
+    """
+    Rank documents matching every word of `q`.
+    Returns (rows, has_more), rows being (kind, key) pairs.
+    """
+    if candidates is None:
+        candidates = int(os.getenv('SEARCH_CANDIDATES', 1000))
+    q = ' '.join(q.split())
+    if not q:
+        raise ValueError('Search query "q" is required')
+    if len(q) > MAX_QUERY_LENGTH:
+        raise ValueError(f'Search query is limited to {MAX_QUERY_LENGTH} characters')
+
+    words = q.split(' ')
+    long_words = [w for w in words if len(w) >= MIN_TRIGRAM]
+    short_words = [w for w in words if len(w) < MIN_TRIGRAM]
+    params = {
+        'q': q,
+        'prefix': _like_prefix(q),
+        'limit': limit + 1,
+        'offset': offset
+    }
+    filters = ''
+    if kind:
+        filters += ' AND d.kind = :kind'
+        params['kind'] = kind
+    # Words too short for trigrams still have to appear somewhere
+    for i, word in enumerate(short_words):
+        filters += f" AND (d.title || ' ' || d.body) LIKE :short{i} ESCAPE '\\'"
+        params[f'short{i}'] = '%' + _like_prefix(word)
+
+    if not long_words:
+        # Type-ahead on one or two characters: name / bill id prefix, in index order
+        sql = (
+            f"SELECT d.kind, d.key FROM search_docs d WHERE d.title LIKE :prefix ESCAPE '\\'{filters} "
+            f'ORDER BY d.title LIMIT :limit OFFSET :offset'
+        )
+    else:
+        params.update({
+            'match': ' AND '.join('"' + w.replace('"', '""') + '"' for w in long_words),
+            'word': '% ' + _like_prefix(q),
+            'candidates': candidates
+        })
+        # Exact name / key (phone, bill id) hits always make the cut; the
+        # rest is the newest `candidates` FTS matches, FTS5 walking rowids
+        # backwards so common terms do not rank every document
+        sql = (
+            'WITH hits (id) AS ('
+            'SELECT rowid FROM (SELECT rowid FROM search_fts WHERE search_fts MATCH :match '
+            'ORDER BY rowid DESC LIMIT :candidates) '
+            'UNION SELECT id FROM search_docs WHERE title = :q '
+            'UNION SELECT id FROM search_docs WHERE kind IN (\'customers\', \'bills\') AND key = :q) '
+            f'SELECT d.kind, d.key FROM hits JOIN search_docs d ON d.id = hits.id WHERE 1{filters} '
+            'ORDER BY CASE WHEN d.title = :q OR d.key = :q THEN 0 '
+            "WHEN d.title LIKE :prefix ESCAPE '\\' THEN 1 "
+            "WHEN d.title LIKE :word ESCAPE '\\' THEN 2 "
+            'WHEN instr(lower(d.title), lower(:q)) THEN 3 ELSE 4 END, d.ts DESC '
+            'LIMIT :limit OFFSET :offset'
+        )
+    rows = [(row['kind'], row['key']) for row in conn.execute(sql, params)]
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,378 @@
+"""
+Billing System - SMS Send Services
+
+Request validation and response building for the SMS endpoints, kept
+free of Flask so that every serving mode (WSGI views, async views)
+returns the same schemas. Functions return (body, status) or
+(body, status, headers) tuples; views only wrap them in JSON responses.
+
+Gateway results are the dicts produced by backend.gateways.
+"""
+
+import logging
+from datetime import datetime
+
+from backend.gateways import CONNECTION, REFUSED, TIMEOUT
+from backend.phones import normalize
+from backend.scheduler import parse_send_at
+
+logger = logging.getLogger(__name__)
+
+# Largest smsList accepted by /api/send-sms-batch
+MAX_SMS_LIST = 100
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+def error_body(error, status, **extra):
+    return {'success': False, 'error': error, **extra, 'timestamp': _now()}, status
+
+
+# ============================================================================
+# Validation
+# ============================================================================
+
+def validate_sms(data):
+    """(phone, message, None) with the phone normalized, or (None, None, error response)"""
+    data = data if isinstance(data, dict) else {}
+    phone = data.get('phone')
+    message = data.get('message')
+    if not phone or not message:
+        return None, None, error_body('Phone number and message are required', 400)
+
+    phone, error = validate_phone(phone)
+    if error:
+        return None, None, error
+    return phone, message, None
+
+
+def validate_phone(phone):
+    """(normalized phone, None) or (None, error response)"""
+    number, reason = normalize(phone)
+    if reason:
+        logger.warning('⚠️  Invalid phone format: %s', phone)
+        return None, error_body('Invalid phone number format', 400, details=reason)
+    return number, None
+
+
+def validate_sms_item(sms):
+    """(phone, message, None) for one smsList entry, or (raw phone, None, reason)"""
+    if not isinstance(sms, dict) or not sms.get('phone') or not sms.get('message'):
+        return sms.get('phone') if isinstance(sms, dict) else None, None, 'phone and message are required'
+    number, reason = normalize(sms['phone'])
+    if reason:
+        return sms['phone'], None, reason
+    return number, sms['message'], None
+
+
+def validate_send_at(data):
+    """(timestamp or None when sending now, None) or (None, error response)"""
+    value = (data if isinstance(data, dict) else {}).get('send_at')
+    if value in (None, ''):
+        return None, None
+    send_at, reason = parse_send_at(value)
+    if reason:
+        return None, error_body('Invalid send_at', 400, details=reason)
+    return send_at, None
+
+
+def not_configured():
+    logger.error('❌ No SMS gateway configured (FAST2SMS_API_KEY / TWILIO_*)')
+    return error_body('SMS API key not configured', 500)
+
+
+# ============================================================================
+# Single sends
+# ============================================================================
+
+def sent_body(result, phone, label):
+    return {
+        'success': True,
+        'message': f'{label} sent successfully',
+        'phone': phone,
+        'requestId': result.get('request_id'),
+        'gateway': result.get('gateway'),
+        'data': result.get('data'),
+        'timestamp': _now()
+    }, 200
+
+
+def failure_response(result, label):
+    """
+    Response for a failed gateway call: 503 + Retry-After when refused by
+    the rate limiter or circuit breaker, 504/502 for timeouts/connection
+    errors, otherwise the gateway's own error status (400 if it had none).
+    """
+    error_type = result.get('error_type')
+    if error_type == REFUSED:
+        retry_after = result.get('retry_after') or 0
+        body, status = error_body(
+            'SMS gateway unavailable', 503,
+            details=result.get('error'),
+            retryAfter=round(retry_after, 2)
+        )
+        return body, status, {'Retry-After': str(max(1, int(retry_after + 0.999)))}
+
+    if error_type == TIMEOUT:
+        status = 504
+    elif error_type == CONNECTION:
+        status = 502
+    else:
+        status = result.get('status_code') if (result.get('status_code') or 0) >= 400 else 400
+    logger.error('❌ %s failed: %s', label, result.get('error'))
+    body, status = error_body(result.get('error') or f'Failed to send {label}', status)
+    return body, status, {}
+
+
+def queued_body(job, label, diverted=False):
+    return {
+        'success': True,
+        'queued': True,
+        'diverted': diverted,
+        'message': f'{label} queued for delivery',
+        'jobId': job['id'],
+        'status': job['status'],
+        'timestamp': _now()
+    }, 202
+
+
+def scheduled_body(plan, label, extra=None):
+    """202 for messages handed to the scheduler; plan as returned by Scheduler.schedule()"""
+    return {
+        'success': True,
+        'scheduled': True,
+        'message': f'{label} scheduled for delivery',
+        'count': len(plan['ids']),
+        'sendAt': datetime.fromtimestamp(plan['dueAt']).isoformat(),
+        'requestedSendAt': datetime.fromtimestamp(plan['sendAt']).isoformat(),
+        'deferred': plan['deferred'],
+        **(extra or {}),
+        'timestamp': _now()
+    }, 202
+
+
+# ============================================================================
+# Batches
+# ============================================================================
+
+def chunked_batch_response(count, chunks, recipients, label, extra=None):
+    """
+    Outcome of a chunked multi-number batch: 200 when every chunk went
+    out, 207 when some did, otherwise the first failed chunk's status.
+    """
+    sent = sum(1 for r in recipients if r['success'])
+    failed_chunks = [c for c in chunks if not c['success']]
+    body = {
+        **(extra or {}),
+        'count': count,
+        'sent': sent,
+        'failed': len(recipients) - sent,
+        'chunks': chunks,
+        'timestamp': _now()
+    }
+    invalid = (extra or {}).get('invalid', 0)
+
+    if not failed_chunks and not invalid:
+        logger.info('%s sent to %d recipients in %d gateway calls', label, len(recipients), len(chunks))
+        body.update({'success': True, 'message': f'{label} sent successfully'})
+        return body, 200
+    if sent:
+        logger.warning('%s partially sent: %d/%d recipients, %d/%d chunks failed',
+                       label, sent, len(recipients), len(failed_chunks), len(chunks))
+        body.update({
+            'success': False,
+            'message': f'{label} partially sent: {sent}/{len(recipients)} successful',
+            'error': 'Some messages could not be sent'
+        })
+        return body, 207
+    if failed_chunks:
+        logger.error('Failed to send %s: %s', label, failed_chunks[0]['error'])
+        body.update({'success': False, 'error': f'Failed to send {label}'})
+        return body, failed_chunks[0]['statusCode'] or 502
+    body.update({'success': False, 'error': 'No valid records'})
+    return body, 400
+
+
+def numbers_batch_response(entries, numbers, chunks, recipients):
+    """Response for /api/send-batch-sms: per-number results in input order"""
+    delivered = {r['phone']: r for r in recipients}
+    results = []
+    for entry in entries:
+        if 'error' in entry:
+            results.append({**entry, 'success': False})
+            continue
+        recipient = delivered[entry['number']]
+        results.append({
+            'index': entry['index'],
+            'phone': entry['number'],
+            'success': recipient['success'],
+            'chunk': recipient['chunk'],
+            'duplicate': entry['duplicate']
+        })
+    invalid = sum(1 for e in entries if 'error' in e)
+    return chunked_batch_response(len(entries), chunks, recipients, 'Batch SMS', {
+        'unique': len(numbers),
+        'duplicates': len(entries) - len(numbers) - invalid,
+        'invalid': invalid,
+        'results': results
+    })
+
+
+def notification_results(entries, recipients):
+    """Per-record results of a billing-notification batch, in input order"""
+    delivered = {(r['group'], r['phone']): r for r in recipients}
+    results = []
+    for entry in entries:
+        if 'error' in entry:
+            results.append({**entry, 'success': False})
+            continue
+        recipient = delivered[(entry['group'], entry['phone'])]
+        results.append({
+            'index': entry['index'],
+            'phone': entry['phone'],
+            'invoiceId': entry['invoiceId'],
+            'success': recipient['success'],
+            'chunk': recipient['chunk'],
+            'duplicate': entry['duplicate']
+        })
+    return results
+
+
+def scheduled_numbers_response(entries, numbers, plan):
+    """Scheduled /api/send-batch-sms: per-number schedule ids in input order"""
+    ids = dict(zip(numbers, plan['ids']))
+    results = []
+    for entry in entries:
+        if 'error' in entry:
+            results.append({**entry, 'success': False})
+            continue
+        results.append({
+            'index': entry['index'],
+            'phone': entry['number'],
+            'success': True,
+            'scheduleId': ids[entry['number']],
+            'duplicate': entry['duplicate']
+        })
+    invalid = sum(1 for e in entries if 'error' in e)
+    return _scheduled_batch(plan, 'Batch SMS', {
+        'unique': len(numbers),
+        'duplicates': len(entries) - len(numbers) - invalid,
+        'invalid': invalid,
+        'results': results
+    })
+
+
+def scheduled_notifications_response(entries, groups, plan, template_id):
+    """Scheduled /api/billing-notification-batch: per-record schedule ids in input order"""
+    keys = [(group, phone) for group, (_, phones) in enumerate(groups) for phone in phones]
+    ids = dict(zip(keys, plan['ids']))
+    results = []
+    for entry in entries:
+        if 'error' in entry:
+            results.append({**entry, 'success': False})
+            continue
+        results.append({
+            'index': entry['index'],
+            'phone': entry['phone'],
+            'invoiceId': entry['invoiceId'],
+            'success': True,
+            'scheduleId': ids[(entry['group'], entry['phone'])],
+            'duplicate': entry['duplicate']
+        })
+    invalid = sum(1 for e in entries if 'error' in e)
+    return _scheduled_batch(plan, 'Billing notifications', {
+        'template': template_id,
+        'unique': len(keys),
+        'duplicates': len(entries) - len(keys) - invalid,
+        'invalid': invalid,
+        'messages': len(groups),
+        'results': results
+    })
+
+
+def scheduled_sms_list_response(items, plan):
+    """Scheduled /api/send-sms-batch: items are validate_sms_item() tuples"""
+    ids = iter(plan['ids'])
+    results = []
+    for phone, _, error in items:
+        if error:
+            results.append({'phone': phone, 'success': False, 'error': error})
+        else:
+            results.append({'phone': phone, 'success': True, 'scheduleId': next(ids)})
+    return _scheduled_batch(plan, 'Batch SMS', {
+        'invalid': sum(1 for r in results if not r['success']),
+        'results': results
+    })
+
+
+def _scheduled_batch(plan, label, extra):
+    if not plan['ids']:
+        return error_body('No valid records', 400, **extra)
+    return scheduled_body(plan, label, extra)
+
+
+def validate_sms_list(data):
+    """(sms_list, None) or (None, error response) for /api/send-sms-batch"""
+    sms_list = (data if isinstance(data, dict) else {}).get('smsList', [])
+    if not isinstance(sms_list, list) or len(sms_list) == 0:
+        return None, error_body('smsList array required with at least one item', 400)
+    if len(sms_list) > MAX_SMS_LIST:
+        return None, error_body(f'Maximum {MAX_SMS_LIST} SMS per batch', 400)
+    return sms_list, None
+
+
+def batch_item_result(phone, result):
+    """Per-item result for /api/send-sms-batch"""
+    return {
+        'phone': phone,
+        'success': result['success'],
+        'requestId': result.get('request_id'),
+        'gateway': result.get('gateway'),
+        'message': result.get('message') or ('SMS sent' if result['success'] else result.get('error')),
+        'error': None if result['success'] else result.get('error')
+    }
+
+
+def sms_list_response(results):
+    successful = sum(1 for r in results if r['success'])
+    logger.info('✅ Batch complete: %d/%d sent', successful, len(results))
+    return {
+        'success': True,
+        'message': f'Batch sent: {successful}/{len(results)} successful',
+        'count': len(results),
+        'sent': successful,
+        'failed': len(results) - successful,
+        'results': results,
+        'timestamp': _now()
+    }, 200
+
+
+def stream_row_result(row, result):
+    """NDJSON result line for one campaign row"""
+    row_number, phone, _, error = row
+    if error:
+        return {'row': row_number, 'phone': phone, 'success': False, 'error': error}
+    return {
+        'row': row_number,
+        'phone': phone,
+        'success': result['success'],
+        'requestId': result.get('request_id'),
+        'gateway': result.get('gateway'),
+        'message': result.get('message') or ('SMS sent' if result['success'] else result.get('error')),
+        'error': None if result['success'] else result.get('error')
+    }
+
+
+def stream_summary(total, sent, truncated=False, error=None):
+    logger.info('Streamed campaign complete: %d/%d sent', sent, total)
+    return {
+        'summary': True,
+        'total': total,
+        'sent': sent,
+        'failed': total - sent,
+        'truncated': truncated,
+        'error': error,
+        'timestamp': _now()
+    }
@@ -0,0 +1,301 @@
+"""
+Billing System - Durable Outbound SMS Queue
+
+Send endpoints can enqueue a message and return a job id immediately; a
+background dispatcher thread drains the queue at a limited rate and
+retries sends that never reached the gateway (see
+backend.batching.retryable) with exponential backoff. Other failures may
+have been delivered, so the job fails instead of texting the customer
+twice.
+
+Jobs live in SQLite (WAL mode), so they survive restarts and several
+gunicorn workers can share one queue file. A job being sent is leased to
+its dispatcher; if that process dies the lease expires and another
+dispatcher picks the job up again.
+
+Usage:
+from backend.sms_queue import get_sms_queue
+queue = get_sms_queue(current_gateway().send)
+job = queue.enqueue('919876543210', 'Your bill message')
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from backend import metrics
+from backend.batching import retryable
+from backend.db import Database
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sms_jobs (
+    id TEXT PRIMARY KEY,
+    phone TEXT NOT NULL,
+    message TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    locked_until REAL,
+    request_id TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sms_jobs_due ON sms_jobs (status, next_attempt_at);
+"""
+
+# Job states
+QUEUED = 'queued'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+# Seconds a dispatcher may hold a job before another one can reclaim it
+LEASE_SECONDS = 120
+# Longest the dispatcher sleeps when the queue looks empty
+IDLE_POLL_SECONDS = 1.0
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+
+class SMSQueue:
+    """SQLite-backed outbound SMS queue with a background dispatcher"""
+
+    def __init__(self, path, sender, rate=None, max_attempts=None, retry_delay=None):
+        """
+        sender(phone, message) must return a dict with 'success' and
+        optionally 'request_id' / 'error' / 'retry_after', like a
+        gateway backend's send().
+        """
+        self.db = Database(path, SCHEMA)
+        self.sender = sender
+        # Messages per second handed to the gateway
+        self.rate = rate if rate is not None else float(os.getenv('SMS_QUEUE_RATE', 5))
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv('RETRY_ATTEMPTS', 3))
+        # Base retry delay in seconds (RETRY_DELAY is in milliseconds)
+        self.retry_delay = retry_delay if retry_delay is not None else int(os.getenv('RETRY_DELAY', 5000)) / 1000
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._next_send_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def enqueue(self, phone, message):
+        """Persist a new job and wake the dispatcher; returns the job dict"""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self.db.transaction() as conn:
+            conn.execute(
+                'INSERT INTO sms_jobs (id, phone, message, status, max_attempts, '
+                'next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, str(phone), message, QUEUED, self.max_attempts, now, now, now)
+            )
+        self.start()
+        self._wake.set()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Return a job as a JSON-ready dict, or None if it does not exist"""
+        row = self.db.connection().execute(
+            'SELECT * FROM sms_jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'phone': row['phone'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'maxAttempts': row['max_attempts'],
+            'requestId': row['request_id'],
+            'error': row['last_error'],
+            'createdAt': _iso(row['created_at']),
+            'updatedAt': _iso(row['updated_at']),
+            'nextAttemptAt': _iso(row['next_attempt_at']) if row['status'] == QUEUED else None
+        }
+
+    def depth(self):
+        """Number of jobs still waiting to be sent"""
+        return self.db.connection().execute(
+            'SELECT COUNT(*) FROM sms_jobs WHERE status IN (?, ?)', (QUEUED, SENDING)
+        ).fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Dispatcher
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the dispatcher thread if it is not running yet"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='sms-queue-dispatcher', daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                logger.error('❌ SMS queue claim failed: %s', e)
+                job = None
+
+            if job is None:
+                self._wake.wait(IDLE_POLL_SECONDS)
+                self._wake.clear()
+                continue
+
+            self._throttle()
+            try:
+                result = self.sender(job['phone'], job['message'])
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+
+            try:
+                self._finish(job, result)
+            except Exception as e:
+                logger.error('❌ SMS queue update failed for job %s: %s', job['id'], e)
+
+    def _claim(self):
+        """Lease the next due job to this dispatcher, or return None"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                'SELECT * FROM sms_jobs WHERE status = ? AND next_attempt_at <= ? '
+                'ORDER BY next_attempt_at LIMIT 1',
+                (QUEUED, now)
+            ).fetchone()
+            if row is None:
+                # Reclaim jobs whose dispatcher died mid-send
+                row = conn.execute(
+                    'SELECT * FROM sms_jobs WHERE status = ? AND locked_until < ? LIMIT 1',
+                    (SENDING, now)
+                ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'UPDATE sms_jobs SET status = ?, attempts = attempts + 1, '
+                'locked_until = ?, updated_at = ? WHERE id = ?',
+                (SENDING, now + LEASE_SECONDS, now, row['id'])
+            )
+        job = dict(row)
+        job['attempts'] += 1
+        return job
+
+    def _finish(self, job, result):
+        now = time.time()
+        if result.get('retry_after') is not None:
+            # Refused locally (circuit open / rate limited): the gateway
+            # never saw it, so wait it out without using up an attempt
+            with self.db.transaction() as conn:
+                conn.execute(
+                    'UPDATE sms_jobs SET status = ?, attempts = attempts - 1, next_attempt_at = ?, '
+                    'locked_until = NULL, last_error = ?, updated_at = ? WHERE id = ?',
+                    (QUEUED, now + result['retry_after'], result.get('error'), now, job['id'])
+                )
+            return
+
+        if result.get('success'):
+            status, next_attempt_at, error = SENT, now, None
+            logger.info('✅ Queued SMS %s sent to %s', job['id'], job['phone'])
+        else:
+            error = result.get('error') or 'Failed to send SMS'
+            if not retryable(result):
+                status, next_attempt_at = FAILED, now
+                error = f"{result.get('error_type') or 'error'}: {error}"
+                logger.error('❌ Queued SMS %s failed, not retrying: %s', job['id'], error)
+            elif job['attempts'] >= job['max_attempts']:
+                status, next_attempt_at = FAILED, now
+                logger.error('❌ Queued SMS %s failed after %d attempts: %s', job['id'], job['attempts'], error)
+            else:
+                status = QUEUED
+                next_attempt_at = now + self.retry_delay * (2 ** (job['attempts'] - 1))
+                logger.warning('⚠️  Queued SMS %s attempt %d failed, retrying: %s', job['id'], job['attempts'], error)
+
+        with self.db.transaction() as conn:
+            conn.execute(
+                'UPDATE sms_jobs SET status = ?, next_attempt_at = ?, locked_until = NULL, '
+                'request_id = ?, last_error = ?, updated_at = ? WHERE id = ?',
+                (status, next_attempt_at, result.get('request_id'), error, now, job['id'])
+            )
+
+    def _throttle(self):
+        """Space gateway calls so at most `rate` go out per second"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        if self._next_send_at > now:
+            time.sleep(self._next_send_at - now)
+            now = self._next_send_at
+        self._next_send_at = now + 1.0 / self.rate
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_sms_queue(sender):
+    """Return the process-wide queue, creating it on first use"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = SMSQueue(os.getenv('SMS_QUEUE_DB', 'sms_queue.db'), sender)
+    return _queue
+
+
+def resume_sms_queue(gateway):
+    """Start the dispatcher for jobs left queued (or mid-send) by an earlier process"""
+    if _queue is None and not os.path.exists(os.getenv('SMS_QUEUE_DB', 'sms_queue.db')):
+        return
+    queue = get_sms_queue(gateway.send)
+    if queue.depth():
+        queue.start()
+
+
+# Reported once this process has opened the queue
+metrics.register_gauge(
+    'sms_queue_depth', 'Queued SMS jobs not yet sent',
+    lambda: _queue.depth() if _queue is not None else 0
+)
+
+
+def wants_async(request):
+    """
+    True when the caller asked for enqueue-and-return: "async": true in
+    the JSON body, a "Prefer: respond-async" header, or SMS_ASYNC_DEFAULT.
+    """
+    data = request.get_json(silent=True) or {}
+    if 'async' in data:
+        return bool(data.get('async'))
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        return True
+    return os.getenv('SMS_ASYNC_DEFAULT', 'false').lower() == 'true'
+
+
+def divert_to_queue():
+    """True when sends refused by the gateway protection should be queued instead of answering 503"""
+    return os.getenv('SMS_BREAKER_DIVERT', 'false').lower() == 'true'
@@ -0,0 +1,149 @@
+"""
+Billing System - Stock Lookup Index
+
+Barcode scans resolve through an in-memory hash index instead of the
+whole-catalog scan index.html does on every scan:
+
+- the index maps every stock code to its current version, so unknown
+  codes are answered without touching SQLite
+- full items for recently scanned codes are kept in a bounded LRU
+  (STOCK_CACHE_SIZE); a cached item is used only while its version
+  matches the index
+- before each lookup the index follows the store's change log from the
+  last position it saw, so saves, deletes and syncs, including those
+  made by other gunicorn workers, are picked up on the next scan
+
+Scanned codes are matched as typed, then as their EAN-13 / UPC-A twin
+('0' + 12 digits), since scanners report the same barcode either way.
+
+Usage:
+from backend.stock_index import get_stock_index, stock_status
+item = get_stock_index().lookup('8901234567890')
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from backend.store import STOCK, get_store
+
+
+def barcode_variants(code):
+    """The code as scanned, then its EAN-13 / UPC-A twin if it has one"""
+    code = code.strip()
+    if code.isdigit() and len(code) == 12:
+        return code, '0' + code
+    if code.isdigit() and len(code) == 13 and code[0] == '0':
+        return code, code[1:]
+    return (code,)
+
+
+def stock_status(item):
+    """'out', 'low' or 'ok', by the same rules as checkLowStockOnScan"""
+    qty = item.get('qty') or 0
+    if qty <= 0:
+        return 'out'
+    if qty <= (item.get('minAlert') or 0):
+        return 'low'
+    return 'ok'
+
+
+class StockIndex:
+    """Hash index of stock codes plus an LRU of hot items; thread-safe"""
+
+    def __init__(self, store, cache_size=None):
+        if cache_size is None:
+            cache_size = int(os.getenv('STOCK_CACHE_SIZE', 10000))
+        self.store = store
+        self.cache_size = cache_size
+        self._versions = None
+        self._seq = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, code):
+        """The stock item for a scanned code, or None"""
+        self._refresh()
+        for variant in barcode_variants(code):
+            version = self._versions.get(variant)
+            if version is not None:
+                return self._item(variant, version)
+        return None
+
+    def _item(self, code, version):
+        with self._lock:
+            cached = self._items.get(code)
+            if cached is not None and cached['version'] == version:
+                self._items.move_to_end(code)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        item = self.store.get_stock_item(code)
+        if item is None:
+            return None
+        with self._lock:
+            # A write may have landed since the index was refreshed; only
+            # cache what the index agrees is current
+            if self._versions.get(code) == item['version']:
+                self._items[code] = item
+                self._items.move_to_end(code)
+                while len(self._items) > self.cache_size:
+                    self._items.popitem(last=False)
+        return item
+
+    def _refresh(self):
+        """Load the index on first use, then apply stock changes since the last look"""
+        conn = self.store.db.connection()
+        seq = conn.execute('SELECT MAX(seq) FROM change_log').fetchone()[0] or 0
+        if self._versions is not None and seq == self._seq:
+            return
+
+        with self._lock:
+            if self._versions is None:
+                self._versions = {
+                    row['code']: row['version']
+                    for row in conn.execute('SELECT code, version FROM stock')
+                }
+                self._seq = seq
+                return
+            if seq <= self._seq:
+                return
+            rows = conn.execute(
+                'SELECT c.key, s.version FROM change_log c LEFT JOIN stock s ON s.code = c.key '
+                'WHERE c.seq > ? AND c.seq <= ? AND c.kind = ?',
+                (self._seq, seq, STOCK)
+            ).fetchall()
+            for row in rows:
+                self._items.pop(row['key'], None)
+                if row['version'] is None:
+                    self._versions.pop(row['key'], None)
+                else:
+                    self._versions[row['key']] = row['version']
+            self._seq = seq
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'codes': len(self._versions or ()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._items),
+                'maxSize': self.cache_size
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_stock_index():
+    """Return the process-wide stock index, creating it on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = StockIndex(get_store())
+    return _index
@@ -0,0 +1,827 @@
+"""
+Billing System - Bill, Customer and Stock Store
+
+Server-side persistence for the records index.html keeps in localStorage.
+Bills, customers and stock items are stored as their original JSON
+objects, with the fields used for lookups copied into indexed columns
+(bill id, customer phone, date and month key), so queries stay fast as
+history grows.
+
+Usage:
+from backend.store import get_store
+store = get_store()
+store.save_bill(bill)
+page = store.list_bills(customer='919876543210', limit=50)
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from backend import aggregates, search
+from backend.db import Database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bills (
+    id TEXT PRIMARY KEY,
+    ts TEXT NOT NULL,
+    date_key TEXT NOT NULL,
+    month_key TEXT NOT NULL,
+    customer_key TEXT,
+    customer_phone TEXT,
+    customer_name TEXT,
+    grand_total REAL NOT NULL DEFAULT 0,
+    type TEXT,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bills_ts ON bills (ts);
+CREATE INDEX IF NOT EXISTS idx_bills_customer ON bills (customer_phone, ts);
+CREATE INDEX IF NOT EXISTS idx_bills_customer_key ON bills (customer_key, ts);
+CREATE INDEX IF NOT EXISTS idx_bills_date ON bills (date_key, ts);
+CREATE INDEX IF NOT EXISTS idx_bills_month ON bills (month_key, ts);
+
+CREATE TABLE IF NOT EXISTS customers (
+    key TEXT PRIMARY KEY,
+    name TEXT,
+    phone TEXT,
+    last_bill_at TEXT,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers (phone);
+CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name);
+CREATE INDEX IF NOT EXISTS idx_customers_last_bill ON customers (last_bill_at);
+
+CREATE TABLE IF NOT EXISTS stock (
+    code TEXT PRIMARY KEY,
+    name TEXT,
+    qty REAL NOT NULL DEFAULT 0,
+    min_alert REAL NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stock_name ON stock (name);
+-- Only items at or below their alert level, kept current by SQLite as qty changes
+CREATE INDEX IF NOT EXISTS idx_stock_low ON stock (code) WHERE qty <= min_alert;
+
+-- Ledger of sale/purchase movements; reference (bill id) makes retries safe
+CREATE TABLE IF NOT EXISTS stock_movements (
+    id INTEGER PRIMARY KEY,
+    reference TEXT,
+    type TEXT NOT NULL,
+    code TEXT NOT NULL,
+    qty REAL NOT NULL,
+    origin TEXT,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stock_movements_ref ON stock_movements (reference, type);
+
+-- One row per record, re-inserted on every write so that seq always
+-- holds the record's latest change; AUTOINCREMENT never reuses a seq
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    op TEXT NOT NULL,
+    origin TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_record ON change_log (kind, key);
+"""
+
+# change_log kinds
+BILLS = 'bills'
+CUSTOMERS = 'customers'
+STOCK = 'stock'
+# change_log ops
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+# stock movement types
+SALE = 'sale'
+PURCHASE = 'purchase'
+MOVEMENT_TYPES = (SALE, PURCHASE)
+MAX_MOVEMENTS = 1000
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Rows read per query by the export iterators
+EXPORT_BATCH = 500
+
+
+class StockConflict(Exception):
+    """Stock items changed since the client read them; nothing was applied"""
+
+    def __init__(self, conflicts):
+        super().__init__('Stock changed since it was read')
+        # [{'code', 'expected', 'item'}], item being the current record or None
+        self.conflicts = conflicts
+
+
+def page_args(args):
+    """Parse ?limit=&offset= query arguments, clamped to sane bounds"""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        offset = int(args.get('offset', 0))
+    except (TypeError, ValueError):
+        raise ValueError('limit and offset must be integers')
+    return max(1, min(limit, MAX_PAGE_SIZE)), max(0, offset)
+
+
+def customer_key(name, mobile):
+    """Same key index.html uses for its customers map"""
+    return mobile or f'__anon__:{name}'
+
+
+def _date_key(ts):
+    """Local calendar date (YYYY-MM-DD) of an ISO timestamp"""
+    try:
+        dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        raise ValueError('Bill "ts" must be an ISO 8601 timestamp')
+    if dt.tzinfo is not None:
+        dt = dt.astimezone()
+    return dt.strftime('%Y-%m-%d')
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class Store:
+    """SQLite-backed store for bills, customers and stock items"""
+
+    def __init__(self, path):
+        self.db = Database(path, SCHEMA + aggregates.SCHEMA + search.SCHEMA)
+        self._backfill_aggregates()
+        with self.db.transaction() as conn:
+            search.backfill(conn)
+        self._backfill_change_log()
+
+    # ------------------------------------------------------------------
+    # Bills
+    # ------------------------------------------------------------------
+
+    def save_bill(self, bill):
+        """Insert or replace a bill (index.html bill object); returns it"""
+        with self.db.transaction() as conn:
+            bill_id = self._write_bill(conn, bill)
+        return self.get_bill(bill_id)
+
+    def _write_bill(self, conn, bill, origin=None):
+        if not isinstance(bill, dict) or not bill.get('id'):
+            raise ValueError('Bill object with an "id" is required')
+        bill = dict(bill)
+        # Drop server-managed fields echoed back by clients
+        bill.pop('version', None)
+        bill.pop('updatedAt', None)
+        bill.setdefault('ts', datetime.now().astimezone().isoformat())
+        date_key = _date_key(bill['ts'])
+        month_key = bill.get('month') or date_key[:7]
+        bill['month'] = month_key
+        name = bill.get('custName') or 'Customer'
+        mobile = bill.get('custMobile') or ''
+        now = time.time()
+
+        previous = self._unapply_bill(conn, bill['id'])
+        conn.execute(
+            'INSERT INTO bills (id, ts, date_key, month_key, customer_key, customer_phone, '
+            'customer_name, grand_total, type, data, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET ts = excluded.ts, date_key = excluded.date_key, '
+            'month_key = excluded.month_key, customer_key = excluded.customer_key, '
+            'customer_phone = excluded.customer_phone, customer_name = excluded.customer_name, '
+            'grand_total = excluded.grand_total, type = excluded.type, data = excluded.data, '
+            'version = bills.version + 1, updated_at = excluded.updated_at',
+            (bill['id'], bill['ts'], date_key, month_key, customer_key(name, mobile),
+             mobile or None, name, _number(bill.get('grandTotal')), bill.get('type', 'sale'),
+             json.dumps(bill), now)
+        )
+        self._log_change(conn, BILLS, bill['id'], UPSERT, origin)
+        self._touch_customer(conn, name, mobile, bill['ts'], now, origin)
+        aggregates.apply_bill(conn, bill, date_key, month_key, customer_key(name, mobile))
+        if previous is not None:
+            # The bill may have moved to another customer or an earlier time
+            self._refresh_bill_dates(conn, previous, origin)
+        search.index_bill(conn, bill['id'])
+        return bill['id']
+
+    def get_bill(self, bill_id):
+        row = self.db.connection().execute(
+            'SELECT data, version, updated_at FROM bills WHERE id = ?', (bill_id,)
+        ).fetchone()
+        return self._bill(row) if row else None
+
+    def delete_bill(self, bill_id):
+        """Delete a bill; returns False if it did not exist"""
+        with self.db.transaction() as conn:
+            return self._remove_bill(conn, bill_id)
+
+    def _remove_bill(self, conn, bill_id, origin=None):
+        previous = self._unapply_bill(conn, bill_id)
+        cursor = conn.execute('DELETE FROM bills WHERE id = ?', (bill_id,))
+        if cursor.rowcount:
+            self._log_change(conn, BILLS, bill_id, DELETE, origin)
+            self._refresh_bill_dates(conn, previous, origin)
+            search.remove(conn, BILLS, bill_id)
+        return cursor.rowcount > 0
+
+    def _unapply_bill(self, conn, bill_id):
+        """
+        Remove an existing bill's contribution from the running totals;
+        returns the key of the customer it belonged to, or None if it is new
+        """
+        row = conn.execute(
+            'SELECT data, date_key, month_key, customer_key FROM bills WHERE id = ?', (bill_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        aggregates.apply_bill(conn, json.loads(row['data']), row['date_key'],
+                              row['month_key'], row['customer_key'], sign=-1)
+        return row['customer_key']
+
+    def _refresh_bill_dates(self, conn, key, origin=None):
+        """
+        Re-read a customer's first and last bill times once one of their
+        bills was moved or deleted; running totals can only widen them
+        """
+        conn.execute(
+            'UPDATE customer_totals SET '
+            'first_bill_at = (SELECT MIN(ts) FROM bills WHERE customer_key = ?), '
+            'last_bill_at = (SELECT MAX(ts) FROM bills WHERE customer_key = ?) WHERE customer_key = ?',
+            (key, key, key)
+        )
+        cursor = conn.execute(
+            'UPDATE customers SET last_bill_at = (SELECT MAX(ts) FROM bills WHERE customer_key = ?) '
+            'WHERE key = ? AND last_bill_at IS NOT (SELECT MAX(ts) FROM bills WHERE customer_key = ?)',
+            (key, key, key)
+        )
+        if cursor.rowcount:
+            self._log_change(conn, CUSTOMERS, key, UPSERT, origin)
+
+    def list_bills(self, customer=None, date=None, month=None, date_from=None,
+                   date_to=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+        """
+        Newest-first page of bills matching the filters.
+        Returns {'items': [...], 'limit', 'offset', 'hasMore'}.
+        """
+        where, params = [], []
+        if customer:
+            where.append('customer_phone = ?')
+            params.append(customer)
+        if date:
+            where.append('date_key = ?')
+            params.append(date)
+        if month:
+            where.append('month_key = ?')
+            params.append(month)
+        if date_from:
+            where.append('date_key >= ?')
+            params.append(date_from)
+        if date_to:
+            where.append('date_key <= ?')
+            params.append(date_to)
+
+        sql = 'SELECT data, version, updated_at FROM bills'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY ts DESC LIMIT ? OFFSET ?'
+        # Fetch one extra row to learn whether another page exists
+        rows = self.db.connection().execute(sql, params + [limit + 1, offset]).fetchall()
+        return {
+            'items': [self._bill(row) for row in rows[:limit]],
+            'limit': limit,
+            'offset': offset,
+            'hasMore': len(rows) > limit
+        }
+
+    def iter_bills(self, date_from=None, date_to=None, batch=EXPORT_BATCH):
+        """
+        Every bill dated within the range, oldest first, for exports.
+        Read in keyset-paged batches that resume after the last row seen,
+        so memory stays flat and no read transaction is held open while
+        the caller streams.
+        """
+        where, params = ['(date_key, ts, rowid) > (?, ?, ?)'], []
+        if date_from:
+            where.append('date_key >= ?')
+            params.append(date_from)
+        if date_to:
+            where.append('date_key <= ?')
+            params.append(date_to)
+        sql = ('SELECT rowid, date_key, ts, data, version, updated_at FROM bills WHERE '
+               + ' AND '.join(where) + ' ORDER BY date_key, ts, rowid LIMIT ?')
+
+        last = ('', '', 0)
+        while True:
+            rows = self.db.connection().execute(sql, [*last, *params, batch]).fetchall()
+            for row in rows:
+                yield self._bill(row)
+            if len(rows) < batch:
+                return
+            last = (rows[-1]['date_key'], rows[-1]['ts'], rows[-1]['rowid'])
+
+    @staticmethod
+    def _bill(row):
+        bill = json.loads(row['data'])
+        bill['version'] = row['version']
+        bill['updatedAt'] = datetime.fromtimestamp(row['updated_at']).isoformat()
+        return bill
+
+    # ------------------------------------------------------------------
+    # Sales aggregates
+    # ------------------------------------------------------------------
+
+    def _backfill_aggregates(self):
+        """Build aggregates once for bills saved before they existed"""
+        conn = self.db.connection()
+        if conn.execute('SELECT 1 FROM sales_monthly LIMIT 1').fetchone():
+            return
+        if not conn.execute('SELECT 1 FROM bills LIMIT 1').fetchone():
+            return
+        with self.db.transaction() as conn:
+            rows = conn.execute('SELECT data, date_key, month_key, customer_key FROM bills')
+            aggregates.rebuild(conn, (
+                (json.loads(row['data']), row['date_key'], row['month_key'], row['customer_key'])
+                for row in rows
+            ))
+
+    def sales_daily(self, date_from=None, date_to=None, limit=31):
+        return aggregates.daily(self.db.connection(), date_from, date_to, limit)
+
+    def sales_monthly(self, limit=12):
+        return aggregates.monthly(self.db.connection(), limit)
+
+    def sales_summary(self, date_key=None, month_key=None):
+        """Totals for today and the current month (or the given keys)"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        return aggregates.period(self.db.connection(), date_key or today,
+                                 month_key or (date_key or today)[:7])
+
+    def top_customers(self, limit=DEFAULT_PAGE_SIZE, offset=0):
+        return aggregates.top_customers(self.db.connection(), limit, offset)
+
+    def customer_totals(self, key):
+        return aggregates.customer(self.db.connection(), key)
+
+    # ------------------------------------------------------------------
+    # Customers
+    # ------------------------------------------------------------------
+
+    def _touch_customer(self, conn, name, mobile, bill_ts, now, origin=None):
+        """Create or refresh the customer a bill belongs to"""
+        key = customer_key(name, mobile)
+        conn.execute(
+            'INSERT INTO customers (key, name, phone, last_bill_at, data, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET name = excluded.name, '
+            'last_bill_at = MAX(COALESCE(customers.last_bill_at, \'\'), excluded.last_bill_at), '
+            'updated_at = excluded.updated_at',
+            (key, name, mobile or None, bill_ts,
+             json.dumps({'name': name, 'mobile': mobile}), now)
+        )
+        self._log_change(conn, CUSTOMERS, key, UPSERT, origin)
+        search.index_customer(conn, key)
+
+    def save_customer(self, customer):
+        """Insert or update a customer record ({name, mobile, ...})"""
+        with self.db.transaction() as conn:
+            key = self._write_customer(conn, customer)
+        return self.get_customer(key)
+
+    def _write_customer(self, conn, customer, origin=None):
+        if not isinstance(customer, dict) or not (customer.get('mobile') or customer.get('name')):
+            raise ValueError('Customer "mobile" or "name" is required')
+        customer = {k: v for k, v in customer.items()
+                    if k not in ('key', 'version', 'lastBillAt')}
+        name = customer.get('name') or 'Customer'
+        mobile = customer.get('mobile') or ''
+        key = customer_key(name, mobile)
+        conn.execute(
+            'INSERT INTO customers (key, name, phone, data, updated_at) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET name = excluded.name, data = excluded.data, '
+            'version = customers.version + 1, updated_at = excluded.updated_at',
+            (key, name, mobile or None, json.dumps(customer), time.time())
+        )
+        self._log_change(conn, CUSTOMERS, key, UPSERT, origin)
+        search.index_customer(conn, key)
+        return key
+
+    def get_customer(self, key):
+        """Look a customer up by mobile number (or anonymous key)"""
+        row = self.db.connection().execute(
+            'SELECT * FROM customers WHERE key = ?', (key,)
+        ).fetchone()
+        return self._customer(row) if row else None
+
+    def _remove_customer(self, conn, key, origin=None):
+        cursor = conn.execute('DELETE FROM customers WHERE key = ?', (key,))
+        if cursor.rowcount:
+            self._log_change(conn, CUSTOMERS, key, DELETE, origin)
+            search.remove(conn, CUSTOMERS, key)
+        return cursor.rowcount > 0
+
+    def list_customers(self, limit=DEFAULT_PAGE_SIZE, offset=0):
+        """Page of customers, most recently billed first"""
+        rows = self.db.connection().execute(
+            'SELECT * FROM customers ORDER BY last_bill_at DESC LIMIT ? OFFSET ?',
+            (limit + 1, offset)
+        ).fetchall()
+        return {
+            'items': [self._customer(row) for row in rows[:limit]],
+            'limit': limit,
+            'offset': offset,
+            'hasMore': len(rows) > limit
+        }
+
+    def iter_customers(self, date_from=None, date_to=None, batch=EXPORT_BATCH):
+        """
+        Every customer by key, with lifetime bill count and spend, for
+        exports; date_from / date_to (YYYY-MM-DD) filter on the local date
+        of the last bill, as bills are filtered on theirs.
+        Keyset-paged like iter_bills().
+        """
+        sql = ('SELECT c.*, t.bills, t.revenue FROM customers c '
+               'LEFT JOIN customer_totals t ON t.customer_key = c.key '
+               'WHERE c.key > ? ORDER BY c.key LIMIT ?')
+
+        last = ''
+        while True:
+            rows = self.db.connection().execute(sql, (last, batch)).fetchall()
+            for row in rows:
+                if date_from or date_to:
+                    # last_bill_at is the bill's own timestamp (maybe UTC):
+                    # compare its local date, not its text
+                    if not row['last_bill_at']:
+                        continue
+                    day = _date_key(row['last_bill_at'])
+                    if (date_from and day < date_from) or (date_to and day > date_to):
+                        continue
+                customer = self._customer(row)
+                customer.update({'bills': row['bills'] or 0, 'totalSpent': row['revenue'] or 0.0})
+                yield customer
+            if len(rows) < batch:
+                return
+            last = rows[-1]['key']
+
+    @staticmethod
+    def _customer(row):
+        customer = json.loads(row['data'])
+        customer.update({
+            'key': row['key'],
+            'name': row['name'],
+            'mobile': row['phone'] or '',
+            'lastBillAt': row['last_bill_at'],
+            'version': row['version']
+        })
+        return customer
+
+    # ------------------------------------------------------------------
+    # Stock
+    # ------------------------------------------------------------------
+
+    def save_stock_item(self, item):
+        """Insert or replace a stock item ({code, name, qty, minAlert, ...})"""
+        with self.db.transaction() as conn:
+            code = self._write_stock_item(conn, item)
+        return self.get_stock_item(code)
+
+    def _write_stock_item(self, conn, item, origin=None):
+        if not isinstance(item, dict) or not item.get('code'):
+            raise ValueError('Stock item with a "code" is required')
+        item = {k: v for k, v in item.items() if k != 'version'}
+        conn.execute(
+            'INSERT INTO stock (code, name, qty, min_alert, data, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(code) DO UPDATE SET name = excluded.name, qty = excluded.qty, '
+            'min_alert = excluded.min_alert, data = excluded.data, '
+            'version = stock.version + 1, updated_at = excluded.updated_at',
+            (item['code'], item.get('name'), _number(item.get('qty')),
+             _number(item.get('minAlert')), json.dumps(item), time.time())
+        )
+        self._log_change(conn, STOCK, item['code'], UPSERT, origin)
+        return item['code']
+
+    def get_stock_item(self, code):
+        row = self.db.connection().execute(
+            'SELECT * FROM stock WHERE code = ?', (code,)
+        ).fetchone()
+        return self._stock(row) if row else None
+
+    def delete_stock_item(self, code):
+        with self.db.transaction() as conn:
+            return self._remove_stock_item(conn, code)
+
+    def _remove_stock_item(self, conn, code, origin=None):
+        cursor = conn.execute('DELETE FROM stock WHERE code = ?', (code,))
+        if cursor.rowcount:
+            self._log_change(conn, STOCK, code, DELETE, origin)
+        return cursor.rowcount > 0
+
+    def list_stock(self, limit=DEFAULT_PAGE_SIZE, offset=0):
+        """Page of stock items ordered by code"""
+        rows = self.db.connection().execute(
+            'SELECT * FROM stock ORDER BY code LIMIT ? OFFSET ?', (limit + 1, offset)
+        ).fetchall()
+        return {
+            'items': [self._stock(row) for row in rows[:limit]],
+            'limit': limit,
+            'offset': offset,
+            'hasMore': len(rows) > limit
+        }
+
+    def list_low_stock(self, limit=DEFAULT_PAGE_SIZE, offset=0):
+        """Page of items at or below their minAlert level (out of stock included), by code"""
+        rows = self.db.connection().execute(
+            'SELECT * FROM stock WHERE qty <= min_alert ORDER BY code LIMIT ? OFFSET ?',
+            (limit + 1, offset)
+        ).fetchall()
+        return {
+            'items': [self._stock(row) for row in rows[:limit]],
+            'limit': limit,
+            'offset': offset,
+            'hasMore': len(rows) > limit
+        }
+
+    def apply_stock_movements(self, kind, movements, reference=None, origin=None):
+        """
+        Apply all stock movements of one bill or purchase in a single
+        transaction.
+
+        movements: [{'code', 'qty', 'version', 'rate'}]; 'version' (the
+                   version the client last saw) and 'rate' are optional
+
+        Sales take qty off and skip unknown codes, as adjustStockOnSale
+        does; purchases add it, creating unknown items and updating the
+        rate, as confirmPurchase does. Lines for the same code are summed.
+        Quantities are applied as deltas, so concurrent counters never
+        overwrite each other; when a 'version' no longer matches, nothing
+        is applied and StockConflict is raised. A reference (bill id)
+        already applied for this type is not applied twice.
+
+        Returns {'applied', 'duplicate', 'skipped', 'items'}, items being
+        the affected records after the change.
+        """
+        if kind not in MOVEMENT_TYPES:
+            raise ValueError(f'type must be one of: {", ".join(MOVEMENT_TYPES)}')
+        if not isinstance(movements, list) or not movements:
+            raise ValueError('"movements" must be a non-empty list')
+        if len(movements) > MAX_MOVEMENTS:
+            raise ValueError(f'Maximum {MAX_MOVEMENTS} movements per request')
+
+        deltas = {}
+        expected = {}
+        rates = {}
+        for movement in movements:
+            if not isinstance(movement, dict) or not movement.get('code'):
+                raise ValueError('Each movement needs a "code"')
+            code = str(movement['code'])
+            try:
+                qty = float(movement.get('qty'))
+            except (TypeError, ValueError):
+                qty = 0.0
+            if not qty > 0:
+                raise ValueError(f'Movement "qty" for {code} must be a positive number')
+            deltas[code] = deltas.get(code, 0) + qty
+            if movement.get('version') is not None:
+                try:
+                    expected[code] = int(movement['version'])
+                except (TypeError, ValueError):
+                    raise ValueError(f'Movement "version" for {code} must be an integer')
+            if movement.get('rate') is not None:
+                rates[code] = _number(movement['rate'])
+
+        codes = list(deltas)
+        placeholders = ','.join('?' * len(codes))
+        sign = -1 if kind == SALE else 1
+        now = time.time()
+        with self.db.transaction() as conn:
+            duplicate = bool(reference) and conn.execute(
+                'SELECT 1 FROM stock_movements WHERE reference = ? AND type = ? LIMIT 1',
+                (reference, kind)
+            ).fetchone() is not None
+            current = {row['code']: row for row in conn.execute(
+                f'SELECT * FROM stock WHERE code IN ({placeholders})', codes
+            )}
+            if duplicate:
+                return {'applied': 0, 'duplicate': True, 'skipped': [],
+                        'items': [self._stock(row) for row in current.values()]}
+
+            conflicts = [
+                {'code': code, 'expected': version,
+                 'item': self._stock(current[code]) if code in current else None}
+                for code, version in expected.items()
+                if code not in current or current[code]['version'] != version
+            ]
+            if conflicts:
+                raise StockConflict(conflicts)
+
+            applied = [code for code in codes if code in current]
+            skipped = []
+            for code in codes:
+                if code in current:
+                    continue
+                if kind == SALE:
+                    skipped.append(code)
+                    continue
+                self._write_stock_item(conn, {'code': code, 'name': code, 'qty': deltas[code],
+                                              'minAlert': 0, 'rate': rates.get(code, 0)}, origin)
+            conn.executemany(
+                'UPDATE stock SET qty = qty + ?, version = version + 1, updated_at = ? WHERE code = ?',
+                [(sign * deltas[code], now, code) for code in applied]
+            )
+            conn.executemany(
+                "UPDATE stock SET data = json_set(data, '$.rate', ?) WHERE code = ?",
+                [(rates[code], code) for code in applied if code in rates]
+            )
+            for code in applied:
+                self._log_change(conn, STOCK, code, UPSERT, origin)
+
+            moved = [code for code in codes if code not in skipped]
+            conn.executemany(
+                'INSERT INTO stock_movements (reference, type, code, qty, origin, ts) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(reference, kind, code, sign * deltas[code], origin, now) for code in moved]
+            )
+            rows = conn.execute(
+                f'SELECT * FROM stock WHERE code IN ({placeholders})', codes
+            ).fetchall()
+        return {'applied': len(moved), 'duplicate': False, 'skipped': skipped,
+                'items': [self._stock(row) for row in rows]}
+
+    @staticmethod
+    def _stock(row):
+        item = json.loads(row['data'])
+        item.update({
+            'code': row['code'],
+            'qty': row['qty'],
+            'minAlert': row['min_alert'],
+            'version': row['version']
+        })
+        return item
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def search(self, q, kind=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+        """
+        Ranked page of customers and bills matching `q` (see backend.search).
+        kind: 'customers' or 'bills' to search only one of them
+        """
+        if kind not in (None, CUSTOMERS, BILLS):
+            raise ValueError(f'type must be {CUSTOMERS} or {BILLS}')
+        rows, has_more = search.query(self.db.connection(), q, kind, limit, offset)
+        getters = {BILLS: self.get_bill, CUSTOMERS: self.get_customer}
+        results = []
+        for row_kind, key in rows:
+            record = getters[row_kind](key)
+            if record is not None:
+                results.append({'type': row_kind, 'key': key, 'record': record})
+        return {
+            'items': results,
+            'limit': limit,
+            'offset': offset,
+            'hasMore': has_more
+        }
+
+    # ------------------------------------------------------------------
+    # Delta sync
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _log_change(conn, kind, key, op, origin=None):
+        """Move a record to the head of the change log"""
+        conn.execute(
+            'INSERT OR REPLACE INTO change_log (kind, key, op, origin) VALUES (?, ?, ?, ?)',
+            (kind, key, op, origin)
+        )
+
+    def _backfill_change_log(self):
+        """Log records saved before the change log existed"""
+        conn = self.db.connection()
+        if conn.execute('SELECT 1 FROM change_log LIMIT 1').fetchone():
+            return
+        with self.db.transaction() as conn:
+            for kind, key_col in ((BILLS, 'id'), (CUSTOMERS, 'key'), (STOCK, 'code')):
+                conn.execute(
+                    f'INSERT OR IGNORE INTO change_log (kind, key, op) '
+                    f'SELECT ?, {key_col}, ? FROM {kind} ORDER BY updated_at',
+                    (kind, UPSERT)
+                )
+
+    def sync(self, changes, cursor=0, origin=None, limit=500):
+        """
+        Apply a counter's changes and return everyone else's since `cursor`.
+
+        changes: {'bills': [...], 'customers': [...], 'stock': [...],
+                  'deleted': {'bills': [ids], 'customers': [keys], 'stock': [codes]}}
+
+        All incoming changes are applied in one transaction. Bills and
+        customers are last writer wins. A stock item is only written if it
+        still has the 'version' the counter read (and is only created if
+        it has none and does not exist), so a counter's stale quantity
+        never overwrites sales made elsewhere; the others are returned in
+        'conflicts' as [{'code', 'expected', 'item'}], like StockConflict.
+        Outgoing changes skip records this origin wrote last, and are
+        capped at `limit`; the returned cursor is the last change log
+        position scanned, so the client resumes from there.
+        """
+        changes = changes or {}
+        deleted = changes.get('deleted') or {}
+        for name in (BILLS, CUSTOMERS, STOCK):
+            if not isinstance(changes.get(name) or [], list):
+                raise ValueError(f'"{name}" must be a list')
+            if not isinstance(deleted.get(name) or [], list):
+                raise ValueError(f'"deleted.{name}" must be a list')
+
+        applied = {BILLS: 0, CUSTOMERS: 0, STOCK: 0, 'deleted': 0}
+        conflicts = []
+        with self.db.transaction() as conn:
+            for bill in changes.get(BILLS) or []:
+                self._write_bill(conn, bill, origin)
+                applied[BILLS] += 1
+            for customer in changes.get(CUSTOMERS) or []:
+                self._write_customer(conn, customer, origin)
+                applied[CUSTOMERS] += 1
+            for item in changes.get(STOCK) or []:
+                conflict = self._stale_stock_item(conn, item)
+                if conflict:
+                    conflicts.append(conflict)
+                    continue
+                self._write_stock_item(conn, item, origin)
+                applied[STOCK] += 1
+            for bill_id in deleted.get(BILLS) or []:
+                applied['deleted'] += self._remove_bill(conn, str(bill_id), origin)
+            for key in deleted.get(CUSTOMERS) or []:
+                applied['deleted'] += self._remove_customer(conn, str(key), origin)
+            for code in deleted.get(STOCK) or []:
+                applied['deleted'] += self._remove_stock_item(conn, str(code), origin)
+
+        return {'applied': applied, 'conflicts': conflicts, **self.changes_since(cursor, origin, limit)}
+
+    def _stale_stock_item(self, conn, item):
+        """Conflict entry if a synced stock item changed since the counter read it, else None"""
+        if not isinstance(item, dict) or not item.get('code'):
+            # _write_stock_item rejects it
+            return None
+        code = str(item['code'])
+        expected = item.get('version')
+        if expected is not None:
+            try:
+                expected = int(expected)
+            except (TypeError, ValueError):
+                raise ValueError(f'Stock "version" for {code} must be an integer')
+        row = conn.execute('SELECT * FROM stock WHERE code = ?', (code,)).fetchone()
+        if (row['version'] if row else None) == expected:
+            return None
+        return {'code': code, 'expected': expected, 'item': self._stock(row) if row else None}
+
+    def changes_since(self, cursor=0, origin=None, limit=500):
+        """Records changed after `cursor`, grouped by kind"""
+        conn = self.db.connection()
+        rows = conn.execute(
+            'SELECT seq, kind, key, op, origin FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?',
+            (cursor, limit)
+        ).fetchall()
+
+        out = {BILLS: [], CUSTOMERS: [], STOCK: [],
+               'deleted': {BILLS: [], CUSTOMERS: [], STOCK: []}}
+        getters = {BILLS: self.get_bill, CUSTOMERS: self.get_customer, STOCK: self.get_stock_item}
+        for row in rows:
+            if origin and row['origin'] == origin:
+                continue
+            if row['op'] == DELETE:
+                out['deleted'][row['kind']].append(row['key'])
+                continue
+            record = getters[row['kind']](row['key'])
+            if record is not None:
+                out[row['kind']].append(record)
+
+        return {
+            'cursor': rows[-1]['seq'] if rows else cursor,
+            'changes': out,
+            'hasMore': len(rows) == limit
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide store, opening it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = Store(os.getenv('BILLING_DB', 'billing.db'))
+    return _store
@@ -0,0 +1,91 @@
+"""
+Billing System - Streaming Campaign Input
+
+Incremental parsers for very large SMS campaigns uploaded as
+newline-delimited JSON or CSV. Rows are yielded one at a time straight
+from the request stream, so memory use does not grow with the upload.
+
+NDJSON:  {"phone": "919876543210", "message": "..."}   (one per line)
+CSV:     phone,message                                 (header optional)
+         919876543210,"Your message"
+"""
+
+import csv
+import json
+
+from backend.phones import normalize
+
+# What undecodable input bytes are replaced with
+UNDECODABLE = '\ufffd'
+
+
+def detect_format(content_type):
+    """Return 'csv' or 'ndjson' for a request Content-Type"""
+    return 'csv' if 'csv' in (content_type or '').lower() else 'ndjson'
+
+
+def _decoded_lines(stream):
+    # Bytes that are not UTF-8 become U+FFFD, failing only their own row
+    for raw in stream:
+        yield raw.decode('utf-8-sig', errors='replace') if isinstance(raw, bytes) else raw
+
+
+def iter_rows(stream, fmt):
+    """
+    Yield (row_number, phone, message, error) for every non-blank input row.
+    error is None for valid rows; otherwise phone/message may be None.
+    """
+    if fmt == 'csv':
+        yield from _iter_csv(_decoded_lines(stream))
+    else:
+        yield from _iter_ndjson(_decoded_lines(stream))
+
+
+def _iter_ndjson(lines):
+    row_number = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_number, None, None, 'Invalid JSON'
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, None, 'Row must be a JSON object'
+            continue
+        yield _checked(row_number, row.get('phone'), row.get('message'))
+
+
+def _iter_csv(lines):
+    row_number = 0
+    phone_col, message_col = 0, 1
+    first = True
+    for cells in csv.reader(lines):
+        if not any(c.strip() for c in cells):
+            continue
+        if first:
+            first = False
+            # An optional header row names the columns
+            header = [c.strip().lower() for c in cells]
+            if 'phone' in header:
+                phone_col = header.index('phone')
+                message_col = header.index('message') if 'message' in header else phone_col + 1
+                continue
+        row_number += 1
+        phone = cells[phone_col].strip() if len(cells) > phone_col else None
+        message = cells[message_col] if len(cells) > message_col else None
+        yield _checked(row_number, phone, message)
+
+
+def _checked(row_number, phone, message):
+    if not phone or not message:
+        return row_number, phone, message, 'Phone number and message are required'
+    if UNDECODABLE in phone or UNDECODABLE in message:
+        return row_number, phone, message, 'Row is not valid UTF-8'
+    number, error = normalize(phone)
+    if error:
+        return row_number, phone, message, error
+    return row_number, number, message, None
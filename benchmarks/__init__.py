@@ -0,0 +1,6 @@
+"""
+Billing System - Benchmarks
+
+Offline load tests for the SMS gateway API against a local Fast2SMS stub.
+See benchmarks/run.py.
+"""
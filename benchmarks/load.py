@@ -0,0 +1,195 @@
+"""
+Billing System - Load Driver
+
+Fires a fixed number of requests at one endpoint from N concurrent
+clients (one keep-alive session each) and reports throughput and
+p50/p95/p99 latency.
+
+Scenarios (app = api/app.py, backend = python-flask-backend.py):
+- send-sms                    POST /api/send-sms                     (both)
+- billing-notification        POST /api/billing-notification         (app)
+- send-batch-sms              POST /api/send-batch-sms               (app)
+- billing-notification-batch  POST /api/billing-notification-batch   (app)
+- send-sms-batch              POST /api/send-sms-batch               (backend)
+
+Every request carries a different phone and a per-run message tag, so
+duplicate-send suppression does not short-circuit the gateway.
+
+Usage:
+python -m benchmarks.load --url http://127.0.0.1:5000 --scenario send-sms --concurrency 1,8,32
+"""
+
+import argparse
+import itertools
+import json
+import math
+import threading
+import time
+import uuid
+
+import requests
+
+# Tags this process's messages; ids keep counting across run_load calls
+RUN = uuid.uuid4().hex[:6]
+_ids = itertools.count()
+
+
+def phone(i):
+    """A distinct, valid-looking 10-digit mobile number"""
+    return f'9{i % 10 ** 9:09d}'
+
+
+def _send_sms(i, size):
+    return {'phone': phone(i), 'message': f'Benchmark message {RUN}-{i}'}
+
+
+def _billing_notification(i, size):
+    return {'phone': phone(i), 'customer_name': f'Customer {i}', 'amount': str(100 + i % 900),
+            'invoice_id': f'BENCH-{RUN}-{i}'}
+
+
+def _send_batch_sms(i, size):
+    return {'numbers': [phone(i * size + k) for k in range(size)], 'message': f'Benchmark batch {RUN}-{i}'}
+
+
+def _billing_notification_batch(i, size):
+    # Half the records share a text, so grouping into multi-number calls is exercised
+    return {
+        'template': 'due_reminder',
+        'records': [
+            {'phone': phone(i * size + k), 'customer_name': 'Customer', 'amount': '500',
+             'invoice_id': f'BENCH-{RUN}-{i}' if k % 2 else f'BENCH-{RUN}-{i}-{k}'}
+            for k in range(size)
+        ]
+    }
+
+
+def _send_sms_batch(i, size):
+    return {'smsList': [{'phone': phone(i * size + k), 'message': f'Benchmark {RUN}-{i}-{k}'} for k in range(size)]}
+
+
+# Every app serves every endpoint; they differ in the gateway route
+# ('q' form posts for app and asgi, 'dlt' JSON posts for backend) and in
+# how they are served (asgi sends on an event loop)
+ALL_APPS = ('app', 'backend', 'asgi')
+
+# name -> (path, payload(i, batch_size), apps it exists on, messages per request)
+SCENARIOS = {
+    'send-sms': ('/api/send-sms', _send_sms, ALL_APPS, False),
+    'billing-notification': ('/api/billing-notification', _billing_notification, ALL_APPS, False),
+    'send-batch-sms': ('/api/send-batch-sms', _send_batch_sms, ALL_APPS, True),
+    'billing-notification-batch': ('/api/billing-notification-batch', _billing_notification_batch, ALL_APPS, True),
+    'send-sms-batch': ('/api/send-sms-batch', _send_sms_batch, ALL_APPS, True)
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_load(base_url, scenario, concurrency, total, batch_size=50, timeout=60):
+    """
+    Send `total` requests for one scenario with `concurrency` clients.
+    Returns a result dict (latencies in milliseconds).
+    """
+    path, payload, _, batched = SCENARIOS[scenario]
+    url = base_url.rstrip('/') + path
+    issued = itertools.count()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def client():
+        session = requests.Session()
+        while True:
+            if next(issued) >= total:
+                break
+            body = payload(next(_ids), batch_size)
+            started = time.perf_counter()
+            try:
+                status = session.post(url, json=body, timeout=timeout).status_code
+            except requests.exceptions.RequestException as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+        session.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if isinstance(status, int) and status < 300)
+    messages = total * (batch_size if batched else 1)
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': total,
+        'ok': ok,
+        'errors': total - ok,
+        'statuses': {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        'seconds': round(seconds, 3),
+        'rps': round(total / seconds, 1),
+        'messagesPerSec': round(messages / seconds, 1),
+        'p50': round(percentile(latencies, 50), 1),
+        'p95': round(percentile(latencies, 95), 1),
+        'p99': round(percentile(latencies, 99), 1),
+        'max': round(latencies[-1], 1),
+        'mean': round(sum(latencies) / len(latencies), 1)
+    }
+
+
+COLUMNS = (
+    ('scenario', 'Scenario', 27), ('app', 'App', 8), ('concurrency', 'Conc', 5), ('requests', 'Reqs', 6),
+    ('errors', 'Errors', 7), ('rps', 'Req/s', 8), ('messagesPerSec', 'Msg/s', 9),
+    ('p50', 'p50 ms', 8), ('p95', 'p95 ms', 8), ('p99', 'p99 ms', 8), ('gatewayCalls', 'GW calls', 9)
+)
+
+
+def format_report(results):
+    """Fixed-width table of run_load results"""
+    header = ' '.join(f'{title:>{width}}' if i else f'{title:<{width}}'
+                      for i, (_, title, width) in enumerate(COLUMNS))
+    lines = [header, '-' * len(header)]
+    for result in results:
+        lines.append(' '.join(
+            f'{str(result.get(key, "")):>{width}}' if i else f'{str(result.get(key, "")):<{width}}'
+            for i, (key, _, width) in enumerate(COLUMNS)
+        ))
+    return '\n'.join(lines)
+
+
+def parse_levels(text):
+    return [int(level) for level in str(text).split(',') if level.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load driver for the SMS gateway API')
+    parser.add_argument('--url', required=True, help='base URL of a running backend')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='send-sms')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated client counts')
+    parser.add_argument('--requests', type=int, default=200, help='requests per concurrency level')
+    parser.add_argument('--batch-size', type=int, default=50, help='recipients per batch request')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = [run_load(args.url, args.scenario, level, args.requests, args.batch_size)
+               for level in parse_levels(args.concurrency)]
+    print(format_report(results))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Billing System - Benchmark Runner
+
+Starts the Fast2SMS stub and a backend (api/app.py,
+python-flask-backend.py and/or the ASGI app in api/asgi.py) as separate
+processes, each with throwaway
+databases, drives every scenario at each concurrency level and prints
+one throughput / latency table. Nothing leaves the machine.
+
+Usage (from the repository root):
+python -m benchmarks.run
+python -m benchmarks.run --app asgi --concurrency 64,256 --latency 200
+python -m benchmarks.run --app app --scenarios send-sms,send-batch-sms --concurrency 1,16,64 --latency 150
+python -m benchmarks.run --json results/before.json
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.load import SCENARIOS, format_report, parse_levels, run_load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPS = {
+    'app': os.path.join(ROOT, 'api', 'app.py'),
+    'backend': os.path.join(ROOT, 'python-flask-backend.py'),
+    'asgi': os.path.join(ROOT, 'api', 'asgi.py')
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    raise RuntimeError(f'{url} did not come up within {timeout}s')
+
+
+def start(args, env=None, log=None):
+    return subprocess.Popen([sys.executable] + args, cwd=ROOT, env=env,
+                            stdout=log or subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark of the SMS gateway API')
+    parser.add_argument('--app', choices=('app', 'backend', 'asgi', 'both', 'all'), default='both')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated scenario names')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated client counts')
+    parser.add_argument('--requests', type=int, default=200, help='requests per concurrency level')
+    parser.add_argument('--batch-size', type=int, default=50, help='recipients per batch request')
+    # Stub gateway behaviour
+    parser.add_argument('--latency', type=float, default=50, help='stub mean latency in ms')
+    parser.add_argument('--jitter', type=float, default=10, help='stub latency std deviation in ms')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='stub failure fraction (0-1)')
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--shape', default='fast2sms')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(unknown)}')
+    apps = {'both': ('app', 'backend'), 'all': tuple(APPS)}.get(args.app, (args.app,))
+    levels = parse_levels(args.concurrency)
+
+    workdir = tempfile.mkdtemp(prefix='billing-bench-')
+    stub_port = free_port()
+    stub_url = f'http://127.0.0.1:{stub_port}'
+    processes = [start([
+        '-m', 'benchmarks.stub_gateway', '--port', str(stub_port),
+        '--latency', str(args.latency), '--jitter', str(args.jitter),
+        '--error-rate', str(args.error_rate), '--error-status', str(args.error_status),
+        '--shape', args.shape
+    ])]
+    results = []
+    try:
+        wait_until_up(stub_url + '/stats')
+        for app_name in apps:
+            selected = [name for name in scenarios if app_name in SCENARIOS[name][2]]
+            if not selected:
+                continue
+
+            port = free_port()
+            env = dict(
+                os.environ,
+                PORT=str(port),
+                FLASK_ENV='production',
+                FAST2SMS_API_KEY='benchmark',
+                FAST2SMS_URL=stub_url + '/dev/bulkV2',
+                BILLING_DB=os.path.join(workdir, f'{app_name}-billing.db'),
+                SMS_QUEUE_DB=os.path.join(workdir, f'{app_name}-queue.db'),
+                DELIVERY_DB=os.path.join(workdir, f'{app_name}-delivery.db'),
+                SMS_SCHEDULE_DB=os.path.join(workdir, f'{app_name}-schedule.db'),
+                IDEMPOTENCY_DB=os.path.join(workdir, f'{app_name}-idempotency.db')
+            )
+            log = open(os.path.join(workdir, f'{app_name}.log'), 'w')
+            processes.append(start([APPS[app_name]], env, log))
+            base_url = f'http://127.0.0.1:{port}'
+            wait_until_up(base_url + '/api/health')
+
+            for scenario in selected:
+                for level in levels:
+                    before = requests.get(stub_url + '/stats').json()['calls']
+                    result = run_load(base_url, scenario, level, args.requests, args.batch_size)
+                    result['app'] = app_name
+                    result['gatewayCalls'] = requests.get(stub_url + '/stats').json()['calls'] - before
+                    results.append(result)
+                    print(f'{app_name} {scenario} x{level}: {result["rps"]} req/s, '
+                          f'p99 {result["p99"]} ms', file=sys.stderr, flush=True)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    print(f'\nStub latency {args.latency:g}±{args.jitter:g} ms, error rate {args.error_rate:g}, '
+          f'{args.requests} requests per level, batch size {args.batch_size} (logs in {workdir})\n')
+    print(format_report(results))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Billing System - Local SMS Gateway Stub
+
+A stand-in for https://www.fast2sms.com/dev/bulkV2 that answers like the
+real gateway ({"return": true, "request_id": ..., "message": [...]}) with
+configurable latency, error rate and response shape, so the send paths
+can be load-tested offline. --shape twilio answers like the Twilio
+Messages API instead (201, {"sid": ..., "status": "queued"}).
+
+Point the backend at it with FAST2SMS_URL=http://127.0.0.1:8799/dev/bulkV2
+(or TWILIO_URL=http://127.0.0.1:8798/Messages.json for the twilio shape).
+GET /stats returns the calls and recipients seen so far, and
+GET /dev/dlr?request_id=... a "Delivered" report for every recipient of
+that request (FAST2SMS_DLR_URL=http://127.0.0.1:8799/dev/dlr).
+
+Usage:
+python -m benchmarks.stub_gateway --port 8799 --latency 80 --jitter 20 --error-rate 0.02
+python -m benchmarks.stub_gateway --port 8798 --latency 40 --shape twilio
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# Response shapes
+SHAPES = ('fast2sms', 'no-request-id', 'invalid-json', 'twilio')
+
+
+class StubGateway(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connects when an async backend opens
+    # hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=500, shape='fast2sms'):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.shape = shape
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.recipients = 0
+        self.errors = 0
+        self.connections = set()
+        # request_id -> recipients, for /dev/dlr
+        self.sent = {}
+
+    def stats(self):
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'recipients': self.recipients,
+                'errors': self.errors,
+                'connections': len(self.connections)
+            }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real gateway
+    protocol_version = 'HTTP/1.1'
+    # Buffer the reply so headers and body leave in one segment; separate
+    # writes stall keep-alive clients on delayed ACKs
+    wbufsize = -1
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        if path.rstrip('/') == '/stats':
+            self._reply(200, json.dumps(self.server.stats()))
+        elif path.rstrip('/') == '/dev/dlr':
+            request_id = (parse_qs(query).get('request_id') or [''])[0]
+            with self.server.lock:
+                numbers = self.server.sent.get(request_id, [])
+            self._reply(200, json.dumps({
+                'return': True,
+                'data': [{'number': number, 'status': 'Delivered'} for number in numbers]
+            }))
+        else:
+            self._reply(404, json.dumps({'return': False, 'message': 'Not found'}))
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        numbers = _numbers(body, self.headers.get('Content-Type', ''))
+
+        delay = max(0.0, random.gauss(server.latency, server.jitter)) if server.jitter else server.latency
+        if delay:
+            time.sleep(delay)
+
+        failed = random.random() < server.error_rate
+        with server.lock:
+            server.calls += 1
+            server.recipients += len(numbers)
+            server.errors += failed
+            server.connections.add(self.client_address)
+
+        if failed and server.shape == 'twilio':
+            self._reply(server.error_status, json.dumps({
+                'code': 20500,
+                'status': server.error_status,
+                'message': 'Stub gateway error'
+            }))
+        elif failed:
+            self._reply(server.error_status, json.dumps({
+                'return': False,
+                'status_code': server.error_status,
+                'message': 'Stub gateway error'
+            }))
+        elif server.shape == 'twilio':
+            self._reply(201, json.dumps({'sid': 'SM' + uuid.uuid4().hex, 'status': 'queued'}))
+        elif server.shape == 'invalid-json':
+            self._reply(200, 'OK', 'text/plain')
+        else:
+            reply = {'return': True, 'message': ['SMS sent successfully.']}
+            if server.shape == 'fast2sms':
+                reply['request_id'] = uuid.uuid4().hex[:14]
+                with server.lock:
+                    server.sent[reply['request_id']] = numbers
+            self._reply(200, json.dumps(reply))
+
+    def _reply(self, status, text, content_type='application/json'):
+        data = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _numbers(body, content_type):
+    """Recipients of a q-route or Twilio (form) or dlt-route (JSON) payload"""
+    try:
+        if 'json' in content_type:
+            payload = json.loads(body or b'{}')
+            numbers = payload.get('numbers') or payload.get('phone') or ''
+        else:
+            form = parse_qs(body.decode('utf-8'))
+            numbers = (form.get('numbers') or form.get('To') or [''])[0]
+    except (ValueError, AttributeError):
+        return []
+    return [n.strip() for n in str(numbers).split(',') if n.strip()]
+
+
+def serve(port=8799, host='127.0.0.1', **options):
+    """Start a stub in a background thread; returns the server"""
+    server = StubGateway((host, port), **options)
+    threading.Thread(target=server.serve_forever, name='stub-gateway', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local SMS gateway stub for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--latency', type=float, default=50, help='mean response time in ms')
+    parser.add_argument('--jitter', type=float, default=0, help='standard deviation of the latency in ms')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls that fail (0-1)')
+    parser.add_argument('--error-status', type=int, default=500, help='HTTP status of failed calls')
+    parser.add_argument('--shape', choices=SHAPES, default='fast2sms', help='success response body')
+    args = parser.parse_args()
+
+    server = StubGateway(
+        (args.host, args.port),
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        shape=args.shape
+    )
+    path = '/Messages.json' if args.shape == 'twilio' else '/dev/bulkV2'
+    print(f'Stub gateway ({args.shape}) listening on http://{args.host}:{args.port}{path}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Shared fixtures: every test gets its own SQLite files, fresh process-wide
+singletons and, when it sends SMS, a local gateway stub
+(benchmarks/stub_gateway.py) in place of the real providers.
+"""
+
+import os
+import time
+
+import pytest
+
+from backend import (
+    async_gateway_client, delivery, gateway_client, idempotency, scheduler, sms_queue, stock_index, store
+)
+from backend.factory import create_app
+from benchmarks.stub_gateway import serve
+
+DATABASES = ('BILLING_DB', 'SMS_QUEUE_DB', 'DELIVERY_DB', 'SMS_SCHEDULE_DB', 'IDEMPOTENCY_DB')
+
+
+def _stop(instance):
+    if instance is not None and hasattr(instance, 'stop'):
+        instance.stop(timeout=5)
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Per-test databases and singletons; never reach a real gateway"""
+    for name in DATABASES:
+        monkeypatch.setenv(name, str(tmp_path / f'{name.lower()}.db'))
+    for name in ('SMS_GATEWAYS', 'SMS_GATEWAY_ROUTE', 'SMS_ASYNC_DEFAULT', 'TWILIO_ACCOUNT_SID'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('FAST2SMS_API_KEY', 'test-key')
+    monkeypatch.setenv('FAST2SMS_URL', 'http://127.0.0.1:9/dev/bulkV2')
+    monkeypatch.setenv('RETRY_DELAY', '0')
+    monkeypatch.setenv('SMS_RETRY_BACKOFF', '0')
+
+    singletons = [
+        (store, '_store'), (delivery, '_store'), (idempotency, '_store'),
+        (sms_queue, '_queue'), (scheduler, '_scheduler'), (stock_index, '_index')
+    ]
+    for module, name in singletons:
+        monkeypatch.setattr(module, name, None)
+    monkeypatch.setattr(gateway_client, '_clients', {})
+    monkeypatch.setattr(async_gateway_client, '_clients', {})
+    yield tmp_path
+    for module, name in singletons:
+        _stop(getattr(module, name))
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """
+    Start a gateway stub: stub(shape='fast2sms', **options) returns the
+    server, with FAST2SMS_URL / TWILIO_URL pointing at it
+    """
+    servers = []
+
+    def start(shape='fast2sms', **options):
+        server = serve(0, shape=shape, **options)
+        servers.append(server)
+        base = f'http://127.0.0.1:{server.server_address[1]}'
+        monkeypatch.setenv('FAST2SMS_URL', f'{base}/dev/bulkV2')
+        if shape == 'twilio':
+            monkeypatch.setenv('TWILIO_ACCOUNT_SID', 'AC123')
+            monkeypatch.setenv('TWILIO_AUTH_TOKEN', 'token')
+            monkeypatch.setenv('TWILIO_FROM_NUMBER', '+15005550006')
+            monkeypatch.setenv('TWILIO_URL', f'{base}/Messages.json')
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def india_time():
+    """Run with the server's local time zone set to IST (UTC+05:30)"""
+    saved = os.environ.get('TZ')
+    os.environ['TZ'] = 'Asia/Kolkata'
+    time.tzset()
+    yield
+    if saved is None:
+        del os.environ['TZ']
+    else:
+        os.environ['TZ'] = saved
+    time.tzset()
+
+
+@pytest.fixture
+def make_client():
+    """make_client(gateway='q') -> Flask test client for a fresh app"""
+    def make(gateway='q'):
+        return create_app(gateway=gateway).test_client()
+    return make
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('a2wsgi')
+pytest.importorskip('aiohttp')
+httpx = pytest.importorskip('httpx')
+
+from backend import asgi, idempotency  # noqa: E402
+
+
+def _post_all(requests):
+    """POST each (path, body) through the ASGI app; returns the responses"""
+    app = asgi.create_asgi_app(gateway='q')
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return [await client.post(path, json=body) for path, body in requests]
+
+    return asyncio.run(run())
+
+
+def _record_threads(monkeypatch, module, name, threads):
+    original = getattr(module, name)
+
+    def wrapper(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(module, name, wrapper)
+
+
+def test_queue_schedule_and_idempotency_run_off_the_event_loop(stub, monkeypatch):
+    stub()
+    threads = []
+    for name in ('queue_sms', 'schedule_one'):
+        _record_threads(monkeypatch, asgi, name, threads)
+    _record_threads(monkeypatch, idempotency, '_claim', threads)
+    send_at = (datetime.now() + timedelta(hours=1)).isoformat(timespec='seconds')
+
+    responses = _post_all([
+        ('/api/send-sms', {'phone': '9876543210', 'message': 'Queued', 'async': True}),
+        ('/api/send-sms', {'phone': '9876543211', 'message': 'Later', 'send_at': send_at})
+    ])
+
+    assert [r.status_code for r in responses] == [202, 202]
+    assert len(threads) == 4
+    assert threading.main_thread() not in threads
+
+
+def test_duplicate_send_is_replayed_without_a_second_gateway_call(stub):
+    gateway = stub()
+    body = {'phone': '9876543210', 'message': 'Hello'}
+
+    first, second = _post_all([('/api/send-sms', body), ('/api/send-sms', body)])
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert gateway.stats()['calls'] == 1
@@ -0,0 +1,37 @@
+import pytest
+
+from backend.phones import to_e164
+
+
+def test_batch_sends_one_number_per_call_on_twilio(stub, make_client):
+    gateway = stub(shape='twilio')
+    client = make_client('twilio')
+
+    response = client.post('/api/send-batch-sms', json={
+        'numbers': ['9876543210', '9876543211', '9876543212'],
+        'message': 'Hello'
+    })
+
+    assert response.status_code == 200, response.get_json()
+    stats = gateway.stats()
+    assert stats['calls'] == 3
+    assert stats['recipients'] == 3
+
+
+def test_batch_groups_numbers_on_fast2sms(stub, client):
+    gateway = stub()
+
+    response = client.post('/api/send-batch-sms', json={
+        'numbers': ['9876543210', '9876543211', '9876543212'],
+        'message': 'Hello'
+    })
+
+    assert response.status_code == 200, response.get_json()
+    stats = gateway.stats()
+    assert stats['calls'] == 1
+    assert stats['recipients'] == 3
+
+
+def test_to_e164_rejects_several_numbers():
+    with pytest.raises(ValueError):
+        to_e164('9876543210,9876543211')
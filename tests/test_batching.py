@@ -0,0 +1,161 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from backend.async_batching import send_in_chunks_async
+from backend.async_gateway_client import close_async_gateway_client
+from backend.batching import retryable, send_grouped, send_in_chunks
+from backend.factory import create_app
+from backend.gateways import CONNECTION, REFUSED, TIMEOUT, _failure, make_gateway
+
+NUMBERS = [f'91987654{i:04d}' for i in range(5)]
+
+
+class Recorder:
+    """send() double that answers from a list of results, then succeeds"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, numbers, message):
+        with self.lock:
+            self.calls.append((numbers, message))
+            result = self.results.pop(0) if self.results else {'success': True, 'request_id': 'r1'}
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_numbers_are_split_into_chunks():
+    send = Recorder()
+
+    chunks, recipients = send_in_chunks(NUMBERS, 'Hi', send, chunk_size=2, retries=0)
+
+    assert sorted(numbers for numbers, _ in send.calls) == [
+        ','.join(NUMBERS[0:2]), ','.join(NUMBERS[2:4]), NUMBERS[4]
+    ]
+    assert [c['size'] for c in chunks] == [2, 2, 1]
+    assert [r['phone'] for r in recipients] == NUMBERS
+    assert [r['chunk'] for r in recipients] == [0, 0, 1, 1, 2]
+
+
+def test_grouped_sends_keep_group_order():
+    send = Recorder()
+
+    chunks, recipients = send_grouped([('A', NUMBERS[:3]), ('B', NUMBERS[3:])], send, chunk_size=2, retries=0)
+
+    assert [(c['group'], c['size']) for c in chunks] == [(0, 2), (0, 1), (1, 2)]
+    assert [(r['group'], r['phone']) for r in recipients] == [(0, n) for n in NUMBERS[:3]] + [
+        (1, n) for n in NUMBERS[3:]
+    ]
+    assert {message for _, message in send.calls} == {'A', 'B'}
+
+
+@pytest.mark.parametrize('failure', [
+    _failure(CONNECTION, 'Connection error'),
+    _failure('api', 'Too many requests', status_code=429),
+    _failure('api', 'Service unavailable', status_code=503)
+])
+def test_undelivered_chunk_is_retried(failure):
+    send = Recorder(failure)
+
+    chunks, _ = send_in_chunks(NUMBERS[:1], 'Hi', send, retries=1)
+
+    assert len(send.calls) == 2
+    assert chunks[0]['success'] is True
+    assert chunks[0]['attempts'] == 2
+
+
+@pytest.mark.parametrize('failure', [
+    _failure(TIMEOUT, 'Request timeout'),
+    _failure(REFUSED, 'Circuit open', retry_after=5),
+    _failure('api', 'Invalid numbers', status_code=400),
+    RuntimeError('boom')
+])
+def test_possibly_delivered_or_refused_chunk_is_not_retried(failure):
+    send = Recorder(failure)
+
+    chunks, _ = send_in_chunks(NUMBERS[:1], 'Hi', send, retries=3)
+
+    assert len(send.calls) == 1
+    assert chunks[0]['success'] is False
+    assert chunks[0]['attempts'] == 1
+
+
+def test_async_chunks_follow_the_same_retry_rules():
+    results = [_failure(CONNECTION, 'Connection error'), _failure(TIMEOUT, 'Request timeout')]
+    calls = []
+
+    async def send(numbers, message):
+        calls.append(numbers)
+        return results.pop(0)
+
+    chunks, _ = asyncio.run(send_in_chunks_async(NUMBERS[:1], 'Hi', send, retries=3))
+
+    assert len(calls) == 2
+    assert chunks[0]['success'] is False
+    assert chunks[0]['error'] == 'Request timeout'
+
+
+@pytest.fixture
+def hang_up(monkeypatch):
+    """A server that reads the request, then drops the connection unanswered"""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    stop = threading.Event()
+
+    def serve():
+        server.settimeout(0.1)
+        while not stop.is_set():
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                continue
+            conn.recv(65536)
+            conn.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    monkeypatch.setenv('FAST2SMS_URL', f'http://127.0.0.1:{server.getsockname()[1]}/dev/bulkV2')
+    yield
+    stop.set()
+    thread.join()
+    server.close()
+
+
+def _send(transport):
+    gateway = make_gateway('q')
+    with create_app(gateway='q').app_context():
+        if transport == 'async':
+            async def send():
+                try:
+                    return await gateway.send_async(NUMBERS[0], 'Hi')
+                finally:
+                    await close_async_gateway_client()
+            return asyncio.run(send())
+        return gateway.send(NUMBERS[0], 'Hi')
+
+
+@pytest.mark.parametrize('transport', ['sync', 'async'])
+def test_refused_connection_is_retryable(transport, monkeypatch):
+    monkeypatch.setenv('SMS_RETRY_ATTEMPTS', '0')
+
+    result = _send(transport)
+
+    assert result['error_type'] == CONNECTION
+    assert retryable(result)
+
+
+@pytest.mark.parametrize('transport', ['sync', 'async'])
+def test_connection_lost_after_sending_is_not_retryable(transport, hang_up, monkeypatch):
+    monkeypatch.setenv('SMS_RETRY_ATTEMPTS', '0')
+
+    result = _send(transport)
+
+    assert result['error_type'] == TIMEOUT
+    assert not retryable(result)
@@ -0,0 +1,31 @@
+from backend.delivery import get_delivery_store
+
+
+def _tracked(request_id='req-1', numbers='919876543210,919876543211'):
+    store = get_delivery_store()
+    store.track(request_id, numbers, 'dlt')
+    store.flush()
+    return store
+
+
+def test_delivery_report_pages_recipients(client):
+    _tracked()
+
+    body = client.get('/api/delivery-reports/req-1?limit=1').get_json()
+
+    assert body['recipients'] == 2
+    assert len(body['items']) == 1
+    assert body['hasMore'] is True
+
+
+def test_delivery_report_rejects_a_bad_limit(client):
+    _tracked()
+
+    response = client.get('/api/delivery-reports/req-1?limit=ten')
+
+    assert response.status_code == 400
+    assert 'limit' in response.get_json()['error']
+
+
+def test_unknown_request_is_not_found(client):
+    assert client.get('/api/delivery-reports/nope').status_code == 404
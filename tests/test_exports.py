@@ -0,0 +1,77 @@
+import csv
+import gzip
+import io
+import json
+
+from backend import exports
+
+
+def _bills(client, count=3):
+    for i in range(count):
+        client.post('/api/bills', json={
+            'id': f'B{i}', 'ts': f'2026-01-0{i + 1}T10:00:00', 'custName': 'Asha Rao',
+            'custMobile': '9876543210', 'items': [{'name': 'Rice', 'qty': 2}], 'grandTotal': 100 + i
+        })
+
+
+def test_bills_stream_as_csv_oldest_first(client):
+    _bills(client)
+
+    response = client.get('/api/export/bills')
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert response.mimetype == 'text/csv'
+    assert 'attachment; filename=bills_' in response.headers['Content-Disposition']
+    assert tuple(rows[0]) == exports.BILL_COLUMNS
+    assert [row[0] for row in rows[1:]] == ['B0', 'B1', 'B2']
+
+
+def test_date_range_and_gzipped_ndjson(client):
+    _bills(client)
+
+    response = client.get('/api/export/bills?format=ndjson&compress=gzip&from=2026-01-02&to=2026-01-02')
+
+    lines = gzip.decompress(response.data).decode('utf-8').splitlines()
+    assert response.mimetype == 'application/gzip'
+    assert [json.loads(line)['id'] for line in lines] == ['B1']
+
+
+def test_customers_export_carries_totals(client):
+    _bills(client)
+
+    response = client.get('/api/export/customers?format=ndjson')
+
+    [customer] = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert customer['key'] == '9876543210'
+    assert customer['bills'] == 3
+
+
+def test_customers_filter_on_the_local_date_of_their_last_bill(client, india_time):
+    # 20:00 UTC on the 31st is 01:30 on 1 February in India
+    client.post('/api/bills', json={'id': 'B1', 'ts': '2026-01-31T20:00:00Z', 'custMobile': '9876543210'})
+    client.post('/api/bills', json={'id': 'B2', 'ts': '2026-01-31T10:00:00', 'custMobile': '9876543211'})
+
+    def keys(query):
+        response = client.get(f'/api/export/customers?format=ndjson&{query}')
+        return [json.loads(line)['key'] for line in response.get_data(as_text=True).splitlines()]
+
+    assert keys('from=2026-02-01') == ['9876543210']
+    assert keys('to=2026-01-31') == ['9876543211']
+    assert keys('from=2026-01-31&to=2026-02-01') == ['9876543210', '9876543211']
+
+
+def test_bad_query_is_rejected(client):
+    assert client.get('/api/export/bills?format=xml').status_code == 400
+    assert client.get('/api/export/bills?from=yesterday').status_code == 400
+    assert client.get('/api/export/bills?compress=zip').status_code == 400
+
+
+def test_encode_yields_bounded_chunks(monkeypatch):
+    monkeypatch.setattr(exports, 'CHUNK_SIZE', 1024)
+    records = ({'id': f'B{i}', 'note': 'x' * 100} for i in range(200))
+
+    chunks = list(exports.encode(records, 'ndjson', exports.BILL_COLUMNS, exports.bill_row))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) < 2048 for chunk in chunks)
+    assert len(b''.join(chunks).splitlines()) == 200
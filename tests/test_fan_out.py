@@ -0,0 +1,94 @@
+import threading
+import time
+
+from backend.batching import imap_bounded, map_ordered
+from backend.factory import create_app
+
+
+class Concurrency:
+    """Callable that records how many calls overlap"""
+
+    def __init__(self, delay=0.05, fail=None):
+        self.delay = delay
+        self.fail = fail
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, value, *args):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if value == self.fail:
+                raise RuntimeError(f'send to {value} blew up')
+            return {'success': True, 'request_id': f'r-{value}'}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def test_results_come_back_in_input_order():
+    def slow_first(n):
+        if n == 0:
+            time.sleep(0.05)
+        return n * 10
+
+    assert map_ordered(slow_first, range(8), max_workers=4) == [n * 10 for n in range(8)]
+    assert list(imap_bounded(slow_first, iter(range(8)), max_workers=2)) == [n * 10 for n in range(8)]
+
+
+def test_pool_never_exceeds_the_worker_cap():
+    work = Concurrency()
+    map_ordered(work, range(12), max_workers=3)
+    assert work.peak == 3
+
+    work = Concurrency()
+    list(imap_bounded(work, iter(range(12)), max_workers=2))
+    assert work.peak == 2
+
+
+def test_imap_bounded_pulls_a_bounded_number_of_items_ahead():
+    pulled = []
+
+    def items():
+        for n in range(100):
+            pulled.append(n)
+            yield n
+
+    results = imap_bounded(lambda n: n, items(), max_workers=2)
+    next(results)
+
+    assert len(pulled) <= 2 * 2 + 1
+
+
+def _batch(client, phones):
+    return client.post('/api/send-sms-batch', json={
+        'smsList': [{'phone': phone, 'message': 'Hello'} for phone in phones]
+    })
+
+
+def test_batch_route_honours_sms_batch_concurrency(monkeypatch):
+    monkeypatch.setenv('SMS_BATCH_CONCURRENCY', '3')
+    app = create_app(gateway='q')
+    work = app.extensions['sms_gateway'].send = Concurrency()
+
+    response = _batch(app.test_client(), [f'98765432{i:02d}' for i in range(10)])
+
+    assert response.get_json()['sent'] == 10
+    assert work.peak == 3
+
+
+def test_one_failing_send_does_not_sink_the_batch():
+    app = create_app(gateway='q')
+    phones = [f'98765432{i:02d}' for i in range(5)]
+    app.extensions['sms_gateway'].send = Concurrency(delay=0, fail='919876543202')
+
+    response = _batch(app.test_client(), phones)
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['sent'] == 4
+    assert [r['success'] for r in body['results']] == [True, True, False, True, True]
+    assert 'blew up' in body['results'][2]['error']
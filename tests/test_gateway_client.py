@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.gateway_client import get_gateway_client
+from backend.gateways import make_gateway
+
+
+def test_sequential_sends_reuse_one_connection(stub, client):
+    gateway = stub()
+
+    for i in range(5):
+        response = client.post('/api/send-sms', json={'phone': f'98765432{i:02d}', 'message': 'Hello'})
+        assert response.status_code == 200
+
+    assert gateway.stats()['calls'] == 5
+    assert gateway.stats()['connections'] == 1
+
+
+def test_concurrent_sends_reuse_one_connection_per_worker(stub, monkeypatch):
+    monkeypatch.setenv('SMS_POOL_SIZE', '4')
+    gateway = stub(latency=0.02)
+    send = make_gateway('q').send
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda i: send(f'91987654{i:04d}', 'Hello'), range(40)))
+
+    assert all(result['success'] for result in results)
+    assert gateway.stats()['calls'] == 40
+    assert gateway.stats()['connections'] <= 4
+
+
+def test_one_client_per_provider_per_process():
+    first = get_gateway_client()
+
+    assert get_gateway_client() is first
+    assert get_gateway_client('twilio', url='http://127.0.0.1:9/a') is not first
+    # Options only apply to the call that creates the client
+    assert get_gateway_client('twilio', url='http://127.0.0.1:9/b').url == 'http://127.0.0.1:9/a'
+
+
+def test_gateways_share_the_provider_client(stub):
+    stub()
+
+    assert make_gateway('q').client() is make_gateway('q').client()
+    assert make_gateway('q').client() is get_gateway_client()
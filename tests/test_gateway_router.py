@@ -0,0 +1,41 @@
+from backend.gateway_router import GatewayRouter
+
+
+class FakeGateway:
+    configured = True
+    multi_recipient = True
+
+    def __init__(self, route):
+        self.route = route
+
+    def available(self):
+        return True
+
+
+def _router(*routes):
+    return GatewayRouter([FakeGateway(route) for route in routes], min_samples=5)
+
+
+def test_unmeasured_provider_is_tried_first():
+    router = _router('dlt', 'twilio')
+    router.stats['dlt'].record(True, 0.2)
+
+    assert [g.route for g in router.ranked('919876543210')] == ['twilio', 'dlt']
+
+
+def test_provider_with_only_failures_ranks_after_measured_ones():
+    router = _router('dlt', 'twilio', 'q')
+    router.stats['dlt'].record(False, 0.01)
+    router.stats['dlt'].record(False, 0.01)
+    router.stats['twilio'].record(True, 0.4)
+    router.stats['q'].record(True, 0.2)
+
+    assert [g.route for g in router.ranked('919876543210')] == ['q', 'twilio', 'dlt']
+
+
+def test_multi_number_sends_skip_single_recipient_providers():
+    router = _router('twilio', 'dlt')
+    router.gateways[0].multi_recipient = False
+
+    assert [g.route for g in router.ranked('919876543210,919876543211')] == ['dlt']
+    assert router.multi_recipient
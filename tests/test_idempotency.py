@@ -0,0 +1,65 @@
+import pytest
+
+from backend.idempotency import DONE, MISMATCH, NEW, PENDING, MemoryIdempotencyStore, SQLiteIdempotencyStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryIdempotencyStore(100)
+    return SQLiteIdempotencyStore(str(tmp_path / 'keys.db'))
+
+
+def test_claim_lifecycle(store):
+    assert store.claim('k', 'a')[0] == NEW
+    assert store.claim('k', 'a')[0] == PENDING
+
+    store.complete('k', 200, '{"success": true}', ttl=60)
+    state, record = store.claim('k', 'a')
+
+    assert state == DONE
+    assert record['status'] == 200
+    assert store.claim('k', 'b')[0] == MISMATCH
+
+
+def test_released_key_can_be_claimed_again(store):
+    store.claim('k', 'a')
+    store.release('k')
+
+    assert store.claim('k', 'a')[0] == NEW
+
+
+def test_idempotency_key_replays_the_first_response(stub, client):
+    gateway = stub()
+    headers = {'Idempotency-Key': 'order-1'}
+
+    first = client.post('/api/send-sms', json={'phone': '9876543210', 'message': 'Hi'}, headers=headers)
+    second = client.post('/api/send-sms', json={'phone': '9876543210', 'message': 'Hi'}, headers=headers)
+
+    assert first.status_code == 200
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert second.get_json() == first.get_json()
+    assert gateway.stats()['calls'] == 1
+
+
+def test_idempotency_key_reused_for_another_message_is_rejected(stub, client):
+    stub()
+    headers = {'Idempotency-Key': 'order-1'}
+    client.post('/api/send-sms', json={'phone': '9876543210', 'message': 'Hi'}, headers=headers)
+
+    response = client.post('/api/send-sms', json={'phone': '9876543210', 'message': 'Other'}, headers=headers)
+
+    assert response.status_code == 422
+
+
+def test_failed_send_is_not_kept_for_replay(stub, client, monkeypatch):
+    gateway = stub(error_rate=1.0, error_status=500)
+    monkeypatch.setenv('SMS_RETRY_ATTEMPTS', '0')
+    body = {'phone': '9876543210', 'message': 'Hi'}
+
+    first = client.post('/api/send-sms', json=body)
+    second = client.post('/api/send-sms', json=body)
+
+    assert first.status_code >= 400
+    assert 'Idempotent-Replayed' not in second.headers
+    assert gateway.stats()['calls'] == 2
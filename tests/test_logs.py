@@ -0,0 +1,91 @@
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+from backend import logs
+from backend.gateways import make_gateway
+from backend.logs import LOG_DROPPED, RESPONSE_LOGGER, JSONFormatter, NonBlockingQueueHandler, configure_logging
+
+
+@pytest.fixture
+def shutdown(monkeypatch):
+    """
+    Lets configure_logging() set up a fresh process's root logger, and
+    returns what it registers to run at exit; the root logger is restored
+    afterwards
+    """
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    monkeypatch.setattr(logs, '_listener', None)
+    stops = []
+    monkeypatch.setattr(logs.atexit, 'register', stops.append)
+    yield stops
+    for handler in root.handlers:
+        handler.close()
+    root.handlers = handlers
+    root.setLevel(level)
+
+
+def test_queued_json_records_are_flushed_on_shutdown(shutdown, monkeypatch, capsys):
+    monkeypatch.setenv('LOG_FORMAT', 'json')
+    monkeypatch.setenv('LOG_ASYNC', 'true')
+    # pytest's own capture handlers would make it keep the existing setup
+    logging.getLogger().handlers = []
+    configure_logging()
+
+    log = logging.getLogger('backend.test')
+    for i in range(200):
+        log.info('row %d of %s', i, 'campaign', extra={'request_id': f'r{i}'})
+    [stop] = shutdown
+    stop()
+
+    lines = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert [line['message'] for line in lines] == [f'row {i} of campaign' for i in range(200)]
+    assert [line['request_id'] for line in lines] == [f'r{i}' for i in range(200)]
+    assert (lines[0]['level'], lines[0]['logger']) == ('INFO', 'backend.test')
+
+
+def test_full_log_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    log = logging.getLogger('backend.test.full')
+    log.addHandler(handler)
+    log.propagate = False
+    before = LOG_DROPPED._values.get((), 0)
+    try:
+        for i in range(3):
+            log.warning('line %d', i)
+    finally:
+        log.removeHandler(handler)
+        log.propagate = True
+
+    assert LOG_DROPPED._values[()] - before == 2
+    assert handler.queue.get_nowait().getMessage() == 'line 0'
+
+
+def test_exceptions_are_rendered_before_queueing():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    try:
+        raise ValueError('bad row')
+    except ValueError:
+        record = logging.getLogger('backend.test').makeRecord(
+            'backend.test', logging.ERROR, __file__, 1, 'send failed', (), sys.exc_info()
+        )
+
+    prepared = handler.prepare(record)
+
+    assert prepared.exc_info is None
+    assert json.loads(JSONFormatter().format(prepared))['exception'].endswith('ValueError: bad row')
+
+
+def test_gateway_response_records_carry_the_request_id(stub, caplog):
+    stub()
+    caplog.set_level(logging.INFO, logger=RESPONSE_LOGGER)
+
+    result = make_gateway('dlt').send('919876543210', 'Hello')
+
+    [record] = [r for r in caplog.records if r.name == RESPONSE_LOGGER]
+    entry = json.loads(JSONFormatter().format(record))
+    assert (entry['request_id'], entry['status_code']) == (result['request_id'], 200)
@@ -0,0 +1,29 @@
+import pytest
+
+from backend.factory import create_app
+
+
+@pytest.fixture(autouse=True)
+def no_flask_env(monkeypatch):
+    monkeypatch.delenv('FLASK_ENV', raising=False)
+
+
+def test_default_app_keeps_the_baseline_health_and_environment(client):
+    assert client.get('/api/health').get_json()['status'] == 'ok'
+    assert client.get('/api/status').get_json()['environment'] == 'development'
+
+
+def test_entry_points_keep_their_own_defaults():
+    flask_backend = create_app(gateway='dlt', health_status='OK').test_client()
+    vercel = create_app(gateway='q', cors_origin='*', environment='production').test_client()
+
+    assert flask_backend.get('/api/health').get_json()['status'] == 'OK'
+    assert vercel.get('/api/status').get_json()['environment'] == 'production'
+
+
+def test_flask_env_wins(monkeypatch):
+    monkeypatch.setenv('FLASK_ENV', 'staging')
+
+    vercel = create_app(gateway='q', environment='production').test_client()
+
+    assert vercel.get('/api/status').get_json()['environment'] == 'staging'
@@ -0,0 +1,55 @@
+import re
+
+from backend.metrics import CONTENT_TYPE, Counter, Gauge, Histogram
+
+# name{labels} value, as in the Prometheus text exposition format
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*",?)*\})? \S+$')
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('send_seconds', 'Send time', ('provider',), buckets=(5, 1))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value, 'fast2sms')
+
+    assert histogram.render() == [
+        '# HELP send_seconds Send time',
+        '# TYPE send_seconds histogram',
+        'send_seconds_bucket{provider="fast2sms",le="1"} 2',
+        'send_seconds_bucket{provider="fast2sms",le="5"} 3',
+        'send_seconds_bucket{provider="fast2sms",le="+Inf"} 4',
+        'send_seconds_sum{provider="fast2sms"} 14.5',
+        'send_seconds_count{provider="fast2sms"} 4'
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter('errors_total', 'Errors', ('type',))
+    counter.inc('say "hi"\\\n')
+    counter.inc('say "hi"\\\n', amount=2)
+
+    assert counter.render()[-1] == 'errors_total{type="say \\"hi\\"\\\\\\n"} 3'
+
+
+def test_a_broken_gauge_renders_only_its_header():
+    def read():
+        raise RuntimeError('database is locked')
+
+    assert Gauge('queue_depth', 'Depth', read).render() == [
+        '# HELP queue_depth Depth', '# TYPE queue_depth gauge'
+    ]
+
+
+def test_metrics_endpoint_counts_requests_by_route_template(client):
+    client.post('/api/bills', json={'id': 'B1'})
+    client.get('/api/bills/B1')
+    client.get('/api/bills/B2')
+
+    response = client.get('/api/metrics')
+    text = response.get_data(as_text=True)
+
+    assert response.headers['Content-Type'] == CONTENT_TYPE
+    assert 'http_requests_total{method="GET",route="/api/bills/<bill_id>",status="200"} ' in text
+    assert 'http_requests_total{method="GET",route="/api/bills/<bill_id>",status="404"} ' in text
+    assert '/api/bills/B1' not in text
+    for line in text.splitlines():
+        assert line.startswith('# HELP ') or line.startswith('# TYPE ') or SAMPLE.match(line), line
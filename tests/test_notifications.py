@@ -0,0 +1,72 @@
+import pytest
+
+from backend.factory import create_app
+from backend.notifications import TEMPLATES, plan_batch, render
+
+RECORDS = [
+    {'phone': '9876543210', 'customer_name': 'Asha', 'amount': '500', 'invoice_id': 'INV-1'},
+    {'phone': '9876543211', 'customer_name': 'Ravi', 'amount': '750', 'invoice_id': 'INV-2'},
+    {'phone': '+91 98765 43210', 'customer_name': 'Asha', 'amount': '500', 'invoice_id': 'INV-1'},
+    {'phone': '12', 'customer_name': 'Nobody'},
+    'not a record'
+]
+
+
+def test_each_recipient_gets_their_own_text():
+    groups, _ = plan_batch(RECORDS[:2], 'due_reminder')
+
+    assert [message for message, _ in groups] == [
+        render('due_reminder', RECORDS[0]), render('due_reminder', RECORDS[1])
+    ]
+    assert 'Hi Ravi, a payment of Rs. 750 for Invoice ID: INV-2 is due.' in groups[1][0]
+    assert [phones for _, phones in groups] == [['919876543210'], ['919876543211']]
+
+
+def test_missing_fields_fall_back_to_defaults():
+    assert render('billing', {}) == 'Hi Customer, Your billing amount is Rs. 0. Invoice ID: N/A. Thank you!'
+    with pytest.raises(KeyError):
+        render('unknown', {})
+
+
+def test_identical_texts_share_a_group_and_repeats_are_dropped():
+    same = {'customer_name': 'Customer', 'amount': '100', 'invoice_id': 'SALE'}
+    records = [{'phone': f'98765432{i:02d}', **same} for i in range(3)] + RECORDS
+
+    groups, entries = plan_batch(records, 'billing')
+
+    assert [len(phones) for _, phones in groups] == [3, 1, 1]
+    assert [entry.get('group') for entry in entries] == [0, 0, 0, 1, 2, 1, None, None]
+    assert [entry.get('duplicate') for entry in entries][3:6] == [False, False, True]
+    assert [entry.get('error') for entry in entries][6:] == [
+        'Phone number must have 10 digits (optionally prefixed with 91)', 'Record must be an object'
+    ]
+
+
+def test_batch_route_sends_one_call_per_distinct_text():
+    app = create_app(gateway='q')
+    calls = []
+    app.extensions['sms_gateway'].send = lambda numbers, message: calls.append((numbers, message)) or {
+        'success': True, 'request_id': f'r{len(calls)}'
+    }
+    same = {'customer_name': 'Customer', 'amount': '100', 'invoice_id': 'SALE'}
+    records = [{'phone': f'98765432{i:02d}', **same} for i in range(3)] + RECORDS
+
+    body = app.test_client().post('/api/billing-notification-batch', json={
+        'template': 'payment_received', 'records': records
+    }).get_json()
+
+    assert sorted(calls) == sorted([
+        ('919876543200,919876543201,919876543202', render('payment_received', same)),
+        ('919876543210', render('payment_received', RECORDS[0])),
+        ('919876543211', render('payment_received', RECORDS[1]))
+    ])
+    assert (body['messages'], body['gatewayCalls'], body['unique']) == (3, 3, 5)
+    assert (body['duplicates'], body['invalid']) == (1, 2)
+    assert [r['success'] for r in body['results']] == [True] * 6 + [False, False]
+
+
+def test_unknown_template_is_rejected(client):
+    response = client.post('/api/billing-notification-batch', json={'template': 'nope', 'records': RECORDS})
+
+    assert response.status_code == 400
+    assert response.get_json()['templates'] == sorted(TEMPLATES)
@@ -0,0 +1,67 @@
+import pytest
+
+from backend.phones import PhoneNormalizer, clean_numbers, normalize
+
+
+@pytest.mark.parametrize('raw', [
+    '9876543210', '98765 43210', '98765-43210', '(98765) 43.210',
+    '919876543210', '+919876543210', '+91 98765 43210', '0091 9876543210',
+    '09876543210', 9876543210
+])
+def test_indian_mobile_forms_normalize_to_one_number(raw):
+    assert normalize(raw) == ('919876543210', None)
+
+
+@pytest.mark.parametrize('raw, reason', [
+    ('', 'Phone number is required'),
+    (None, 'Phone number is required'),
+    (' - ', 'Phone number is required'),
+    (True, 'Phone number must be a string'),
+    (['9876543210'], 'Phone number must be a string'),
+    ('98765abcde', 'Phone number must contain only digits'),
+    ('９８７６５４３２１０', 'Phone number must contain only digits'),
+    ('987654321', 'Phone number must have 10 digits (optionally prefixed with 91)'),
+    ('98765432101', 'Phone number must have 10 digits (optionally prefixed with 91)'),
+    ('00 987654', 'International numbers must have 8-15 digits'),
+    ('5876543210', 'Not a valid Indian mobile number'),
+    ('+91 5876543210', 'Not a valid Indian mobile number'),
+    ('+91 987654321', 'Not a valid Indian mobile number'),
+    ('+1234567', 'International numbers must have 8-15 digits'),
+    ('+1234567890123456', 'International numbers must have 8-15 digits')
+])
+def test_invalid_numbers_are_rejected_with_a_reason(raw, reason):
+    assert normalize(raw) == (None, reason)
+
+
+@pytest.mark.parametrize('raw, number', [
+    ('+1 415 555 2671', '14155552671'),
+    ('0044 20 7946 0958', '442079460958'),
+    ('+971501234567', '971501234567')
+])
+def test_international_numbers_keep_their_country_code(raw, number):
+    assert normalize(raw) == (number, None)
+
+
+def test_other_default_countries_skip_the_indian_mobile_rule():
+    normalizer = PhoneNormalizer(country_code='+44', national_length=10)
+
+    assert normalizer.normalize('07946 095800') == ('447946095800', None)
+    assert normalizer.normalize('447946095800') == ('447946095800', None)
+    assert normalizer.normalize('+91 9876543210') == ('919876543210', None)
+
+
+def test_repeated_numbers_are_served_from_the_cache():
+    normalizer = PhoneNormalizer(cache_size=2)
+
+    for raw in ['9876543210', '9876543210', '9876543211', '9876543210', '9876543212', '9876543211']:
+        normalizer.normalize(raw)
+
+    assert normalizer.metrics() == {'hits': 2, 'misses': 4, 'size': 2, 'maxSize': 2}
+
+
+def test_clean_numbers_dedupes_after_normalizing():
+    numbers, entries = clean_numbers(['98765 43210', '+919876543210', '12', '9876543211'])
+
+    assert numbers == ['919876543210', '919876543211']
+    assert [entry.get('duplicate') for entry in entries] == [False, True, None, False]
+    assert entries[2]['error'].startswith('Phone number must have 10 digits')
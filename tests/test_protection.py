@@ -0,0 +1,25 @@
+import pytest
+
+from backend.protection import RateLimitExceeded, TokenBucket
+
+
+def test_bulk_cost_above_capacity_is_charged_in_full():
+    bucket = TokenBucket(rate=10, capacity=10, max_wait=2)
+
+    assert bucket.reserve(50) == 0.0
+    with pytest.raises(RateLimitExceeded) as refused:
+        bucket.reserve(1)
+
+    # 40 tokens of debt plus one more, at 10 per second
+    assert refused.value.retry_after == pytest.approx(4.1, abs=0.05)
+
+
+def test_cost_within_capacity_waits_for_refill():
+    bucket = TokenBucket(rate=10, capacity=10, max_wait=2)
+    bucket.reserve(10)
+
+    assert bucket.reserve(5) == pytest.approx(0.5, abs=0.05)
+
+
+def test_zero_rate_never_limits():
+    assert TokenBucket(rate=0).reserve(1000) == 0.0
@@ -0,0 +1,40 @@
+import pytest
+
+
+BILL = {
+    'id': 'B1', 'custName': 'Asha Rao', 'custMobile': '9876543210',
+    'items': [{'name': 'Rice', 'code': '8901', 'qty': 1, 'rate': 60, 'total': 60}],
+    'subtotal': 60, 'grandTotal': 60
+}
+
+
+def test_unchanged_bill_is_not_modified(client):
+    client.post('/api/bills', json=BILL)
+    first = client.get('/api/bills/B1/render')
+
+    again = client.get('/api/bills/B1/render', headers={'If-None-Match': first.headers['ETag']})
+
+    assert again.status_code == 304
+
+
+def test_etag_changes_when_a_bill_is_deleted_and_recreated(client):
+    client.post('/api/bills', json=BILL)
+    first = client.get('/api/bills/B1/render')
+    client.delete('/api/bills/B1')
+    client.post('/api/bills', json={**BILL, 'grandTotal': 75})
+
+    again = client.get('/api/bills/B1/render', headers={'If-None-Match': first.headers['ETag']})
+
+    assert again.status_code == 200
+    assert again.headers['ETag'] != first.headers['ETag']
+
+
+@pytest.mark.parametrize('fmt', ['thermal', 'html', 'escpos'])
+def test_non_object_items_are_skipped(client, fmt):
+    client.post('/api/bills', json={**BILL, 'items': ['loose', 3, None, *BILL['items']]})
+
+    response = client.get(f'/api/bills/B1/render?format={fmt}')
+
+    assert response.status_code == 200
+    assert b'Rice' in response.data
+    assert b'loose' not in response.data
@@ -0,0 +1,98 @@
+import json
+import random
+
+from backend import aggregates
+from backend.store import get_store
+
+
+def _bill(bill_id, ts, mobile, total, qty=1, gst=0):
+    return {
+        'id': bill_id, 'ts': ts, 'custName': f'Customer {mobile}', 'custMobile': mobile,
+        'grandTotal': total, 'items': [{'name': 'Rice', 'qty': qty}, 'note'],
+        'gst': {'enabled': bool(gst), 'totalGST': gst}
+    }
+
+
+def _reports(store):
+    conn = store.db.connection()
+    customers = conn.execute('SELECT customer_key FROM customer_totals WHERE bills > 0').fetchall()
+    return {
+        'daily': store.sales_daily(limit=1000),
+        'monthly': store.sales_monthly(limit=1000),
+        'customers': sorted((store.customer_totals(row[0]) for row in customers), key=lambda c: c['key'])
+    }
+
+
+def _rebuilt(store):
+    """The reports recomputed from the bills left in the table"""
+    with store.db.transaction() as conn:
+        rows = conn.execute('SELECT data, date_key, month_key, customer_key FROM bills').fetchall()
+        aggregates.rebuild(conn, ((json.loads(row['data']), row['date_key'], row['month_key'], row['customer_key'])
+                                  for row in rows))
+    return _reports(store)
+
+
+def test_daily_monthly_and_customer_totals(client):
+    client.post('/api/bills', json=_bill('B1', '2026-01-31T10:00:00', '9876543210', 100, qty=2, gst=18))
+    client.post('/api/bills', json=_bill('B2', '2026-01-31T12:00:00', '9876543211', 50))
+    client.post('/api/bills', json=_bill('B3', '2026-02-01T09:00:00', '9876543210', 25.5, qty=0.5))
+
+    daily = client.get('/api/reports/daily').get_json()['items']
+    monthly = client.get('/api/reports/monthly').get_json()['items']
+    customer = client.get('/api/reports/customers/9876543210').get_json()['customer']
+
+    assert daily == [
+        {'date': '2026-02-01', 'bills': 1, 'revenue': 25.5, 'gst': 0.0, 'items': 0.5},
+        {'date': '2026-01-31', 'bills': 2, 'revenue': 150.0, 'gst': 18.0, 'items': 3.0}
+    ]
+    assert [(m['month'], m['bills'], m['revenue']) for m in monthly] == [('2026-02', 1, 25.5), ('2026-01', 2, 150.0)]
+    assert (customer['bills'], customer['revenue'], customer['firstBillAt'], customer['lastBillAt']) == (
+        2, 125.5, '2026-01-31T10:00:00', '2026-02-01T09:00:00'
+    )
+    assert client.get('/api/reports/summary?date=2026-01-31').get_json()['today']['bills'] == 2
+
+
+def test_updates_move_totals_between_days_and_customers(client):
+    client.post('/api/bills', json=_bill('B1', '2026-01-31T10:00:00', '9876543210', 100))
+
+    client.post('/api/bills', json=_bill('B1', '2026-02-02T10:00:00', '9876543211', 80))
+
+    assert [d['date'] for d in client.get('/api/reports/daily').get_json()['items']] == ['2026-02-02']
+    old = client.get('/api/reports/customers/9876543210').get_json()['customer']
+    new = client.get('/api/reports/customers/9876543211').get_json()['customer']
+    assert (old['bills'], old['revenue'], old['firstBillAt'], old['lastBillAt']) == (0, 0.0, None, None)
+    assert (new['bills'], new['revenue'], new['firstBillAt']) == (1, 80.0, '2026-02-02T10:00:00')
+
+
+def test_deleting_a_customers_bills_rolls_back_their_dates(client):
+    client.post('/api/bills', json=_bill('B1', '2026-01-30T10:00:00', '9876543210', 100))
+    client.post('/api/bills', json=_bill('B2', '2026-01-31T10:00:00', '9876543210', 100))
+
+    client.delete('/api/bills/B1')
+    customer = client.get('/api/reports/customers/9876543210').get_json()['customer']
+    assert (customer['firstBillAt'], customer['lastBillAt']) == ('2026-01-31T10:00:00', '2026-01-31T10:00:00')
+
+    client.delete('/api/bills/B2')
+    customer = client.get('/api/reports/customers/9876543210').get_json()['customer']
+    assert (customer['bills'], customer['firstBillAt'], customer['lastBillAt']) == (0, None, None)
+    assert client.get('/api/reports/daily').get_json()['items'] == []
+    assert client.get('/api/reports/customers').get_json()['items'] == []
+
+
+def test_running_totals_match_a_rebuild_after_random_edits():
+    store = get_store()
+    rng = random.Random(7)
+    ids = [f'B{i}' for i in range(20)]
+    for _ in range(200):
+        bill_id = rng.choice(ids)
+        if rng.random() < 0.25:
+            store.delete_bill(bill_id)
+            continue
+        day = rng.randint(27, 31)
+        store.save_bill(_bill(bill_id, f'2026-01-{day}T{rng.randint(8, 20):02d}:00:00',
+                              f'98765432{rng.randint(0, 4):02d}', rng.randint(1, 500),
+                              qty=rng.randint(1, 5), gst=rng.choice([0, 9, 18])))
+
+    running = _reports(store)
+
+    assert running == _rebuilt(store)
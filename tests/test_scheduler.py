@@ -0,0 +1,199 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.gateways import API, CONNECTION, REFUSED, TIMEOUT, _failure
+from backend.scheduler import FAILED, SCHEDULED, SENDING, SENT, QuietHours, Scheduler, parse_send_at
+
+
+class Sender:
+    """sender(numbers, message) double that answers from a list of results, then succeeds"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, numbers, message):
+        with self.lock:
+            self.calls.append((numbers, message))
+            return self.results.pop(0) if self.results else {'success': True, 'request_id': 'r1'}
+
+
+def _scheduler(tmp_path, sender=None, **options):
+    options.setdefault('retry_delay', 0)
+    options.setdefault('quiet_hours', QuietHours(''))
+    scheduler = Scheduler(str(tmp_path / 'schedule.db'), sender or Sender(), **options)
+    # The tests drive the timer by hand
+    scheduler.start = lambda: None
+    return scheduler
+
+
+def _local(days, hour, minute=0):
+    """Server local time `days` from today at hour:minute"""
+    moment = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return (moment + timedelta(days=days)).timestamp()
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2026-02-05T10:00:00Z', datetime(2026, 2, 5, 10, tzinfo=timezone.utc).timestamp()),
+    ('2026-02-05T15:30:00+05:30', datetime(2026, 2, 5, 10, tzinfo=timezone.utc).timestamp()),
+    ('2026-02-05T10:00:00', datetime(2026, 2, 5, 10).timestamp()),
+    (1770285600, 1770285600.0),
+    ('1770285600', 1770285600.0)
+])
+def test_send_at_accepts_iso_times_and_timestamps(value, expected):
+    assert parse_send_at(value) == (expected, None)
+
+
+@pytest.mark.parametrize('value', ['tomorrow', '', True, None, ['2026-02-05'], 'nan', float('inf')])
+def test_send_at_rejects_anything_else(value):
+    ts, error = parse_send_at(value)
+
+    assert ts is None
+    assert 'ISO 8601' in error
+
+
+def test_send_at_too_far_ahead_is_rejected():
+    ts, error = parse_send_at(time.time() + 10 * 86400, max_ahead=7 * 86400)
+
+    assert ts is None
+    assert error == 'send_at must be within 7 days'
+
+
+@pytest.mark.parametrize('spec, at, expected', [
+    ('21:00-09:00', (1, 22, 30), (2, 9)),
+    ('21:00-09:00', (1, 8, 59), (1, 9)),
+    ('21:00-09:00', (1, 12, 0), (1, 12)),
+    ('13:00-14:00', (1, 13, 30), (1, 14)),
+    ('13:00-14:00', (1, 21, 0), (1, 21)),
+    ('09:00-09:00', (1, 9, 30), (1, 9, 30))
+])
+def test_quiet_hours_move_sends_to_the_end_of_the_window(spec, at, expected):
+    assert QuietHours(spec).defer(_local(*at)) == _local(*expected)
+
+
+@pytest.mark.parametrize('spec', ['late', '21:00', '25:00-09:00', '21:00-9'])
+def test_invalid_quiet_hours_are_rejected(spec):
+    with pytest.raises(ValueError):
+        QuietHours(spec)
+
+
+def test_schedule_defers_quiet_hour_sends(tmp_path):
+    scheduler = _scheduler(tmp_path, quiet_hours=QuietHours('21:00-09:00'))
+
+    night = scheduler.schedule([('919876543210', 'Hi')], _local(1, 22, 30))
+    day = scheduler.schedule([('919876543210', 'Hi')], _local(1, 12))
+
+    assert (night['dueAt'], night['deferred']) == (_local(2, 9), True)
+    assert (day['dueAt'], day['deferred']) == (_local(1, 12), False)
+    assert scheduler.get(night['ids'][0])['requestedSendAt'] == datetime.fromtimestamp(_local(1, 22, 30)).isoformat()
+
+
+def test_due_jobs_fire_as_one_call_per_message(tmp_path):
+    sender = Sender()
+    scheduler = _scheduler(tmp_path, sender)
+    plan = scheduler.schedule(
+        [('919876543210', 'Hi'), ('919876543211', 'Hi'), ('919876543212', 'Bye')], time.time() - 1
+    )
+
+    assert scheduler._tick() == 0
+
+    assert sorted(sender.calls) == [('919876543210,919876543211', 'Hi'), ('919876543212', 'Bye')]
+    assert [scheduler.get(job_id)['status'] for job_id in plan['ids']] == [SENT] * 3
+    assert scheduler.pending() == 0
+
+
+def test_heap_holds_only_the_loaded_horizon(tmp_path):
+    scheduler = _scheduler(tmp_path, horizon=60)
+    now = time.time()
+    soon = scheduler.schedule([('919876543210', 'Hi')], now + 10)['dueAt']
+    later = scheduler.schedule([('919876543211', 'Hi')], now + 120)['dueAt']
+
+    scheduler._load(now)
+    assert scheduler._heap == [soon]
+
+    # New jobs join the heap only when they fall inside the loaded horizon
+    inside = scheduler.schedule([('919876543212', 'Hi')], now + 30)['dueAt']
+    scheduler.schedule([('919876543213', 'Hi')], now + 300)
+    assert sorted(scheduler._heap) == [soon, inside]
+
+    # The next horizon hands the later job over, after the unsent ones
+    scheduler._load(now + 100)
+    assert scheduler._heap == [soon, inside, later]
+
+
+def test_expired_lease_is_reclaimed_on_the_next_load(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    job_id = scheduler.schedule([('919876543210', 'Hi')], time.time() - 1)['ids'][0]
+
+    assert [job['id'] for job in scheduler._claim(time.time())] == [job_id]
+    assert scheduler._claim(time.time()) == []
+    assert scheduler.get(job_id)['status'] == SENDING
+
+    # The claiming worker died: its lease runs out
+    scheduler._load(time.time() + 301)
+    [job] = scheduler._claim(time.time())
+
+    assert job['id'] == job_id
+    assert job['attempts'] == 2
+
+
+def _fire_once(tmp_path, result, **options):
+    sender = Sender(result)
+    scheduler = _scheduler(tmp_path, sender, **options)
+    job_id = scheduler.schedule([('919876543210', 'Hi')], time.time() - 1)['ids'][0]
+    scheduler._fire(time.time())
+    return scheduler, scheduler.get(job_id), sender
+
+
+@pytest.mark.parametrize('failure', [
+    _failure(CONNECTION, 'Connection error'),
+    _failure(API, 'Service unavailable', status_code=503)
+])
+def test_unsent_failure_is_rescheduled(tmp_path, failure):
+    _, job, _ = _fire_once(tmp_path, failure)
+
+    assert job['status'] == SCHEDULED
+    assert job['attempts'] == 1
+    assert job['error'] == failure['error']
+
+
+@pytest.mark.parametrize('failure, error', [
+    (_failure(TIMEOUT, 'Request timeout'), 'timeout: Request timeout'),
+    (_failure(API, 'Invalid numbers', status_code=400), 'api: Invalid numbers'),
+    ({'success': False, 'error': 'boom'}, 'error: boom')
+])
+def test_possibly_delivered_failure_is_not_resent(tmp_path, failure, error):
+    scheduler, job, sender = _fire_once(tmp_path, failure)
+    scheduler._fire(time.time() + 60)
+
+    assert job['status'] == FAILED
+    assert job['error'] == error
+    assert len(sender.calls) == 1
+
+
+def test_locally_refused_send_waits_without_using_an_attempt(tmp_path):
+    before = time.time()
+    _, job, _ = _fire_once(tmp_path, _failure(REFUSED, 'Circuit open', retry_after=30))
+
+    assert job['status'] == SCHEDULED
+    assert job['attempts'] == 0
+    assert datetime.fromisoformat(job['sendAt']).timestamp() >= before + 30
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    sender = Sender(*[_failure(CONNECTION, 'Connection error')] * 2)
+    scheduler = _scheduler(tmp_path, sender, max_attempts=2)
+    job_id = scheduler.schedule([('919876543210', 'Hi')], time.time() - 1)['ids'][0]
+
+    scheduler._fire(time.time())
+    assert scheduler.get(job_id)['status'] == SCHEDULED
+    scheduler._fire(time.time())
+
+    job = scheduler.get(job_id)
+    assert job['status'] == FAILED
+    assert job['attempts'] == 2
+    assert len(sender.calls) == 2
@@ -0,0 +1,62 @@
+from backend import search
+from backend.store import get_store
+
+
+def test_bill_with_non_object_items_is_saved_and_indexed(client):
+    response = client.post('/api/bills', json={
+        'id': 'B1', 'custName': 'Asha Rao', 'custMobile': '9876543210',
+        'items': ['loose text', 3, None, {'name': 'Basmati Rice', 'code': '8901'}],
+        'grandTotal': 60
+    })
+
+    assert response.status_code == 201, response.get_json()
+    page = client.get('/api/search?q=basmati').get_json()
+    assert [(r['type'], r['key']) for r in page['items']] == [('bills', 'B1')]
+
+
+def test_backfill_skips_non_object_items():
+    store = get_store()
+    store.save_bill({'id': 'B1', 'custName': 'Asha Rao', 'items': ['x', {'name': 'Sugar'}]})
+    with store.db.transaction() as conn:
+        conn.execute('DELETE FROM search_docs')
+        search.backfill(conn)
+        rows, _ = search.query(conn, 'sugar')
+
+    assert rows == [('bills', 'B1')]
+
+
+def _search(client, q, **args):
+    page = client.get('/api/search', query_string={'q': q, **args}).get_json()
+    return [(r['type'], r['key']) for r in page['items']]
+
+
+def _customers(client, *names):
+    for i, name in enumerate(names):
+        client.post('/api/customers', json={'name': name, 'mobile': f'98765432{i:02d}'})
+
+
+def test_exact_and_prefix_name_matches_rank_first(client):
+    _customers(client, 'Sanjay Ram', 'Ram', 'Ramesh Kumar', 'Param Singh')
+
+    keys = [key for _, key in _search(client, 'ram', type='customers')]
+
+    # exact, starts with, word starts with, contains
+    assert keys == ['9876543201', '9876543202', '9876543200', '9876543203']
+
+
+def test_phone_digits_and_short_prefixes_match(client):
+    _customers(client, 'Asha Rao', 'Vikram Shah')
+
+    assert _search(client, '3201') == [('customers', '9876543201')]
+    assert _search(client, 'as', type='customers') == [('customers', '9876543200')]
+
+
+def test_every_word_must_match(client):
+    _customers(client, 'Asha Rao', 'Asha Mehta')
+
+    assert _search(client, 'asha meh') == [('customers', '9876543201')]
+
+
+def test_empty_or_unknown_type_is_rejected(client):
+    assert client.get('/api/search?q=').status_code == 400
+    assert client.get('/api/search?q=asha&type=stock').status_code == 400
@@ -0,0 +1,152 @@
+import os
+import time
+
+from backend.db import Database
+from backend.gateways import CONNECTION, TIMEOUT, _failure
+from backend.sms_queue import FAILED, QUEUED, SCHEMA, SENDING, SENT, SMSQueue
+
+
+def _wait(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def _leftover_jobs():
+    """Jobs an earlier process queued, and one it died while sending"""
+    db = Database(os.environ['SMS_QUEUE_DB'], SCHEMA)
+    now = time.time()
+    with db.transaction() as conn:
+        conn.execute(
+            'INSERT INTO sms_jobs (id, phone, message, status, max_attempts, next_attempt_at, '
+            'created_at, updated_at) VALUES (?, ?, ?, ?, 3, ?, ?, ?)',
+            ('queued-job', '919876543210', 'Hello', QUEUED, now, now, now)
+        )
+        conn.execute(
+            'INSERT INTO sms_jobs (id, phone, message, status, attempts, max_attempts, next_attempt_at, '
+            'locked_until, created_at, updated_at) VALUES (?, ?, ?, ?, 1, 3, ?, ?, ?, ?)',
+            ('stale-job', '919876543211', 'Hello', SENDING, now, now - 1, now, now)
+        )
+    return db
+
+
+def test_jobs_left_by_a_restart_are_sent_on_first_request(stub, client):
+    gateway = stub()
+    db = _leftover_jobs()
+
+    assert client.get('/api/health').status_code == 200
+
+    assert _wait(lambda: gateway.stats()['calls'] == 2)
+    assert _wait(lambda: db.connection().execute(
+        'SELECT COUNT(*) FROM sms_jobs WHERE status = ?', (SENT,)
+    ).fetchone()[0] == 2)
+
+
+def _queue(tmp_path, sender=None, **options):
+    options.setdefault('rate', 0)
+    options.setdefault('retry_delay', 0)
+    return SMSQueue(str(tmp_path / 'queue.db'), sender or (lambda phone, message: {'success': True}), **options)
+
+
+def _insert(queue, job_id='job-1', status=QUEUED, locked_until=None):
+    now = time.time()
+    with queue.db.transaction() as conn:
+        conn.execute(
+            'INSERT INTO sms_jobs (id, phone, message, status, max_attempts, next_attempt_at, '
+            'locked_until, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, '919876543210', 'Hello', status, queue.max_attempts, now, locked_until, now, now)
+        )
+
+
+def test_claimed_job_is_leased_to_one_dispatcher(tmp_path):
+    queue = _queue(tmp_path)
+    _insert(queue)
+
+    job = queue._claim()
+
+    assert job['id'] == 'job-1'
+    assert job['attempts'] == 1
+    assert queue.get('job-1')['status'] == SENDING
+    assert queue._claim() is None
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = _queue(tmp_path)
+    _insert(queue, status=SENDING, locked_until=time.time() - 1)
+
+    job = queue._claim()
+
+    assert job['id'] == 'job-1'
+    assert queue._claim() is None
+
+
+def test_unsent_job_is_retried_until_max_attempts(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2)
+    _insert(queue)
+
+    queue._finish(queue._claim(), _failure(CONNECTION, 'Connection error'))
+    assert queue.get('job-1')['status'] == QUEUED
+    queue._finish(queue._claim(), _failure(CONNECTION, 'Connection error'))
+
+    job = queue.get('job-1')
+    assert job['status'] == FAILED
+    assert job['attempts'] == 2
+    assert job['error'] == 'Connection error'
+
+
+def test_possibly_delivered_job_fails_without_a_retry(tmp_path):
+    queue = _queue(tmp_path, max_attempts=3)
+    _insert(queue)
+
+    queue._finish(queue._claim(), {'success': False, 'error': 'boom'})
+
+    job = queue.get('job-1')
+    assert job['status'] == FAILED
+    assert job['attempts'] == 1
+    assert job['error'] == 'error: boom'
+    assert queue._claim() is None
+
+
+def test_timed_out_job_is_not_sent_again(stub, client, monkeypatch):
+    monkeypatch.setenv('SMS_READ_TIMEOUT', '0.2')
+    gateway = stub(latency=0.5)
+
+    response = client.post('/api/send-sms', json={'phone': '9876543210', 'message': 'Hello', 'async': True})
+    job_id = response.get_json()['jobId']
+
+    def job_status():
+        return client.get(f'/api/sms-jobs/{job_id}').get_json()['job']
+
+    assert _wait(lambda: job_status()['status'] == FAILED)
+    assert job_status()['error'].startswith(f'{TIMEOUT}: ')
+    time.sleep(0.5)
+    assert gateway.stats()['calls'] == 1
+
+
+def test_locally_refused_send_does_not_use_an_attempt(tmp_path):
+    queue = _queue(tmp_path)
+    _insert(queue)
+
+    queue._finish(queue._claim(), {'success': False, 'error': 'Circuit open', 'retry_after': 30})
+
+    job = queue.get('job-1')
+    assert job['status'] == QUEUED
+    assert job['attempts'] == 0
+    assert queue._claim() is None
+
+
+def test_dispatcher_sends_enqueued_jobs(tmp_path):
+    sent = []
+    queue = _queue(tmp_path, lambda phone, message: sent.append(phone) or {'success': True, 'request_id': 'r1'})
+    try:
+        job = queue.enqueue('919876543210', 'Hello')
+        assert _wait(lambda: queue.get(job['id'])['status'] == SENT)
+    finally:
+        queue.stop(timeout=5)
+
+    assert sent == ['919876543210']
+    assert queue.get(job['id'])['requestId'] == 'r1'
+    assert queue.depth() == 0
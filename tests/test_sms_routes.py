@@ -0,0 +1,32 @@
+def test_sms_batch_items_carry_a_message(stub, client):
+    stub()
+
+    response = client.post('/api/send-sms-batch', json={'smsList': [
+        {'phone': '9876543210', 'message': 'Hello'},
+        {'phone': '12', 'message': 'Hello'}
+    ]})
+
+    results = response.get_json()['results']
+    assert results[0]['success'] is True
+    assert results[0]['message'] == 'SMS sent'
+    assert results[1]['success'] is False
+    assert results[1]['message'] == results[1]['error']
+
+
+def test_test_sms_rejects_an_invalid_phone(stub, client):
+    gateway = stub()
+
+    response = client.get('/api/test-sms?phone=12345')
+
+    assert response.status_code == 400
+    assert response.get_json()['details'].startswith('Phone number must have 10 digits')
+    assert gateway.stats()['calls'] == 0
+
+
+def test_test_sms_sends_to_the_normalized_phone(stub, client):
+    gateway = stub()
+
+    response = client.get('/api/test-sms', query_string={'phone': '+91 98765-43210'})
+
+    assert response.status_code == 200
+    assert gateway.stats()['recipients'] == 1
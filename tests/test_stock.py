@@ -0,0 +1,68 @@
+import pytest
+
+
+@pytest.fixture
+def stocked(client):
+    client.post('/api/stock', json={'code': '8901', 'name': 'Rice 1kg', 'qty': 10, 'minAlert': 5})
+    client.post('/api/stock', json={'code': '8902', 'name': 'Sugar 1kg', 'qty': 3, 'minAlert': 5})
+    return client
+
+
+def _move(client, **body):
+    return client.post('/api/stock/movements', json={'type': 'sale', **body})
+
+
+def test_sale_takes_stock_off_and_reports_low_items(stocked):
+    response = _move(stocked, reference='B1', movements=[
+        {'code': '8901', 'qty': 6}, {'code': '8902', 'qty': 1}, {'code': 'unknown', 'qty': 1}
+    ])
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert {item['code']: item['qty'] for item in body['items']} == {'8901': 4, '8902': 2}
+    assert body['skipped'] == ['unknown']
+    assert sorted(alert['code'] for alert in body['alerts']) == ['8901', '8902']
+
+
+def test_resending_a_reference_is_a_no_op(stocked):
+    _move(stocked, reference='B1', movements=[{'code': '8901', 'qty': 2}])
+
+    again = _move(stocked, reference='B1', movements=[{'code': '8901', 'qty': 2}]).get_json()
+
+    assert again['duplicate'] is True
+    assert stocked.get('/api/stock/8901').get_json()['item']['qty'] == 8
+
+
+def test_stale_version_conflicts_and_applies_nothing(stocked):
+    version = stocked.get('/api/stock/8901').get_json()['item']['version']
+    _move(stocked, reference='B1', movements=[{'code': '8901', 'qty': 1, 'version': version}])
+
+    response = _move(stocked, reference='B2', movements=[
+        {'code': '8902', 'qty': 1}, {'code': '8901', 'qty': 1, 'version': version}
+    ])
+
+    assert response.status_code == 409
+    assert [c['code'] for c in response.get_json()['conflicts']] == ['8901']
+    assert stocked.get('/api/stock/8902').get_json()['item']['qty'] == 3
+
+
+def test_purchase_creates_unknown_items(stocked):
+    response = stocked.post('/api/stock/movements', json={
+        'type': 'purchase', 'reference': 'P1', 'movements': [{'code': '8903', 'qty': 12, 'rate': 40}]
+    })
+
+    assert response.status_code == 200
+    assert stocked.get('/api/stock/8903').get_json()['item']['qty'] == 12
+
+
+def test_low_stock_lists_items_at_or_below_min_alert(stocked):
+    _move(stocked, reference='B1', movements=[{'code': '8901', 'qty': 5}])
+
+    low = stocked.get('/api/stock/low').get_json()
+
+    assert [item['code'] for item in low['items']] == ['8901', '8902']
+
+
+def test_invalid_movements_are_rejected(stocked):
+    assert _move(stocked, movements=[]).status_code == 400
+    assert _move(stocked, movements=[{'code': '8901', 'qty': -1}]).status_code == 400
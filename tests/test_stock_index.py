@@ -0,0 +1,43 @@
+from backend.stock_index import StockIndex, barcode_variants, stock_status
+from backend.store import get_store
+
+
+def test_barcode_variants():
+    assert barcode_variants(' 012345678905 ') == ('012345678905', '0012345678905')
+    assert barcode_variants('0012345678905') == ('0012345678905', '012345678905')
+    assert barcode_variants('ABC-1') == ('ABC-1',)
+
+
+def test_stock_status():
+    assert stock_status({'qty': 0, 'minAlert': 5}) == 'out'
+    assert stock_status({'qty': 5, 'minAlert': 5}) == 'low'
+    assert stock_status({'qty': 6, 'minAlert': 5}) == 'ok'
+
+
+def test_lookup_resolves_upc_twin_and_reports_stock(client):
+    client.post('/api/stock', json={'code': '0012345678905', 'name': 'Tea', 'qty': 2, 'minAlert': 5})
+
+    body = client.get('/api/stock/lookup/012345678905').get_json()
+
+    assert body['item']['code'] == '0012345678905'
+    assert body['stock'] == 'low'
+    assert client.get('/api/stock/lookup/0000').status_code == 404
+
+
+def test_cached_items_follow_later_writes():
+    store = get_store()
+    store.save_stock_item({'code': 'C1', 'name': 'Rice', 'qty': 10})
+    index = StockIndex(store, cache_size=1)
+
+    assert index.lookup('C1')['qty'] == 10
+    assert index.lookup('C1')['qty'] == 10
+    assert index.hits == 1
+
+    store.save_stock_item({'code': 'C1', 'name': 'Rice', 'qty': 4})
+    store.save_stock_item({'code': 'C2', 'name': 'Dal', 'qty': 1})
+    assert index.lookup('C1')['qty'] == 4
+    assert index.lookup('C2')['qty'] == 1
+    assert index.metrics()['size'] == 1
+
+    store.delete_stock_item('C1')
+    assert index.lookup('C1') is None
@@ -0,0 +1,87 @@
+import pytest
+
+from backend.store import get_store
+
+BILLS = [
+    ('B1', '2026-01-30T10:00:00', '9876543210'),
+    ('B2', '2026-01-31T09:00:00', '9876543211'),
+    ('B3', '2026-01-31T18:00:00', '9876543210'),
+    ('B4', '2026-02-01T08:00:00', '9876543210'),
+    ('B5', '2026-02-01T08:00:00', '9876543211')
+]
+
+
+@pytest.fixture
+def billed(client):
+    for bill_id, ts, mobile in BILLS:
+        client.post('/api/bills', json={'id': bill_id, 'ts': ts, 'custName': 'Asha', 'custMobile': mobile,
+                                        'grandTotal': 100})
+    return client
+
+
+def _ids(client, **args):
+    page = client.get('/api/bills', query_string=args).get_json()
+    return [bill['id'] for bill in page['items']], page['hasMore']
+
+
+def test_bills_page_newest_first(billed):
+    first, more = _ids(billed, limit=2)
+    second, _ = _ids(billed, limit=2, offset=2)
+    last, done = _ids(billed, limit=2, offset=4)
+
+    assert sorted(first[:2]) == ['B4', 'B5']
+    assert second == ['B3', 'B2']
+    assert last == ['B1']
+    assert (more, done) == (True, False)
+
+
+@pytest.mark.parametrize('args, expected', [
+    ({'customer': '9876543210'}, {'B1', 'B3', 'B4'}),
+    ({'date': '2026-01-31'}, {'B2', 'B3'}),
+    ({'month': '2026-02'}, {'B4', 'B5'}),
+    ({'from': '2026-01-31'}, {'B2', 'B3', 'B4', 'B5'}),
+    ({'to': '2026-01-31'}, {'B1', 'B2', 'B3'}),
+    ({'from': '2026-01-31', 'to': '2026-01-31', 'customer': '9876543211'}, {'B2'})
+])
+def test_bill_filters(billed, args, expected):
+    ids, _ = _ids(billed, **args)
+
+    assert set(ids) == expected
+
+
+def test_iter_bills_pages_by_key_through_equal_timestamps(billed):
+    bills = list(get_store().iter_bills(batch=2))
+
+    assert [bill['id'] for bill in bills] == ['B1', 'B2', 'B3', 'B4', 'B5']
+
+
+def test_iter_bills_filters_on_the_date_range(billed):
+    bills = get_store().iter_bills(date_from='2026-01-31', date_to='2026-01-31', batch=1)
+
+    assert [bill['id'] for bill in bills] == ['B2', 'B3']
+
+
+def test_bill_dates_are_local_calendar_days(india_time):
+    store = get_store()
+    store.save_bill({'id': 'B1', 'ts': '2026-01-31T23:30:00+00:00'})
+
+    assert store.get_bill('B1')['month'] == '2026-02'
+    assert [bill['id'] for bill in store.iter_bills(date_from='2026-02-01')] == ['B1']
+
+
+def test_last_bill_time_rolls_back_when_a_bill_is_deleted(billed):
+    billed.delete('/api/bills/B4')
+    assert billed.get('/api/customers/9876543210').get_json()['customer']['lastBillAt'] == '2026-01-31T18:00:00'
+
+    billed.delete('/api/bills/B1')
+    billed.delete('/api/bills/B3')
+    assert billed.get('/api/customers/9876543210').get_json()['customer']['lastBillAt'] is None
+
+
+def test_last_bill_time_follows_a_bill_moved_to_another_customer(billed):
+    billed.post('/api/bills', json={'id': 'B4', 'ts': '2026-02-01T08:00:00', 'custName': 'Asha',
+                                    'custMobile': '9876543212', 'grandTotal': 100})
+
+    customers = {key: billed.get(f'/api/customers/{key}').get_json()['customer']['lastBillAt']
+                 for key in ('9876543210', '9876543212')}
+    assert customers == {'9876543210': '2026-01-31T18:00:00', '9876543212': '2026-02-01T08:00:00'}
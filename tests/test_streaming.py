@@ -0,0 +1,89 @@
+import json
+
+from backend.factory import create_app
+
+
+def _stream(client, body, content_type='application/x-ndjson'):
+    response = client.post('/api/send-sms-stream', data=body, content_type=content_type)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return lines[:-1], lines[-1]
+
+
+def test_malformed_rows_get_their_own_error_lines(stub, client):
+    stub()
+    body = '\n'.join([
+        '{"phone": "9876543210", "message": "Hi"}',
+        'not json',
+        '["9876543211", "Hi"]',
+        '',
+        '{"phone": "12", "message": "Hi"}',
+        '{"phone": "9876543212"}',
+        '{"phone": "9876543213", "message": "Hi"}'
+    ])
+
+    rows, summary = _stream(client, body)
+
+    assert [(r['row'], r['success']) for r in rows] == [(1, True), (2, False), (3, False), (4, False),
+                                                        (5, False), (6, True)]
+    assert [r['error'] for r in rows[1:5]] == [
+        'Invalid JSON', 'Row must be a JSON object',
+        'Phone number must have 10 digits (optionally prefixed with 91)',
+        'Phone number and message are required'
+    ]
+    assert (summary['summary'], summary['total'], summary['sent'], summary['failed']) == (True, 6, 2, 4)
+
+
+def test_csv_rows_follow_the_header(stub, client):
+    gateway = stub()
+
+    rows, summary = _stream(client, 'message,phone\nHi,9876543210\n"Hi, again",9876543211\n', 'text/csv')
+
+    assert [r['phone'] for r in rows] == ['919876543210', '919876543211']
+    assert summary['sent'] == 2
+    assert gateway.stats()['calls'] == 2
+
+
+def test_rows_past_the_cap_are_not_sent(stub, client, monkeypatch):
+    monkeypatch.setenv('SMS_STREAM_MAX_ROWS', '2')
+    gateway = stub()
+    body = '\n'.join(json.dumps({'phone': f'98765432{i:02d}', 'message': 'Hi'}) for i in range(5))
+
+    rows, summary = _stream(client, body)
+
+    assert len(rows) == 2
+    assert (summary['total'], summary['truncated']) == (2, True)
+    assert gateway.stats()['calls'] == 2
+
+
+def test_summary_follows_a_send_that_raises(stub):
+    stub()
+    app = create_app(gateway='q')
+
+    def send(phone, message):
+        if phone == '919876543211':
+            raise RuntimeError('gateway blew up')
+        return {'success': True, 'request_id': 'r1'}
+
+    app.extensions['sms_gateway'].send = send
+    body = '\n'.join(json.dumps({'phone': f'98765432{i:02d}', 'message': 'Hi'}) for i in range(10, 13))
+
+    rows, summary = _stream(app.test_client(), body)
+
+    assert [r['success'] for r in rows] == [True, False, True]
+    assert rows[1]['error'] == 'gateway blew up'
+    assert (summary['total'], summary['sent'], summary['truncated'], summary['error']) == (3, 2, False, None)
+
+
+def test_bytes_that_are_not_utf8_fail_only_their_row(stub, client):
+    gateway = stub()
+    body = (b'{"phone": "9876543210", "message": "Hi"}\n'
+            b'{"phone": "9876543211", "message": "Caf\xe9"}\n'
+            b'\xff\xfe\n'
+            b'{"phone": "9876543212", "message": "Hi"}\n')
+
+    rows, summary = _stream(client, body)
+
+    assert [r['error'] for r in rows] == [None, 'Row is not valid UTF-8', 'Invalid JSON', None]
+    assert (summary['total'], summary['sent'], summary['error']) == (4, 2, None)
+    assert gateway.stats()['calls'] == 2
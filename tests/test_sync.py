@@ -0,0 +1,84 @@
+def _sync(client, counter, cursor=0, **changes):
+    response = client.post('/api/sync', json={'counterId': counter, 'cursor': cursor, **changes})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_changes_reach_other_counters_but_not_their_origin(client):
+    first = _sync(client, 'counter-1', bills=[{'id': 'B1', 'custName': 'Asha', 'custMobile': '9876543210'}])
+
+    assert first['applied']['bills'] == 1
+    assert first['changes']['bills'] == []
+
+    other = _sync(client, 'counter-2')
+    assert [b['id'] for b in other['changes']['bills']] == ['B1']
+    assert [c['key'] for c in other['changes']['customers']] == ['9876543210']
+
+    again = _sync(client, 'counter-2', cursor=other['cursor'])
+    assert again['changes']['bills'] == []
+
+
+def test_sync_pages_with_the_cursor(client):
+    _sync(client, 'counter-1', stock=[{'code': f'C{i}', 'name': f'Item {i}', 'qty': 1} for i in range(5)])
+
+    page = _sync(client, 'counter-2', limit=2)
+    codes = [item['code'] for item in page['changes']['stock']]
+    while page['hasMore']:
+        page = _sync(client, 'counter-2', cursor=page['cursor'], limit=2)
+        codes += [item['code'] for item in page['changes']['stock']]
+
+    assert sorted(codes) == [f'C{i}' for i in range(5)]
+
+
+def test_deleted_customers_are_removed_and_propagated(client):
+    client.post('/api/customers', json={'name': 'Asha Rao', 'mobile': '9876543210'})
+    cursor = _sync(client, 'counter-2')['cursor']
+
+    result = _sync(client, 'counter-1', deleted={'customers': ['9876543210']})
+
+    assert result['applied']['deleted'] == 1
+    assert client.get('/api/customers/9876543210').status_code == 404
+    assert client.get('/api/search?q=asha').get_json()['items'] == []
+    other = _sync(client, 'counter-2', cursor=cursor)
+    assert other['changes']['deleted']['customers'] == ['9876543210']
+
+
+def test_deleted_must_hold_lists(client):
+    response = client.post('/api/sync', json={'deleted': {'customers': 'x'}})
+
+    assert response.status_code == 400
+
+
+def test_stale_stock_upsert_does_not_overwrite_a_sale(client):
+    client.post('/api/stock', json={'code': '8901', 'name': 'Rice 1kg', 'qty': 10})
+    pulled = _sync(client, 'counter-1')['changes']['stock'][0]
+    client.post('/api/stock/movements', json={'type': 'sale', 'reference': 'B1',
+                                              'movements': [{'code': '8901', 'qty': 3}]})
+
+    result = _sync(client, 'counter-1', stock=[{**pulled, 'qty': 12}])
+
+    assert result['applied']['stock'] == 0
+    [conflict] = result['conflicts']
+    assert (conflict['code'], conflict['expected'], conflict['item']['qty']) == ('8901', pulled['version'], 7)
+    assert client.get('/api/stock/8901').get_json()['item']['qty'] == 7
+
+
+def test_stock_upsert_with_the_current_version_is_applied(client):
+    client.post('/api/stock', json={'code': '8901', 'name': 'Rice 1kg', 'qty': 10})
+    pulled = _sync(client, 'counter-1')['changes']['stock'][0]
+
+    result = _sync(client, 'counter-1', stock=[{**pulled, 'name': 'Rice 1 kg'},
+                                               {'code': '8902', 'name': 'Sugar 1kg', 'qty': 4}])
+
+    assert result['applied']['stock'] == 2
+    assert result['conflicts'] == []
+    assert client.get('/api/stock/8901').get_json()['item']['name'] == 'Rice 1 kg'
+
+
+def test_unversioned_upsert_of_an_existing_item_conflicts(client):
+    client.post('/api/stock', json={'code': '8901', 'name': 'Rice 1kg', 'qty': 10})
+
+    result = _sync(client, 'counter-1', stock=[{'code': '8901', 'name': 'Rice 1kg', 'qty': 0}])
+
+    assert [(c['code'], c['expected']) for c in result['conflicts']] == [('8901', None)]
+    assert client.get('/api/stock/8901').get_json()['item']['qty'] == 10